@@ -0,0 +1,123 @@
+"""Measure cold-start cost: import time per module and warm-up time.
+
+Usage:
+    python scripts/bench_import.py
+    python scripts/bench_import.py --repeat 5 --top 10 whisperguard.web
+    python scripts/bench_import.py --warmup --json bench.json
+
+Each module is imported in a fresh interpreter (`python -X importtime`),
+`--repeat` times; the report gives the median cumulative import time,
+the median wall time of the whole process, and the slowest imports by
+their own (self) time. `--warmup` also times `whisperguard.warmup.run`
+step by step in a fresh process, i.e. what a new worker pays before it
+reports ready.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# ensure project root is on sys.path so `import whisperguard` works
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+DEFAULT_MODULES = ('whisperguard.web', 'whisperguard.batch', 'whisperguard.session',
+                   'whisperguard.model.features', 'whisperguard.audio.capture')
+
+WARMUP_CODE = (
+    "import json, time\n"
+    "t = time.perf_counter()\n"
+    "from whisperguard import web, warmup\n"
+    "imported = time.perf_counter() - t\n"
+    "state = warmup.run(web.classifier)\n"
+    "print(json.dumps(dict(state, import_seconds=round(imported, 4))))\n"
+)
+
+
+def _env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    return env
+
+
+def parse_importtime(stderr):
+    """Rows of (module, self_us, cumulative_us) from `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative)))
+    return rows
+
+
+def bench_module(module, repeat=3):
+    walls, totals, rows = [], [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                              capture_output=True, text=True, env=_env(), cwd=ROOT)
+        walls.append(time.perf_counter() - t0)
+        if proc.returncode != 0:
+            return {'module': module, 'error': proc.stderr.strip().splitlines()[-1]}
+        rows = parse_importtime(proc.stderr)
+        totals.append(next((c for n, _, c in rows if n == module), 0))
+    return {
+        'module': module,
+        'import_ms': round(statistics.median(totals) / 1000, 1),
+        'process_ms': round(statistics.median(walls) * 1000, 1),
+        'modules_loaded': len(rows),
+        'slowest': [(n, round(s / 1000, 1)) for n, s, _ in sorted(rows, key=lambda r: -r[1])],
+    }
+
+
+def bench_warmup():
+    proc = subprocess.run([sys.executable, '-c', WARMUP_CODE],
+                          capture_output=True, text=True, env=_env(), cwd=ROOT)
+    if proc.returncode != 0:
+        return {'status': 'failed', 'error': proc.stderr.strip().splitlines()[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per module")
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to list per module")
+    parser.add_argument("--warmup", action="store_true", help="also time whisperguard.warmup.run")
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON")
+    args = parser.parse_args()
+
+    report = {'python': sys.version.split()[0], 'modules': []}
+    for module in args.modules:
+        r = bench_module(module, repeat=args.repeat)
+        r['slowest'] = r.get('slowest', [])[:args.top]
+        report['modules'].append(r)
+        if 'error' in r:
+            print(f"{module}: failed ({r['error']})")
+            continue
+        print(f"{module}: import {r['import_ms']:.1f} ms, process {r['process_ms']:.1f} ms, "
+              f"{r['modules_loaded']} modules")
+        for name, ms in r['slowest']:
+            print(f"    {ms:8.1f} ms  {name}")
+
+    if args.warmup:
+        w = report['warmup'] = bench_warmup()
+        if w['status'] != 'ready':
+            print(f"warm-up: failed ({w['error']})")
+        else:
+            print(f"warm-up: {w['status']} in {w['seconds']}s after a {w['import_seconds']}s import")
+            for name, seconds in w['steps'].items():
+                print(f"    {seconds * 1000:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Microbenchmark each analysis stage on synthetic audio.
+
+Usage:
+    python scripts/bench_stages.py
+    python scripts/bench_stages.py --kinds ultrasonic speech --rates 44100 --lengths 1 --repeat 50
+    python scripts/bench_stages.py --json stages.json
+    python scripts/bench_stages.py --compare stages.json
+
+Stages: detect_ultrasonic, waveform_to_log_mel, predict, fuse_scores and
+save_evidence (written to a temporary directory). Every stage is timed on
+every clip of the synthetic corpus (`whisperguard.synth`: kinds x sample
+rates x lengths); the report lists p50/p95/p99 per stage and clip.
+`--compare` pairs the results with an earlier JSON report by name and
+flags stages that got slower or faster.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+# ensure project root is on sys.path so `import whisperguard` works
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from whisperguard import benchmark, config, synth
+from whisperguard.detection.ultrasonic import detect_ultrasonic
+from whisperguard.evidence import save_evidence
+from whisperguard.fusion import fuse_scores
+from whisperguard.model.cnn import CNNSpectrogramClassifier
+from whisperguard.model.spectrogram import waveform_to_log_mel
+
+STAGES = ('detect_ultrasonic', 'waveform_to_log_mel', 'predict', 'fuse_scores', 'save_evidence')
+
+
+def stage_calls(waveform, sr, classifier, evidence_dir):
+    """Zero-argument callables per stage, with inputs computed up front."""
+    rule_ratio, _ = detect_ultrasonic(waveform, sr)
+    log_mel = waveform_to_log_mel(waveform, sr=sr)
+    ml_scores = classifier.predict(log_mel, waveform=waveform, sr=sr)
+    level, score = fuse_scores(rule_ratio, ml_scores)
+    return {
+        'detect_ultrasonic': lambda: detect_ultrasonic(waveform, sr),
+        'waveform_to_log_mel': lambda: waveform_to_log_mel(waveform, sr=sr),
+        'predict': lambda: classifier.predict(log_mel, waveform=waveform, sr=sr),
+        'fuse_scores': lambda: fuse_scores(rule_ratio, ml_scores),
+        'save_evidence': lambda: save_evidence(waveform, sr, ml_scores, rule_ratio, level, score,
+                                               base_dir=evidence_dir),
+    }
+
+
+def run(kinds, rates, lengths, stages, repeat, evidence_repeat, min_seconds, classifier, evidence_dir):
+    results = []
+    for clip, sr, waveform in synth.corpus(kinds, rates, lengths):
+        calls = stage_calls(waveform, sr, classifier, evidence_dir)
+        for stage in stages:
+            n = evidence_repeat if stage == 'save_evidence' else repeat
+            times = benchmark.time_call(calls[stage], repeat=n, warmup=1,
+                                        min_seconds=0.0 if stage == 'save_evidence' else min_seconds)
+            kind, _, _ = clip.split('_')
+            results.append(dict({'name': f'{stage}/{clip}', 'stage': stage, 'clip': clip, 'kind': kind,
+                                 'sr': sr, 'seconds': len(waveform) / sr}, **benchmark.summarize(times)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kinds", nargs="+", default=synth.KINDS, choices=synth.KINDS)
+    parser.add_argument("--rates", nargs="+", type=int, default=synth.SAMPLE_RATES)
+    parser.add_argument("--lengths", nargs="+", type=float, default=synth.LENGTHS, help="clip lengths in seconds")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per stage and clip")
+    parser.add_argument("--evidence-repeat", type=int, default=3, help="timed save_evidence calls per clip")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="least time spent timing a fast stage")
+    parser.add_argument("--model", default=config.MODEL_PATH, help="classifier weights (.onnx or .npz)")
+    parser.add_argument("--json", metavar="PATH", help="write the report as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="earlier JSON report to compare against")
+    parser.add_argument("--metric", default="p50_ms", help="metric used by --compare")
+    args = parser.parse_args()
+
+    classifier = CNNSpectrogramClassifier(model_path=args.model)
+    evidence_dir = tempfile.mkdtemp(prefix='wg-bench-evidence-')
+    try:
+        results = run(args.kinds, args.rates, args.lengths, args.stages, args.repeat, args.evidence_repeat,
+                      args.min_seconds, classifier, evidence_dir)
+    finally:
+        shutil.rmtree(evidence_dir, ignore_errors=True)
+
+    print(f"{'stage/clip':48s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'calls':>6s}")
+    for r in results:
+        print(f"{r['name']:48s} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f} {r['count']:6d}")
+
+    report = {'benchmark': 'stages', 'environment': benchmark.environment(),
+              'settings': {'repeat': args.repeat, 'evidence_repeat': args.evidence_repeat,
+                           'mel_backend': config.MEL_BACKEND, 'model': args.model},
+              'results': results}
+    if args.compare:
+        rows = benchmark.compare(benchmark.load_report(args.compare), report, metric=args.metric)
+        benchmark.print_comparison(rows, args.metric)
+    if args.json:
+        benchmark.save_report(report, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Write classifier weights as .npz (NumPy reference) and/or .onnx.
+
+Usage:
+    python scripts/export_model.py --weights trained.npz --onnx model.onnx
+    python scripts/export_model.py --random 0 --npz smoke.npz --onnx smoke.onnx
+
+One of --weights or --random is required: an .npz with PyTorch-style
+weight names (see `whisperguard.model.backends`), or randomly initialised
+weights for pipeline smoke tests. The ONNX model outputs probabilities
+and says so in its metadata. With both outputs the ONNX model is checked against
+the NumPy reference on a random batch.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# ensure project root is on sys.path so `import whisperguard` works
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from whisperguard.model.backends import NumpyCNN, OnnxBackend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--weights", help="input .npz weights")
+    src.add_argument("--random", type=int, metavar="SEED", help="random weights with this seed")
+    parser.add_argument("--npz", help="write NumPy reference weights here")
+    parser.add_argument("--onnx", help="write the ONNX model here")
+    args = parser.parse_args()
+
+    model = NumpyCNN.load(args.weights) if args.weights else NumpyCNN.random(args.random)
+    if args.npz:
+        model.save(args.npz)
+        print(f"wrote {args.npz}")
+    if args.onnx:
+        model.to_onnx(args.onnx)
+        print(f"wrote {args.onnx}")
+        x = np.random.default_rng(0).standard_normal((4, 1, 64, 87)).astype(np.float32)
+        diff = np.abs(OnnxBackend(args.onnx).forward(x) - model.forward(x)).max()
+        print(f"max |onnx - numpy| = {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""End-to-end load driver for POST /analyze.
+
+Usage:
+    python scripts/load_analyze.py                          # in-process (Flask test client)
+    python scripts/load_analyze.py --url http://localhost:5000 --requests 500 --concurrency 16
+    python scripts/load_analyze.py --kinds ultrasonic speech --lengths 1 5 --json load.json
+    python scripts/load_analyze.py --url http://localhost:5000 --compare load.json
+
+Posts WAV clips from the synthetic corpus (`whisperguard.synth`) from
+`--concurrency` threads until `--requests` have been sent (or for
+`--duration` seconds), and reports p50/p95/p99 latency overall and per
+clip kind, throughput, HTTP status counts and errors. Repeated clips are
+answered from the server's result cache; `--unique` changes the last
+sample of every request so each one is analyzed. Without `--url`
+the app runs in this process and its evidence goes to a temporary
+directory; against a server, alerts save evidence as usual.
+"""
+import argparse
+import collections
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# ensure project root is on sys.path so `import whisperguard` works
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from whisperguard import benchmark, synth
+
+
+def multipart(fields, files):
+    """Encode form fields and (name, filename, bytes) files; return (body, content type)."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, data in files:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: audio/wav\r\n\r\n'.encode() + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class HttpTarget:
+    def __init__(self, url, timeout=60.0):
+        self.url = url.rstrip('/') + '/analyze'
+        self.timeout = timeout
+
+    def post(self, clip_name, wav, sensitivity):
+        body, content_type = multipart({'sensitivity': sensitivity}, [('audio', f'{clip_name}.wav', wav)])
+        req = urllib.request.Request(self.url, data=body, headers={'Content-Type': content_type})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+class InProcessTarget:
+    def __init__(self, evidence_dir):
+        from whisperguard import web
+
+        # per-request debug logging would dominate the measurement
+        web.logger.setLevel(logging.WARNING)
+        web.evidence_writer.base_dir = evidence_dir
+        self.app = web.app
+        self._local = threading.local()
+
+    def post(self, clip_name, wav, sensitivity):
+        import io
+
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        resp = client.post('/analyze', data={'audio': (io.BytesIO(wav), f'{clip_name}.wav'),
+                                             'sensitivity': str(sensitivity)},
+                           content_type='multipart/form-data')
+        return resp.status_code
+
+
+def make_unique(wav, i):
+    """`wav` with its last 16-bit sample replaced by `i`, so its digest differs."""
+    return wav[:-2] + (i % 65536).to_bytes(2, 'little')
+
+
+def run(target, clips, requests, concurrency, duration, sensitivity, unique=False):
+    """Send the requests; return per-request (kind, seconds, audio seconds, status, error)."""
+    records = []
+    lock = threading.Lock()
+    counter = iter(range(requests if not duration else 1 << 62))
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None or (deadline and time.perf_counter() >= deadline):
+                return
+            name, kind, audio_seconds, wav = clips[i % len(clips)]
+            if unique:
+                wav = make_unique(wav, i)
+            t0 = time.perf_counter()
+            try:
+                status, error = target.post(name, wav, sensitivity), None
+            except Exception as e:
+                status, error = None, f'{type(e).__name__}: {e}'
+            elapsed = time.perf_counter() - t0
+            with lock:
+                records.append((kind, elapsed, audio_seconds, status, error))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return records, time.perf_counter() - started
+
+
+def build_report(records, wall, settings):
+    ok = [r for r in records if r[3] == 200]
+    by_kind = collections.defaultdict(list)
+    for kind, seconds, _, status, _ in ok:
+        by_kind[kind].append(seconds)
+    results = [dict({'name': 'analyze/all'}, **benchmark.summarize([r[1] for r in ok]))]
+    results += [dict({'name': f'analyze/{kind}'}, **benchmark.summarize(times)) for kind, times in sorted(by_kind.items())]
+    errors = collections.Counter(r[4] for r in records if r[4])
+    return {
+        'benchmark': 'load_analyze', 'environment': benchmark.environment(), 'settings': settings,
+        'wall_seconds': round(wall, 4),
+        'requests': len(records),
+        'throughput_rps': round(len(ok) / wall, 3) if wall else None,
+        'audio_seconds_per_second': round(sum(r[2] for r in ok) / wall, 3) if wall else None,
+        'status': {str(k): v for k, v in collections.Counter(r[3] for r in records).items()},
+        'errors': dict(errors.most_common(10)),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="server base URL (default: run the app in this process)")
+    parser.add_argument("--requests", type=int, default=200, help="requests to send")
+    parser.add_argument("--duration", type=float, default=None, help="send for this many seconds instead")
+    parser.add_argument("--concurrency", type=int, default=4, help="client threads")
+    parser.add_argument("--kinds", nargs="+", default=synth.KINDS, choices=synth.KINDS)
+    parser.add_argument("--rates", nargs="+", type=int, default=(44100,))
+    parser.add_argument("--lengths", nargs="+", type=float, default=(1.0,), help="clip lengths in seconds")
+    parser.add_argument("--sensitivity", type=float, default=0.5)
+    parser.add_argument("--unique", action="store_true", help="make every request distinct (defeats the result cache)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout with --url")
+    parser.add_argument("--json", metavar="PATH", help="write the report as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="earlier JSON report to compare against")
+    parser.add_argument("--metric", default="p95_ms", help="metric used by --compare")
+    args = parser.parse_args()
+
+    clips = [(name, name.split('_')[0], len(x) / sr, synth.wav_bytes(x, sr))
+             for name, sr, x in synth.corpus(args.kinds, args.rates, args.lengths)]
+    if not clips:
+        parser.error("no clips: ultrasonic kinds need a sample rate of at least 40000")
+
+    evidence_dir = None
+    if args.url:
+        target = HttpTarget(args.url, timeout=args.timeout)
+    else:
+        evidence_dir = tempfile.mkdtemp(prefix='wg-load-evidence-')
+        target = InProcessTarget(evidence_dir)
+    settings = {'target': args.url or 'in-process', 'requests': args.requests, 'duration': args.duration,
+                'concurrency': args.concurrency, 'clips': [c[0] for c in clips], 'sensitivity': args.sensitivity,
+                'unique': args.unique}
+    try:
+        print(f"Sending to {settings['target']}: {len(clips)} clips, {args.concurrency} threads...")
+        records, wall = run(target, clips, args.requests, args.concurrency, args.duration, args.sensitivity,
+                            unique=args.unique)
+    finally:
+        if evidence_dir:
+            # let queued evidence finish before removing its directory
+            from whisperguard import web
+            web.evidence_writer.shutdown()
+            shutil.rmtree(evidence_dir, ignore_errors=True)
+
+    report = build_report(records, wall, settings)
+    print(f"{report['requests']} requests in {report['wall_seconds']:.2f}s: {report['throughput_rps']} req/s, "
+          f"{report['audio_seconds_per_second']} s of audio/s, status {report['status']}")
+    for name, count in report['errors'].items():
+        print(f"  error x{count}: {name}")
+    print(f"{'':24s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'count':>6s}")
+    for r in report['results']:
+        if r['count']:
+            print(f"{r['name']:24s} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f} {r['count']:6d}")
+
+    if args.compare:
+        rows = benchmark.compare(benchmark.load_report(args.compare), report, metric=args.metric)
+        benchmark.print_comparison(rows, args.metric)
+    if args.json:
+        benchmark.save_report(report, args.json)
+
+
+if __name__ == "__main__":
+    main()
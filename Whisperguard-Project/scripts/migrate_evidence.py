@@ -0,0 +1,39 @@
+"""Move legacy flat `event_<ts>` evidence folders into the sharded layout.
+
+Usage: python scripts/migrate_evidence.py [--base-dir DIR] [--dry-run]
+
+Folders are renamed into `YYYY/MM/DD/<event_id>/` with new unique event IDs
+(see `whisperguard.storage`) and the evidence index is updated to match.
+"""
+import argparse
+import os
+import sys
+
+# ensure project root is on sys.path so `import whisperguard` works
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from whisperguard.evidence_index import EvidenceIndex
+from whisperguard.storage import migrate_flat_layout
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate flat evidence folders to the sharded layout")
+    parser.add_argument("--base-dir", default=os.path.join(ROOT, 'whisperguard', 'static', 'evidence'),
+                        help="evidence base directory")
+    parser.add_argument("--dry-run", action="store_true", help="print the moves without performing them")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.base_dir):
+        print(f"No evidence directory at {args.base_dir}")
+        return
+    index = None if args.dry_run else EvidenceIndex.for_dir(args.base_dir)
+    moved = migrate_flat_layout(args.base_dir, dry_run=args.dry_run, index=index)
+    for old, new in moved:
+        print(f"{old} -> {new}")
+    print(f"{'Would move' if args.dry_run else 'Moved'} {len(moved)} folders")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Checks for the classifier inference backends and micro-batching."""
+import threading
+
+import numpy as np
+import pytest
+
+from whisperguard.model.backends import NumpyCNN, conv2d_same
+from whisperguard.model.batcher import MicroBatcher
+from whisperguard.model.cnn import CNNSpectrogramClassifier
+
+
+def test_conv2d_matches_direct_loop():
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((2, 3, 5, 6)).astype(np.float32)
+    w = rng.standard_normal((4, 3, 3, 3)).astype(np.float32)
+    b = rng.standard_normal(4).astype(np.float32)
+    xp = np.pad(x, ((0, 0), (0, 0), (1, 1), (1, 1)))
+    ref = np.zeros((2, 4, 5, 6), dtype=np.float32)
+    for i in range(5):
+        for j in range(6):
+            ref[:, :, i, j] = np.einsum('bcij,ocij->bo', xp[:, :, i:i + 3, j:j + 3], w) + b
+    assert np.allclose(conv2d_same(x, w, b), ref, atol=1e-5)
+
+
+def test_onnx_export_matches_numpy_reference(tmp_path):
+    onnx = pytest.importorskip('onnx')
+    pytest.importorskip('onnxruntime')
+    from whisperguard.model.backends import OnnxBackend
+
+    model = NumpyCNN.random(seed=1)
+    path = str(tmp_path / 'model.onnx')
+    model.to_onnx(path)
+    x = np.random.default_rng(2).standard_normal((3, 1, 64, 87)).astype(np.float32)
+    backend = OnnxBackend(path)
+    assert np.allclose(backend.forward(x), model.forward(x), atol=1e-5)
+    assert backend.output == 'probs'
+
+    # a logits model without the metadata is read by its output name
+    proto = onnx.load(path)
+    del proto.metadata_props[:]
+    del proto.graph.node[-1]
+    proto.graph.output[0].name = 'logits'
+    onnx.save(proto, path)
+    backend = OnnxBackend(path)
+    assert np.allclose(backend.forward(x), model.forward(x), atol=1e-5)
+    assert backend.output == 'logits'
+
+
+def test_concurrent_predictions_are_batched():
+    model = NumpyCNN.random(seed=0)
+    clf = CNNSpectrogramClassifier(backend=model, max_batch=8, max_wait_ms=50)
+    rng = np.random.default_rng(3)
+    inputs = [rng.uniform(-80, 0, (64, 87)) for _ in range(8)]
+    results = [None] * 8
+
+    def run(i):
+        results[i] = clf.predict(inputs[i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert clf.batcher.stats()['batches'] < 8
+    for x, scores in zip(inputs, results):
+        expected = model.forward((x[np.newaxis, np.newaxis] + 40.0) / 40.0)[0]
+        assert np.allclose(list(scores.values()), expected, atol=1e-5)
+
+
+def test_batcher_propagates_errors():
+    def fail(batch):
+        raise RuntimeError('boom')
+
+    batcher = MicroBatcher(fail, max_batch=4, max_wait_ms=1)
+    with pytest.raises(RuntimeError, match='boom'):
+        batcher(np.zeros(3))
@@ -0,0 +1,31 @@
+"""Checks for batch and streaming analysis of recorded audio."""
+import io
+
+import numpy as np
+import soundfile as sf
+
+from whisperguard.batch import analyze_waveform, iter_window_batches, stream_timeline
+
+
+def _wav(x, sr):
+    buf = io.BytesIO()
+    sf.write(buf, x, sr, format='WAV', subtype='FLOAT')
+    buf.seek(0)
+    return buf
+
+
+def test_stream_timeline_matches_in_memory_analysis():
+    sr = 16000
+    rng = np.random.default_rng(0)
+    x = (rng.standard_normal(int(sr * 5.5)) * 0.1).astype('float32')
+    stereo = np.stack([x, x], axis=1)
+
+    batches = list(iter_window_batches(_wav(stereo, sr), window_seconds=1.0, batch_windows=4))
+    assert [(i, w.shape[0]) for i, w, _ in batches] == [(0, 4), (4, 2)]
+
+    streamed = [r for r, _ in stream_timeline(_wav(stereo, sr), batch_windows=4)]
+    direct = analyze_waveform(x, sr)
+    assert [r['offset'] for r in streamed] == [r['offset'] for r in direct]
+    for a, b in zip(streamed, direct):
+        assert a['level'] == b['level']
+        assert np.isclose(a['score'], b['score'])
@@ -0,0 +1,43 @@
+"""Checks for the content-addressed analysis result cache."""
+import io
+import time
+
+import numpy as np
+
+from whisperguard.cache import ResultCache, analysis_key, digest_pcm, digest_stream
+
+
+def test_keys_follow_content_and_settings():
+    x = np.random.default_rng(0).standard_normal(1000).astype(np.float32)
+    key = analysis_key('pcm', digest_pcm(x, 44100), sensitivity=0.5, model='heuristic')
+    assert key == analysis_key('pcm', digest_pcm(x.copy(), 44100), model='heuristic', sensitivity=0.5)
+    assert key != analysis_key('pcm', digest_pcm(x, 48000), sensitivity=0.5, model='heuristic')
+    assert key != analysis_key('pcm', digest_pcm(x, 44100), sensitivity=0.6, model='heuristic')
+    stream = io.BytesIO(b'RIFF' + bytes(5000))
+    stream.read(10)
+    assert digest_stream(stream) == digest_stream(io.BytesIO(b'RIFF' + bytes(5000)))
+    assert stream.tell() == 0
+
+
+def test_lru_and_ttl_eviction():
+    cache = ResultCache(max_entries=2, ttl=0.05)
+    cache.put('a', {'level': 'SAFE'})
+    cache.put('b', {'level': 'THREAT'})
+    assert cache.get('a') == {'level': 'SAFE'}
+    cache.put('c', {'level': 'SAFE'})
+    assert cache.get('b') is None
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['expired']) == (1, 2, 1, 1)
+
+
+def test_disk_entries_are_shared(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    ResultCache(max_entries=2, path=path).put('k', {'score': 0.9, 'evidence_id': 'e1'})
+    other = ResultCache(max_entries=2, path=path)
+    assert other.get('k') == {'score': 0.9, 'evidence_id': 'e1'}
+    assert other.stats()['disk_hits'] == 1
+    for key in ('x', 'y'):
+        other.put(key, {})
+    assert ResultCache(path=path).get('k') is None
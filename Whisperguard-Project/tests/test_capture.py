@@ -1,4 +1,6 @@
 """Simple smoke test for audio capture (may require microphone)."""
+import numpy as np
+
 from whisperguard.audio.capture import AudioCapture
 
 
@@ -7,3 +9,37 @@ def test_capture_short():
     # This test only verifies that the object can be created and methods run.
     # It does not start the stream automatically in CI environments.
     assert ac.chunk_seconds == 1
+
+
+def test_read_window_skips_overwritten_windows_and_normalizes():
+    ac = AudioCapture(samplerate=100, chunk_seconds=1, hop_seconds=0.25, buffer_seconds=3)
+    ramp = np.arange(1, 501, dtype=np.float32)[:, np.newaxis]
+    ac._callback(ramp[:150], 150, None, None)
+    first = ac.read_window(timeout=0)
+    # peak-normalized like queue-mode chunks, as a writable copy
+    assert first.flags.writeable and first.max() == 1.0
+    assert np.allclose(first[:, 0], ramp[:100, 0] / 100)
+    # fall 3.5 s behind a 3 s ring: skip to the oldest window that keeps a hop of slack
+    ac._callback(ramp[150:], 350, None, None)
+    window = ac.read_window(timeout=0, normalize=False)
+    assert ac.overruns == 8 and not window.flags.writeable
+    assert np.array_equal(window[:, 0], ramp[225:325, 0])
+    assert ac.read_window(timeout=0) is not None
+
+
+def test_silent_windows_are_normalized_to_a_copy():
+    ac = AudioCapture(samplerate=100, chunk_seconds=1, hop_seconds=0.5, buffer_seconds=3)
+    ac._callback(np.zeros((100, 1), dtype=np.float32), 100, None, None)
+    window = ac.read_window(timeout=0)
+    assert window.flags.writeable and not np.shares_memory(window, ac.ring._buf)
+
+
+def test_unnormalized_hops_join_into_the_raw_signal():
+    ac = AudioCapture(samplerate=100, chunk_seconds=0.25, hop_seconds=0.25,
+                      buffer_seconds=2, normalize=False)
+    # loud hop then quiet hop: per-hop normalization would make them equal
+    signal = np.concatenate([np.full(25, 0.8), np.full(25, 0.1)]).astype(np.float32)
+    ac._callback(signal[:, np.newaxis], 50, None, None)
+    hops = [ac.read_chunk(timeout=0) for _ in range(2)]
+    assert all(h.flags.writeable for h in hops)
+    assert np.array_equal(np.concatenate(hops)[:, 0], signal)
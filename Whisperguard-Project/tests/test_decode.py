@@ -0,0 +1,117 @@
+"""Checks for upload format sniffing and in-memory decoding."""
+import io
+import sys
+import tracemalloc
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from whisperguard import decode
+from whisperguard.batch import stream_timeline
+from whisperguard.decode import DecodeError, FFmpegPool, PCMStream, decode_bytes, sniff_format
+
+
+def test_sniff_format():
+    buf = io.BytesIO()
+    sf.write(buf, np.zeros(100, dtype='float32'), 16000, format='WAV')
+    assert sniff_format(buf.getvalue()) == 'wav'
+    buf = io.BytesIO()
+    sf.write(buf, np.zeros(100, dtype='float32'), 16000, format='FLAC')
+    assert sniff_format(buf.getvalue()) == 'flac'
+    assert sniff_format(b'\x1a\x45\xdf\xa3\x9f\x42\x86\x81') == 'webm'
+    assert sniff_format(b'ID3\x04\x00') == 'mp3'
+    assert sniff_format(b'\x00\x00\x00\x20ftypM4A ') == 'mp4'
+    assert sniff_format(b'hello') is None
+
+
+def test_decode_wav_from_memory():
+    x = np.linspace(-0.5, 0.5, 800, dtype='float32')
+    buf = io.BytesIO()
+    sf.write(buf, x, 8000, format='WAV', subtype='FLOAT')
+    data, sr = decode_bytes(buf.getvalue())
+    assert sr == 8000
+    assert np.allclose(data, x)
+
+
+def _fake_ffmpeg(tmp_path):
+    # stands in for ffmpeg: passes float32 samples straight through
+    fake = tmp_path / 'ffmpeg'
+    fake.write_text(f'#!{sys.executable}\nimport shutil, sys\nshutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer, 4096)\n')
+    fake.chmod(0o755)
+    return str(fake)
+
+
+def test_pool_refuses_work_after_close(tmp_path):
+    fake = _fake_ffmpeg(tmp_path)
+    pool = FFmpegPool(size=1, sr=8000, ffmpeg=fake)
+    x = np.arange(16, dtype='<f4')
+    data, sr = pool.decode(x.tobytes())
+    assert sr == 8000 and np.array_equal(data, x)
+    pool.close()
+    with pytest.raises(DecodeError):
+        pool.decode(x.tobytes())
+    # a refill finishing after close() kills its process instead of keeping it
+    pool._refill()
+    assert pool._idle.empty()
+
+
+def test_pool_burst_does_not_grow_past_size(tmp_path):
+    pool = FFmpegPool(size=1, sr=8000, ffmpeg=_fake_ffmpeg(tmp_path))
+    busy = [pool._take() for _ in range(4)]
+    # late refills from the burst find the pool already full
+    for _ in range(4):
+        pool._refill()
+    assert pool._idle.qsize() == 1
+    pool.close()
+    for proc in busy:
+        proc.kill()
+        proc.wait()
+
+
+def _write_mka(path, seconds, sr=16000):
+    av = pytest.importorskip('av')
+    rng = np.random.default_rng(0)
+    with av.open(str(path), 'w', format='matroska') as out:
+        stream = out.add_stream('pcm_f32le', rate=sr, layout='mono')
+        for _ in range(seconds):
+            frame = av.AudioFrame.from_ndarray((rng.standard_normal((1, sr)) * 0.1).astype(np.float32),
+                                               format='flt', layout='mono')
+            frame.sample_rate = sr
+            for packet in stream.encode(frame):
+                out.mux(packet)
+        for packet in stream.encode(None):
+            out.mux(packet)
+
+
+def _peak_streaming(path):
+    tracemalloc.start()
+    try:
+        with open(path, 'rb') as f:
+            windows = sum(1 for _ in stream_timeline(PCMStream(f)))
+        return windows, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_long_encoded_upload_streams_in_bounded_memory(tmp_path):
+    # matroska sniffs as webm, so it takes the decoder path, not soundfile
+    _write_mka(tmp_path / 'short.mka', 30)
+    _write_mka(tmp_path / 'long.mka', 600)
+    with open(tmp_path / 'long.mka', 'rb') as f:
+        assert sniff_format(f.read(16)) == 'webm'
+    short_windows, short_peak = _peak_streaming(tmp_path / 'short.mka')
+    long_windows, long_peak = _peak_streaming(tmp_path / 'long.mka')
+    assert (short_windows, long_windows) == (30, 600)
+    # 600 s decodes to 38 MB of float32; the peak does not grow with length
+    assert long_peak < 1.2 * short_peak and long_peak < 20e6
+
+
+def test_pcm_stream_feeds_ffmpeg_in_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(decode, '_HAS_AV', False)
+    x = np.arange(10001, dtype='<f4')
+    pcm = PCMStream(io.BytesIO(x.tobytes()), sr=8000, block_bytes=1001, ffmpeg=_fake_ffmpeg(tmp_path))
+    blocks = list(pcm)
+    assert pcm.sr == 8000 and np.array_equal(np.concatenate(blocks), x)
+    with pytest.raises(DecodeError):
+        list(PCMStream(io.BytesIO(b''), ffmpeg=_fake_ffmpeg(tmp_path)))
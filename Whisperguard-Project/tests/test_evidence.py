@@ -0,0 +1,56 @@
+"""Checks for publishing evidence packages atomically."""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pytest
+
+from whisperguard import evidence
+from whisperguard.evidence import save_evidence
+from whisperguard.evidence_index import EvidenceIndex
+from whisperguard.storage import event_dir
+
+
+def _waveform():
+    return (np.random.default_rng(0).standard_normal(4410) * 0.1).astype(np.float32)
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_hashes_and_checksums_match_the_files(tmp_path):
+    result = save_evidence(_waveform(), 44100, {'Normal': 0.5}, 0.1, 'THREAT', 0.9, base_dir=str(tmp_path))
+    folder = event_dir(str(tmp_path), result['id'])
+    with open(os.path.join(folder, 'metadata.json')) as f:
+        meta = json.load(f)
+    for name, info in meta['artifacts'].items():
+        path = os.path.join(folder, name)
+        assert info == {'sha256': _sha256(path), 'bytes': os.path.getsize(path)}
+        assert result['hashes'][name] == info['sha256']
+    assert meta['fingerprint'] == _sha256(os.path.join(folder, 'audio.wav'))
+
+    with open(os.path.join(folder, 'checksums.sha256')) as f:
+        lines = [line.split('  ') for line in f.read().splitlines()]
+    names = [name for _, name in lines]
+    assert sorted(names) == sorted(n for n in os.listdir(folder) if n != 'checksums.sha256')
+    assert all(digest == _sha256(os.path.join(folder, name)) for digest, name in lines)
+    # only the published folder is left next to it
+    assert os.listdir(os.path.dirname(folder)) == [result['id']]
+
+
+def test_failed_write_publishes_nothing(tmp_path, monkeypatch):
+    def fail(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(evidence.os, 'rename', fail)
+    with pytest.raises(OSError):
+        save_evidence(_waveform(), 44100, {'Normal': 0.5}, 0.1, 'THREAT', 0.9, base_dir=str(tmp_path),
+                      event_id='20261018T000000000000-1-000001')
+    monkeypatch.undo()
+    parent = os.path.dirname(event_dir(str(tmp_path), '20261018T000000000000-1-000001'))
+    # neither the package nor its staging folder is left behind, and nothing is indexed
+    assert os.listdir(parent) == []
+    assert EvidenceIndex.for_dir(str(tmp_path)).usage()[0] == 0
@@ -0,0 +1,38 @@
+"""Checks for the SQLite evidence index."""
+import pytest
+
+from whisperguard.evidence_index import EvidenceIndex, decode_cursor, encode_cursor
+
+
+def _meta(i, level='THREAT', score=0.9):
+    return {'id': f'event_{i}', 'ts': 1000.0 + i, 'level': level, 'score': score, 'rule_ratio': 0.1}
+
+
+def test_pagination_filters_and_revision(tmp_path):
+    index = EvidenceIndex.for_dir(str(tmp_path))
+    assert index.revision() == 0
+    for i in range(5):
+        index.add(_meta(i, level='SUSPICIOUS' if i % 2 else 'THREAT', score=0.5 + i / 10),
+                  f'event_{i}', ['audio.wav', 'metadata.json'])
+    assert index.revision() == 5
+
+    page, cursor = index.query(limit=2)
+    assert [e['name'] for e in page] == ['event_4', 'event_3']
+    page, cursor = index.query(limit=2, cursor=cursor)
+    assert [e['name'] for e in page] == ['event_2', 'event_1']
+    page, cursor = index.query(limit=2, cursor=cursor)
+    assert [e['name'] for e in page] == ['event_0'] and cursor is None
+
+    page, _ = index.query(levels=['THREAT'], min_score=0.6)
+    assert [e['name'] for e in page] == ['event_4', 'event_2']
+    page, _ = index.query(since=1001, until=1003)
+    assert [e['name'] for e in page] == ['event_2', 'event_1']
+
+    assert index.remove('event_4') and index.revision() == 6
+
+
+def test_malformed_cursors_are_rejected():
+    assert decode_cursor(encode_cursor(1000.5, 'event_1')) == (1000.5, 'event_1')
+    for cursor in ('abc:def', '1000.5', '1000.5:', 'nan:event_1'):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
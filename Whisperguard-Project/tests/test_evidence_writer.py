@@ -0,0 +1,81 @@
+"""Checks for the queued evidence writer: bound, full-queue policies, counters and job states."""
+import shutil
+
+import numpy as np
+import pytest
+
+from whisperguard.evidence_writer import EvidenceWriter
+from whisperguard.storage import event_dir
+
+
+def _submit(writer, score, level='THREAT'):
+    x = np.zeros(4410, dtype=np.float32)
+    return writer.submit(x, 44100, {'Normal': 1.0 - score}, 0.1, level, score)
+
+
+def _held(tmp_path, policy, max_pending=2):
+    # a writer whose pool is busy, so every job stays pending
+    writer = EvidenceWriter(workers=1, max_pending=max_pending, policy=policy, base_dir=str(tmp_path))
+    writer._inflight = writer.workers
+    return writer
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        EvidenceWriter(policy='drop_all')
+
+
+@pytest.mark.parametrize('policy', ['drop_newest', 'drop_oldest'])
+def test_full_queue_drops(tmp_path, policy):
+    writer = _held(tmp_path, policy)
+    ids = [_submit(writer, 0.5 + i / 10) for i in range(3)]
+    assert len(set(ids)) == 3
+    dropped = ids[2] if policy == 'drop_newest' else ids[0]
+    assert [writer.status(i)['state'] for i in ids].count('queued') == 2
+    assert writer.status(dropped)['state'] == 'dropped'
+    stats = writer.stats()
+    assert (stats['pending'], stats['submitted'], stats['dropped']) == (2, 3, 1)
+
+
+def test_full_queue_coalesces_into_newest_pending_job(tmp_path):
+    writer = _held(tmp_path, 'coalesce')
+    first, second = _submit(writer, 0.6), _submit(writer, 0.7)
+    assert _submit(writer, 0.95) == second
+    assert _submit(writer, 0.8) == second
+    job = writer.status(second)
+    assert (job['state'], job['score'], job['coalesced']) == ('queued', 0.95, 2)
+    assert writer.status(first)['score'] == 0.6
+    stats = writer.stats()
+    assert (stats['pending'], stats['submitted'], stats['coalesced'], stats['dropped']) == (2, 4, 2, 0)
+
+
+def test_pool_writes_and_reports_states(tmp_path):
+    writer = EvidenceWriter(workers=1, max_pending=4, base_dir=str(tmp_path))
+    try:
+        ids = [_submit(writer, 0.9) for _ in range(3)]
+        assert writer.status(ids[-1])['state'] == 'queued'
+        assert writer.flush(timeout=60)
+        assert [writer.status(i)['state'] for i in ids] == ['ready'] * 3
+        stats = writer.stats()
+        assert (stats['submitted'], stats['written'], stats['failed'], stats['inflight']) == (3, 3, 0, 0)
+    finally:
+        writer.shutdown()
+    shutil.rmtree(event_dir(str(tmp_path), ids[0]))
+    assert writer.status(ids[0])['state'] == 'deleted'
+    # another process's package is found on disk
+    other = EvidenceWriter(workers=0, base_dir=str(tmp_path))
+    assert other.status(ids[1])['state'] == 'ready'
+    assert other.status(ids[0]) is None and other.status('../etc') is None
+
+
+def test_inline_writer_counts_each_job_once(tmp_path):
+    writer = EvidenceWriter(workers=0, base_dir=str(tmp_path))
+    assert writer.status(_submit(writer, 0.9))['state'] == 'ready'
+    assert (writer.stats()['submitted'], writer.stats()['written']) == (1, 1)
+    # a base directory that is a file cannot hold evidence
+    (tmp_path / 'file').write_text('')
+    broken = EvidenceWriter(workers=0, base_dir=str(tmp_path / 'file'))
+    job = broken.status(_submit(broken, 0.9))
+    assert job['state'] == 'failed' and job['error']
+    stats = broken.stats()
+    assert (stats['submitted'], stats['written'], stats['failed']) == (1, 0, 1)
@@ -0,0 +1,72 @@
+"""Checks for the shared single-FFT feature frontend."""
+import numpy as np
+import pytest
+
+from whisperguard.detection.ultrasonic import detect_ultrasonic
+from whisperguard.model import spectrogram
+from whisperguard.model.features import MelFrontend, extract_features, extract_features_batch, slaney_mel_filterbank
+
+
+def _tone(freq, sr=44100, seconds=1.0):
+    t = np.arange(int(sr * seconds)) / sr
+    return (0.5 * np.sin(2 * np.pi * freq * t)).astype('float32')
+
+
+def test_ultrasonic_ratio_from_features():
+    sr = 44100
+    feats = extract_features(_tone(19000, sr), sr=sr)
+    ratio, flag = detect_ultrasonic(None, sr, features=feats)
+    assert flag and ratio > 0.9
+
+    feats = extract_features(_tone(1000, sr), sr=sr)
+    ratio, flag = detect_ultrasonic(None, sr, features=feats)
+    assert not flag and ratio < 0.01
+
+
+def test_log_mel_matches_librosa():
+    pytest.importorskip('librosa')
+    sr = 44100
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal(sr).astype('float32') * 0.1
+    feats = extract_features(x, sr=sr)
+    ref = spectrogram.waveform_to_log_mel(x, sr=sr, backend='librosa')
+    assert feats.log_mel.shape == ref.shape
+    assert np.allclose(feats.log_mel, ref, atol=1e-3)
+
+
+def test_numpy_filterbank_matches_librosa():
+    librosa = pytest.importorskip('librosa')
+
+    for sr, n_fft, n_mels in [(44100, 1024, 64), (16000, 512, 40), (48000, 2048, 128)]:
+        ours = slaney_mel_filterbank(sr, n_fft, n_mels)
+        ref = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+        assert ours.dtype == ref.dtype
+        assert np.allclose(ours, ref, rtol=1e-6, atol=1e-9)
+
+
+def test_frontend_reuses_buffers():
+    sr = 16000
+    rng = np.random.default_rng(2)
+    frontend = MelFrontend(sr, sr=sr)
+    first = frontend.compute(rng.standard_normal(sr) * 0.1)
+    x = _tone(5000, sr)
+    second = frontend.compute(x)
+    assert second.log_mel is first.log_mel
+    ref = extract_features(x, sr=sr)
+    assert np.allclose(second.log_mel, ref.log_mel)
+    assert np.allclose(second.power, ref.power)
+    assert np.isclose(second.rule_ratio, ref.rule_ratio)
+
+
+def test_batch_matches_single_chunks():
+    sr = 44100
+    rng = np.random.default_rng(1)
+    chunks = np.stack([_tone(19000, sr), _tone(1000, sr), rng.standard_normal(sr).astype('float32') * 0.1])
+    batch = extract_features_batch(chunks, sr=sr)
+    assert len(batch) == 3
+    for i, x in enumerate(chunks):
+        single = extract_features(x, sr=sr)
+        assert np.allclose(batch.power[i], single.power)
+        assert np.isclose(batch.rule_ratios[i], single.rule_ratio)
+        if single.log_mel is not None:
+            assert np.allclose(batch.log_mel[i], single.log_mel)
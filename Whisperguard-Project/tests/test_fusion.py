@@ -0,0 +1,38 @@
+"""Checks that the vectorized classifier and fusion match the single-chunk API."""
+import numpy as np
+
+from whisperguard.fusion import fuse_batch, fuse_scores
+from whisperguard.model.backends import CLASSES
+from whisperguard.model.cnn import CNNSpectrogramClassifier
+from whisperguard.model.features import extract_features_batch
+
+
+def test_fuse_batch_matches_fuse_scores():
+    rng = np.random.default_rng(0)
+    rules = rng.random(200)
+    probs = rng.random((200, 4))
+    for sensitivity in (0.0, 0.5, 1.0):
+        levels, combined = fuse_batch(rules, probs, sensitivity=sensitivity)
+        for i in range(200):
+            level, score = fuse_scores(rules[i], dict(zip(CLASSES, probs[i])), sensitivity=sensitivity)
+            assert (level, score) == (levels[i], combined[i])
+    levels, combined = fuse_batch(rules, probs, whitelist=True)
+    assert set(levels) == {'SAFE'} and not combined.any()
+
+
+def test_predict_batch_matches_predict():
+    sr = 44100
+    t = np.arange(sr) / sr
+    rng = np.random.default_rng(1)
+    chunks = np.stack([np.sin(2 * np.pi * 19000 * t), np.sin(2 * np.pi * 1000 * t),
+                       rng.standard_normal(sr) * 0.1]).astype(np.float32)
+    feats = extract_features_batch(chunks, sr=sr)
+    clf = CNNSpectrogramClassifier()
+    from_mel = clf.predict_batch(feats.log_mel)
+    from_bands = clf.predict_batch(None, features=feats)
+    assert from_mel.shape == (3, 4)
+    for i in range(3):
+        item = feats[i]
+        if item.log_mel is not None:
+            assert np.allclose(list(clf.predict(item.log_mel).values()), from_mel[i])
+        assert np.allclose(list(clf.predict(None, features=item).values()), from_bands[i])
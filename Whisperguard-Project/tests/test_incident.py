@@ -0,0 +1,102 @@
+"""Checks for coalescing alerting decisions into incidents."""
+import json
+
+import numpy as np
+
+from whisperguard.evidence import save_evidence
+from whisperguard.incident import IncidentTracker, metadata
+from whisperguard.model.backends import CLASSES
+from whisperguard.session import StreamSession
+
+
+def _decision(level, score):
+    return {'level': level, 'score': score, 'rule_ratio': score, 'ml_scores': {'Normal': 1.0}}
+
+
+def test_one_incident_with_pre_and_post_roll(tmp_path):
+    sr = 1000
+    tracker = IncidentTracker(sr, window_seconds=1.0, pre_roll=1.0, post_roll=2.0)
+    stream = np.arange(12 * sr, dtype=np.float32)
+    levels = ['SAFE'] * 3 + ['SUSPICIOUS', 'THREAT', 'THREAT', 'SUSPICIOUS', 'THREAT'] + ['SAFE'] * 4
+    closed = []
+    for i, level in enumerate(levels):
+        tracker.feed(stream[i * sr:(i + 1) * sr])
+        incident = tracker.decide(_decision(level, 0.9 if level == 'THREAT' else 0.5 if level != 'SAFE' else 0.0))
+        if incident is not None:
+            closed.append(incident)
+    assert len(closed) == 1
+    incident = closed[0]
+    # first hit's window is [3, 4) s, last hit ends at 8 s
+    assert (incident['start'], incident['end']) == (2.0, 10.0)
+    assert np.array_equal(incident['audio'], stream[2 * sr:10 * sr])
+    assert (incident['level'], incident['hits'], incident['decisions'], incident['reason']) == ('THREAT', 5, 6, 'quiet')
+    assert [t['level'] for t in incident['timeline']][:2] == ['SUSPICIOUS', 'THREAT']
+
+    evidence = save_evidence(incident['audio'], sr, incident['ml_scores'], incident['rule_ratio'],
+                             incident['level'], incident['score'], base_dir=str(tmp_path),
+                             incident=metadata(incident))
+    [path] = tmp_path.glob(f"**/{evidence['id']}/metadata.json")
+    meta = json.loads(path.read_text())
+    assert meta['duration'] == 8.0 and len(meta['incident']['timeline']) == 6
+
+
+def test_hysteresis_and_max_length():
+    sr = 1000
+    tracker = IncidentTracker(sr, pre_roll=0.0, post_roll=1.0, max_seconds=5.0)
+    closed = []
+    # 0.4 is below the SUSPICIOUS threshold (0.45) but above the release score
+    for level, score in [('SUSPICIOUS', 0.5), ('SAFE', 0.4), ('SAFE', 0.4), ('SUSPICIOUS', 0.5)] + [('THREAT', 0.9)] * 4:
+        tracker.feed(np.zeros(sr))
+        closed.append(tracker.decide(_decision(level, score)))
+    closed = [c for c in closed if c is not None]
+    assert [c['reason'] for c in closed] == ['max_length']
+    assert tracker.current is not None
+    last = tracker.flush()
+    assert last['reason'] == 'flush' and tracker.flush() is None
+    assert tracker.stats() == {'opened': 2, 'closed': 2, 'open': False}
+
+
+class NormalClassifier:
+    def predict_batch(self, log_mels, features=None):
+        probs = np.zeros((len(log_mels), len(CLASSES)))
+        probs[:, 0] = 1.0
+        return probs
+
+
+def test_session_reports_one_incident_per_burst():
+    sr = 44100
+    t = np.arange(sr * 8) / sr
+    x = (np.random.default_rng(0).standard_normal(len(t)) * 0.01).astype('<f4')
+    x[sr * 2:sr * 4] += (0.4 * np.sin(2 * np.pi * 19000 * t[sr * 2:sr * 4])).astype('<f4')
+    for hop in (None, 0.25):
+        incidents = []
+        session = StreamSession(sr, hop_seconds=hop, classifier=NormalClassifier(),
+                                on_incident=lambda s, inc: incidents.append(inc) or {'n': len(incidents)},
+                                incident_options={'pre_roll': 0.5, 'post_roll': 1.0})
+        data = x.tobytes()
+        results = []
+        for i in range(0, len(data), 17640):
+            results += session.feed(data[i:i + 17640])
+        session.close()
+        assert len(incidents) == 1
+        assert incidents[0]['hits'] >= 2 and 0.5 <= incidents[0]['start'] <= 1.5
+        assert len(incidents[0]['audio']) == round(incidents[0]['duration'] * sr)
+        assert [r['incident'] for r in results if 'incident' in r] == [{'n': 1}]
+
+
+def test_gap_closes_incident_without_splicing():
+    sr = 1000
+    tracker = IncidentTracker(sr, pre_roll=1.0, post_roll=2.0)
+    stream = np.arange(10 * sr, dtype=np.float32)
+    for i, level in enumerate(['SAFE', 'THREAT']):
+        tracker.feed(stream[i * sr:(i + 1) * sr])
+        assert tracker.decide(_decision(level, 0.9 if level == 'THREAT' else 0.0)) is None
+    # seconds 2-4 were muted
+    incident = tracker.gap(3 * sr)
+    assert incident['reason'] == 'gap' and np.array_equal(incident['audio'], stream[:2 * sr])
+    tracker.feed(stream[5 * sr:6 * sr])
+    tracker.decide(_decision('THREAT', 0.9))
+    last = tracker.flush()
+    # times keep counting through the gap; no pre-roll from before it
+    assert (last['start'], last['end']) == (5.0, 6.0)
+    assert np.array_equal(last['audio'], stream[5 * sr:6 * sr])
@@ -0,0 +1,57 @@
+"""Checks for the bounded, persistent event store."""
+import multiprocessing
+
+from whisperguard.logger import EventLogger
+
+
+def test_ring_is_bounded_and_since_returns_only_new_events():
+    log = EventLogger(maxlen=3)
+    for i in range(5):
+        log.append({'level': 'THREAT' if i % 2 else 'SUSPICIOUS', 'i': i})
+    assert [e['i'] for e in log.list()] == [2, 3, 4]
+    assert log.oldest() == 3 and log.cursor == 5
+    events, cursor = log.since(3)
+    assert [e['seq'] for e in events] == [4, 5] and cursor == 5
+    assert log.since(cursor) == ([], 5)
+    events, cursor = log.since(0, limit=2)
+    assert [e['seq'] for e in events] == [3, 4] and cursor == 4
+    assert log.counts() == {'SUSPICIOUS': 3, 'THREAT': 2, 'total': 5}
+
+
+def test_events_survive_restart_and_trimming(tmp_path):
+    path = str(tmp_path / 'events.sqlite3')
+    log = EventLogger(maxlen=3, path=path, max_file_events=4)
+    for i in range(11):
+        log.append({'level': 'THREAT', 'i': i})
+
+    restored = EventLogger(maxlen=3, path=path, max_file_events=4)
+    assert restored.cursor == 11 and restored.oldest() == 8
+    assert [e['i'] for e in restored.list()] == [8, 9, 10]
+    events, cursor = restored.since(0)
+    assert [e['seq'] for e in events] == [8, 9, 10, 11] and cursor == 11
+    assert restored.counts() == {'THREAT': 11, 'total': 11}
+    assert restored.append({'level': 'SUSPICIOUS'})['seq'] == 12
+
+
+def _append_from_worker(path, n):
+    log = EventLogger(path=path)
+    for i in range(n):
+        log.append({'level': 'SUSPICIOUS', 'worker': True, 'i': i})
+
+
+def test_worker_processes_share_one_ordering(tmp_path):
+    path = str(tmp_path / 'events.sqlite3')
+    log = EventLogger(path=path)
+    log.append({'level': 'THREAT'})
+    workers = [multiprocessing.Process(target=_append_from_worker, args=(path, 20)) for _ in range(2)]
+    for w in workers:
+        w.start()
+    for i in range(20):
+        log.append({'level': 'THREAT', 'i': i})
+    for w in workers:
+        w.join(30)
+    # a cursor handed out by one process covers the events of every other
+    events, cursor = log.since(1)
+    assert [e['seq'] for e in events] == list(range(2, 62)) and cursor == 61
+    assert sum(1 for e in events if e.get('worker')) == 40
+    assert EventLogger(path=path).counts() == {'THREAT': 21, 'SUSPICIOUS': 40, 'total': 61}
@@ -0,0 +1,48 @@
+"""Checks for the stage latency histograms and the sampling profiler."""
+import threading
+import time
+
+from whisperguard import metrics
+from whisperguard.profiler import SamplingProfiler
+
+
+def test_histogram_quantiles_and_prometheus_text():
+    metrics.reset()
+    for ms in range(1, 101):
+        metrics.observe('predict', ms / 1000.0)
+    with metrics.timer('fusion'):
+        pass
+    stats = metrics.summary()
+    assert stats['predict']['count'] == 100
+    assert abs(stats['predict']['mean_ms'] - 50.5) < 1e-6
+    assert 40 <= stats['predict']['p50_ms'] <= 60 and stats['predict']['p99_ms'] <= 100
+    assert stats['fusion']['count'] == 1
+
+    text = metrics.render_prometheus([('whisperguard_ready', 'gauge', 'Ready.', [({'pid': 1}, 1)])],
+                                     labels={'pid': 1})
+    assert 'whisperguard_stage_seconds_bucket{pid="1",stage="predict",le="+Inf"} 100' in text
+    assert 'whisperguard_stage_seconds_count{pid="1",stage="predict"} 100' in text
+    assert 'whisperguard_ready{pid="1"} 1' in text
+    metrics.reset()
+
+
+def _busy(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_profiler_samples_busy_threads_only():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy, args=(stop,))
+    idle = threading.Thread(target=stop.wait)
+    worker.start()
+    idle.start()
+    profiler = SamplingProfiler(interval=0.002).start()
+    time.sleep(0.2)
+    profiler.stop()
+    stop.set()
+    worker.join()
+    idle.join()
+    assert profiler.samples > 0
+    assert any('test_metrics:_busy' in stack for stack in profiler.stacks)
+    assert not any(stack.endswith('threading:wait') for stack in profiler.stacks)
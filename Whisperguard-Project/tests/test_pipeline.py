@@ -0,0 +1,108 @@
+"""Checks for the bounded queues linking pipeline stages."""
+import threading
+import time
+
+import numpy as np
+
+from whisperguard.pipeline import BoundedQueue, Pipeline
+
+
+def test_drop_oldest_keeps_newest_items():
+    q = BoundedQueue(2, 'drop_oldest')
+    for i in range(4):
+        assert q.put(i)
+    assert q.dropped == 2
+    assert [q.get(0), q.get(0), q.get(0)] == [2, 3, None]
+
+
+def test_drop_newest_rejects_when_full():
+    q = BoundedQueue(1, 'drop_newest')
+    assert q.put('a')
+    assert not q.put('b')
+    assert q.get(0) == 'a' and q.dropped == 1
+
+
+def test_get_waits_past_wakeups_that_find_nothing():
+    q = BoundedQueue(2)
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(q.get(None)))
+    waiter.start()
+    time.sleep(0.05)
+    with q._cond:
+        # a wakeup with nothing queued must not end the wait
+        q._cond.notify_all()
+    time.sleep(0.05)
+    assert not got
+    q.put('item')
+    waiter.join(2)
+    assert got == ['item']
+    start = time.monotonic()
+    assert q.get(0.1) is None and time.monotonic() - start >= 0.1
+
+
+class _Source:
+    """Chunks 1..n holding their own number, then nothing."""
+
+    def __init__(self, n):
+        self.items = [np.full(4, i, dtype=np.float32) for i in range(1, n + 1)]
+
+    def read_chunk(self, timeout=None):
+        if self.items:
+            return self.items.pop(0)
+        time.sleep(0.01)
+        return None
+
+
+def test_ordered_results_with_several_workers():
+    rng = np.random.default_rng(0)
+    delays = rng.uniform(0, 0.01, 200)
+
+    def analyze(chunk):
+        n = int(chunk[0])
+        time.sleep(delays[n])
+        # every 17th chunk fails analysis and leaves a gap
+        if n % 17 == 0:
+            raise RuntimeError('bad chunk')
+        return {'n': n}
+
+    seen = []
+    pipeline = Pipeline(_Source(120), analyze, seen.append, workers=4, queue_size=200,
+                        backpressure='block', ordered=True)
+    pipeline.start()
+    deadline = time.time() + 10
+    while len(seen) < 113 and time.time() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+    assert [r['n'] for r in seen] == [n for n in range(1, 121) if n % 17]
+    assert [r['seq'] for r in seen] == [r['n'] for r in seen]
+    assert [r['n'] for r in seen if r['gap']] == list(range(18, 121, 17))
+    assert all(r['gap'] == 1 for r in seen if r['gap'])
+    assert pipeline.stats()['gaps'] == 7
+
+
+def test_stateful_analyzer_is_told_about_skipped_chunks():
+    class Overrunning(_Source):
+        overruns = 0
+
+        def read_chunk(self, timeout=None):
+            if len(self.items) == 2:
+                # the ring lapped the reader: two windows were skipped
+                self.overruns += 2
+            return super().read_chunk(timeout)
+
+    calls = []
+
+    def analyze(chunk, gap):
+        calls.append((int(chunk[0]), gap))
+        return {}
+
+    seen = []
+    pipeline = Pipeline(Overrunning(4), analyze, seen.append, workers=1, queue_size=10,
+                        backpressure='block', ordered=True, input_gaps=True)
+    pipeline.start()
+    deadline = time.time() + 5
+    while len(seen) < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+    assert calls == [(1, 0), (2, 0), (3, 2), (4, 0)]
+    assert [r['gap'] for r in seen] == [0, 0, 2, 0]
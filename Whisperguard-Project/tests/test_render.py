@@ -0,0 +1,29 @@
+"""Checks for the NumPy spectrogram PNG renderer."""
+import struct
+import zlib
+
+import numpy as np
+
+from whisperguard.render import colormap_lut, encode_png, spectrogram_image
+
+
+def test_encode_png_roundtrip():
+    rgb = np.arange(4 * 5 * 3, dtype=np.uint8).reshape(4, 5, 3)
+    png = encode_png(rgb)
+    assert png.startswith(b'\x89PNG\r\n\x1a\n')
+    w, h = struct.unpack('>II', png[16:24])
+    assert (w, h) == (5, 4)
+    idat_len = struct.unpack('>I', png[33:37])[0]
+    raw = zlib.decompress(png[41:41 + idat_len])
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(4, 16)
+    assert np.array_equal(rows[:, 1:].reshape(4, 5, 3), rgb)
+
+
+def test_spectrogram_image_uses_lut_and_puts_low_freqs_at_bottom():
+    power = np.full((8, 4), 1e-12)
+    power[0] = 1.0
+    img = spectrogram_image(power, min_width=4)
+    lut = colormap_lut('magma')
+    assert img.shape == (8, 4, 3)
+    assert np.array_equal(img[-1, 0], lut[255])
+    assert np.array_equal(img[0, 0], lut[0])
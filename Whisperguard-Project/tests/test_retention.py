@@ -0,0 +1,71 @@
+"""Checks for compressed evidence audio, previews and the retention manager."""
+import json
+import os
+
+import numpy as np
+import soundfile as sf
+
+from whisperguard.evidence import save_evidence
+from whisperguard.evidence_index import EvidenceIndex
+from whisperguard.retention import RetentionManager
+from whisperguard.storage import event_dir
+
+
+def _save(base_dir, level, seconds=0.5, **kwargs):
+    x = (np.random.default_rng(0).standard_normal(int(44100 * seconds)) * 0.1).astype(np.float32)
+    return save_evidence(x, 44100, {'Normal': 0.5}, 0.1, level, 0.5, base_dir=str(base_dir), **kwargs), x
+
+
+def test_flac_evidence_with_preview(tmp_path):
+    evidence, x = _save(tmp_path, 'THREAT', audio_format='flac', preview_sr=16000)
+    folder = event_dir(str(tmp_path), evidence['id'])
+    assert sorted(os.listdir(folder)) == ['audio.flac', 'checksums.sha256', 'metadata.json',
+                                          'preview.flac', 'spectrogram.png']
+    assert evidence['audio'].endswith('/audio.flac') and evidence['preview'].endswith('/preview.flac')
+    audio, sr = sf.read(os.path.join(folder, 'audio.flac'))
+    # lossless apart from the 16-bit quantization
+    assert sr == 44100 and np.abs(audio - x).max() <= 1.0 / 32768
+    preview, preview_sr = sf.read(os.path.join(folder, 'preview.flac'))
+    assert preview_sr == 16000 and len(preview) == 8000
+    with open(os.path.join(folder, 'metadata.json')) as f:
+        meta = json.load(f)
+    assert meta['audio_format'] == 'flac' and meta['fingerprint'] == evidence['hashes']['audio.flac']
+    with open(os.path.join(folder, 'checksums.sha256')) as f:
+        assert len(f.read().splitlines()) == 4
+
+
+def test_quota_evicts_by_level_then_age(tmp_path):
+    ids = {}
+    for level in ('THREAT', 'SAFE', 'SUSPICIOUS', 'THREAT'):
+        ids.setdefault(level, []).append(_save(tmp_path, level, audio_format='pcm16')[0]['id'])
+    index = EvidenceIndex.for_dir(str(tmp_path))
+    count, total = index.usage()
+    assert count == 4 and total > 4 * 44100
+    # sizes of rows indexed before they were recorded are read from disk
+    index.set_sizes([(ids['SAFE'][0], 0)])
+
+    manager = RetentionManager(str(tmp_path), max_bytes=total * 0.6)
+    removed = manager.sweep()
+    assert (removed['evicted'], removed['expired']) == (2, 0)
+    remaining = [item['metadata']['id'] for item in index.query()[0]]
+    assert sorted(remaining) == sorted(ids['THREAT'])
+    assert not os.path.exists(event_dir(str(tmp_path), ids['SAFE'][0]))
+    assert index.usage()[1] <= total * 0.6
+
+    aged = RetentionManager(str(tmp_path), max_age=60)
+    assert aged.sweep(now=index.query()[0][0]['metadata']['ts'] + 120)['expired'] == 2
+    assert index.usage() == (0, 0)
+
+
+def test_quota_skips_packages_that_cannot_be_deleted(tmp_path, monkeypatch):
+    ids = [_save(tmp_path, level, audio_format='pcm16')[0]['id'] for level in ('SAFE', 'SAFE', 'THREAT')]
+    index = EvidenceIndex.for_dir(str(tmp_path))
+    total = index.usage()[1]
+    manager = RetentionManager(str(tmp_path), max_bytes=total * 0.5)
+    delete = manager._delete
+    # the first candidate is locked (e.g. open on Windows)
+    monkeypatch.setattr(manager, '_delete', lambda event_id, folder: event_id != ids[0] and delete(event_id, folder))
+    removed = manager.sweep()
+    assert removed['evicted'] == 2
+    assert [item['metadata']['id'] for item in index.query()[0]] == [ids[0]]
+    assert index.usage()[1] <= total * 0.5
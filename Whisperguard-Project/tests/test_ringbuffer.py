@@ -0,0 +1,25 @@
+"""Checks for the mirrored audio ring buffer."""
+import numpy as np
+import pytest
+
+from whisperguard.audio.ringbuffer import RingBuffer
+
+
+def test_windows_are_contiguous_read_only_views():
+    rb = RingBuffer(8, channels=1)
+    samples = np.arange(20, dtype='float32').reshape(-1, 1)
+    for i in range(0, 20, 3):
+        rb.write(samples[i:i + 3])
+    assert rb.written == 20
+
+    win = rb.window(20, 6)
+    assert np.array_equal(win[:, 0], np.arange(14, 20))
+    assert not win.flags.writeable
+    assert np.shares_memory(win, rb._buf)
+
+
+def test_overwritten_window_is_rejected():
+    rb = RingBuffer(8, channels=1)
+    rb.write(np.zeros((12, 1), dtype='float32'))
+    with pytest.raises(ValueError):
+        rb.window(6, 4)
@@ -0,0 +1,46 @@
+"""Checks for per-client streaming sessions."""
+import numpy as np
+import pytest
+
+from whisperguard.batch import analyze_waveform
+from whisperguard.session import SessionManager, StreamSession
+
+
+def test_feed_matches_whole_waveform_analysis():
+    sr = 16000
+    rng = np.random.default_rng(0)
+    x = (rng.standard_normal(sr * 3 + 100) * 0.1).astype('<f4')
+    session = StreamSession(sr)
+    data = x.tobytes()
+    results = []
+    for i in range(0, len(data), 1001):  # frames that split samples
+        results += session.feed(data[i:i + 1001])
+
+    direct = analyze_waveform(x[:sr * 3], sr)
+    assert [r['window'] for r in results] == [0, 1, 2]
+    assert session.samples == len(x)
+    for a, b in zip(results, direct):
+        assert a['offset'] == b['offset']
+        assert np.isclose(a['score'], b['score'])
+
+
+def test_manager_bounds_and_expiry():
+    manager = SessionManager(max_sessions=2, idle_timeout=60.0)
+    a = manager.open(sr=16000)
+    manager.open(sr=16000, pcm_format='s16')
+    with pytest.raises(RuntimeError):
+        manager.open(sr=16000)
+    a.last_active -= 120
+    assert manager.reap() == 1
+    assert manager.get(a.id) is None
+    assert len(manager) == 1
+
+
+def test_idle_sessions_expire_without_new_opens():
+    manager = SessionManager(idle_timeout=60.0)
+    a, b = manager.open(sr=16000), manager.open(sr=16000)
+    a.last_active -= 120
+    assert manager.get(a.id) is None and manager.get(b.id) is b
+    b.last_active -= 120
+    stats = manager.stats()
+    assert (stats['open'], stats['expired']) == (0, 2)
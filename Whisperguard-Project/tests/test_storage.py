@@ -0,0 +1,21 @@
+"""Checks for evidence IDs and the sharded storage layout."""
+from whisperguard import storage
+
+
+def test_ids_are_unique_sortable_and_sharded():
+    ids = [storage.new_event_id(1792281600.25) for _ in range(3)]
+    assert len(set(ids)) == 3 and ids == sorted(ids)
+    assert storage.new_event_id(1792281600.5) > ids[-1]
+    assert storage.relative_folder(ids[0]) == f'2026/10/18/{ids[0]}'
+    assert abs(storage.event_ts(ids[0]) - 1792281600.25) < 1e-6
+
+
+def test_ids_round_into_the_next_second():
+    event_id = storage.new_event_id(1792281600.9999996)
+    assert event_id.startswith('20261018T000001000000-')
+    assert storage.new_event_id(1792281600.999999).startswith('20261018T000000999999-')
+
+
+def test_legacy_ids_stay_flat():
+    assert storage.relative_folder('event_1700000000') == 'event_1700000000'
+    assert storage.event_ts('event_1700000000') is None
@@ -0,0 +1,58 @@
+"""Checks for incremental per-stream STFT features and hop analysis."""
+import numpy as np
+
+from whisperguard.model.features import StreamingFeatures, extract_features
+from whisperguard.session import StreamSession
+from whisperguard.streaming import StreamAnalyzer
+
+
+def test_streaming_window_matches_chunk_features():
+    sr = 44100
+    rng = np.random.default_rng(0)
+    t = np.arange(sr) / sr
+    x = rng.standard_normal(sr) * 0.05 + 0.3 * np.sin(2 * np.pi * 19000 * t)
+    stream = StreamingFeatures(sr)
+    for i in range(0, sr, 997):
+        stream.feed(x[i:i + 997])
+    # complete the last centered frame the way extract_features zero-pads it
+    stream.feed(np.zeros(stream.n_fft // 2 - sr % stream.hop_length))
+    ours = stream.features()
+    ref = extract_features(x, sr=sr)
+    assert stream.frames == ref.power.shape[1]
+    assert np.allclose(ours.power, ref.power)
+    assert np.allclose(ours.log_mel, ref.log_mel)
+    assert np.isclose(ours.rule_ratio, ref.rule_ratio)
+
+
+def test_rolling_band_sums_track_window():
+    sr = 16000
+    rng = np.random.default_rng(1)
+    stream = StreamingFeatures(sr)
+    for _ in range(60):
+        stream.feed(rng.standard_normal(1600) * rng.uniform(0.01, 1.0))
+        f = stream.features()
+        assert np.allclose(f.spectrum, f.power.sum(axis=1))
+        assert np.isclose(f.band_energies['total'], f.power.sum())
+
+
+def test_analyzer_decides_every_hop():
+    sr = 16000
+    rng = np.random.default_rng(2)
+    alerts = []
+    analyzer = StreamAnalyzer(sr, hop_seconds=0.25, on_alert=lambda r, w: alerts.append(len(w)))
+    t = np.arange(sr * 2) / sr
+    x = (0.4 * np.sin(2 * np.pi * 7000 * t) + rng.standard_normal(len(t)) * 0.01).astype('float32')
+    results = analyzer.feed(x[:5000]) + analyzer.feed(x[5000:])
+    assert [r['window'] for r in results] == list(range(8))
+    assert [r['end'] for r in results] == [0.25 * (i + 1) for i in range(8)]
+    assert results[-1]['offset'] == 1.0
+    assert len(alerts) == sum(r['level'] in ('SUSPICIOUS', 'THREAT') for r in results)
+
+
+def test_session_with_hop():
+    sr = 16000
+    session = StreamSession(sr, hop_seconds=0.1)
+    x = (np.random.default_rng(3).standard_normal(sr) * 0.1).astype('<f4')
+    results = session.feed(x.tobytes())
+    assert len(results) == 10
+    assert session.info()['windows'] == 10
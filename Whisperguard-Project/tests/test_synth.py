@@ -0,0 +1,30 @@
+"""Checks for the synthetic audio generator and benchmark report helpers."""
+import numpy as np
+
+from whisperguard import benchmark, synth
+from whisperguard.detection.ultrasonic import detect_ultrasonic
+
+
+def test_generated_kinds():
+    for kind in synth.KINDS:
+        x = synth.generate(kind, sr=48000, seconds=0.5, seed=3)
+        assert x.dtype == np.float32 and len(x) == 24000
+        assert np.abs(x).max() <= 1.0
+        assert np.array_equal(x, synth.generate(kind, sr=48000, seconds=0.5, seed=3))
+    assert not synth.generate('silence').any()
+    ultrasonic, _ = detect_ultrasonic(synth.generate('ultrasonic'), 44100)
+    speech, _ = detect_ultrasonic(synth.generate('speech'), 44100)
+    assert ultrasonic > 0.9 and speech < 0.01
+
+
+def test_corpus_skips_ultrasonic_at_low_rates():
+    names = [name for name, _, _ in synth.corpus(('ultrasonic', 'speech'), (16000, 44100), (1.0,))]
+    assert names == ['ultrasonic_44100_1s', 'speech_16000_1s', 'speech_44100_1s']
+
+
+def test_summary_and_compare():
+    s = benchmark.summarize([0.001] * 98 + [0.1, 0.2])
+    assert s['count'] == 100 and s['p50_ms'] == 1.0 and s['p99_ms'] > 50
+    before = {'results': [{'name': 'a', 'p50_ms': 1.0}, {'name': 'b', 'p50_ms': 2.0}]}
+    after = {'results': [{'name': 'a', 'p50_ms': 1.5}, {'name': 'b', 'p50_ms': 2.0}, {'name': 'c', 'p50_ms': 1.0}]}
+    assert benchmark.compare(before, after) == [('a', 1.0, 1.5, 1.5, 'slower'), ('b', 2.0, 2.0, 1.0, '')]
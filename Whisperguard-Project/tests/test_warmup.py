@@ -0,0 +1,26 @@
+"""Checks for lazy imports and the warm-up readiness state."""
+import os
+import subprocess
+import sys
+
+from whisperguard import warmup
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_heavy_dependencies_are_not_imported_up_front():
+    code = ("import sys, whisperguard.session, whisperguard.audio.capture\n"
+            "print(sorted(m for m in ('av', 'librosa', 'matplotlib', 'sounddevice') if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, cwd=ROOT)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == '[]'
+
+
+def test_run_marks_process_ready():
+    state = warmup.run(sample_rates=(16000,))
+    assert state['status'] == 'ready'
+    assert warmup.is_ready()
+    assert 'features_16000' in state['steps']
+    # later calls are no-ops
+    assert warmup.run(sample_rates=(8000,))['steps'] == state['steps']
@@ -3,27 +3,82 @@
 This module provides a lightweight API to capture microphone audio in
 1-second chunks and perform basic normalization. It's a scaffold —
 replace or extend with more advanced filtering and buffering later.
+
+Two capture modes are available:
+
+- queue mode (default): callback blocks are copied into a queue and
+  `read_chunk` assembles normalized, non-overlapping chunks.
+- ring mode (`hop_seconds` set): callback blocks are written into a
+  preallocated `RingBuffer` and `read_window` hands out overlapping
+  `chunk_seconds` windows every `hop_seconds`, e.g. 1 s windows every
+  250 ms.
+
+Both modes peak-normalize each chunk or window they return unless
+`normalize=False`. Consumers that join consecutive reads into one stream
+(e.g. `StreamAnalyzer` fed hop by hop) must turn it off: a gain that
+changes at every hop boundary puts steps into the joined signal. Ring
+mode then hands out the raw read-only view of the ring.
 """
 import queue
+import threading
 import time
 import numpy as np
-import sounddevice as sd
+
+from .ringbuffer import RingBuffer
+
+
+def _normalize(arr):
+    # simple normalization; always a new array, even for silence, since
+    # ring-mode windows are read-only views of the ring
+    maxv = np.max(np.abs(arr))
+    if maxv > 0:
+        return arr / maxv
+    return arr.copy()
 
 
 class AudioCapture:
-    def __init__(self, samplerate=44100, channels=1, chunk_seconds=1):
+    def __init__(self, samplerate=44100, channels=1, chunk_seconds=1,
+                 hop_seconds=None, buffer_seconds=None, normalize=True):
         self.samplerate = samplerate
+        self.normalize = normalize
         self.channels = channels
         self.chunk_seconds = chunk_seconds
         self.chunk_size = int(samplerate * chunk_seconds)
+        self.hop_seconds = hop_seconds
         self._q = queue.Queue()
+        self._pending = None
+
+        self.ring = None
+        self.overruns = 0
+        self.input_overflows = 0
+        if hop_seconds is not None:
+            self.hop_size = max(1, int(samplerate * hop_seconds))
+            if buffer_seconds is None:
+                buffer_seconds = max(4 * chunk_seconds, chunk_seconds + 8 * hop_seconds)
+            capacity = max(int(samplerate * buffer_seconds), self.chunk_size + self.hop_size)
+            self.ring = RingBuffer(capacity, channels)
+            self._data_ready = threading.Event()
+            self._next_end = self.chunk_size
 
     def _callback(self, indata, frames, time_info, status):
         if status:
+            if status.input_overflow:
+                self.input_overflows += 1
             print("Audio status:", status)
-        self._q.put(indata.copy())
+        if self.ring is not None:
+            self.ring.write(indata)
+            self._data_ready.set()
+        else:
+            self._q.put(indata.copy())
 
     def start_stream(self):
+        self._pending = None
+        if self.ring is not None:
+            self.ring.reset()
+            self._next_end = self.chunk_size
+        # imported here so the module (and the package) load without PortAudio
+        import sounddevice as sd
+
         self.stream = sd.InputStream(samplerate=self.samplerate,
                                      channels=self.channels,
                                      callback=self._callback)
@@ -34,9 +89,57 @@ class AudioCapture:
             self.stream.stop()
             self.stream.close()
 
+    def read_window(self, timeout=2.0, normalize=None):
+        """Return the next overlapping window (ring mode).
+
+        Windows advance by `hop_size` frames. If the reader has fallen so far
+        behind that its next window was overwritten, it resumes at the
+        oldest window that still leaves one hop of slack before the producer
+        overwrites it again, and `overruns` counts the skipped windows.
+        `normalize` defaults to the capture's setting. Without it the window
+        is a read-only view, only valid until the producer laps it; copy it
+        if it has to outlive the next few hops. Returns None on timeout.
+        """
+        if self.ring is None:
+            raise RuntimeError("read_window requires ring mode (set hop_seconds)")
+        ring = self.ring
+        deadline = time.time() + timeout
+        while ring.written < self._next_end:
+            self._data_ready.clear()
+            if ring.written >= self._next_end:
+                break
+            remaining = deadline - time.time()
+            if remaining <= 0 or not self._data_ready.wait(remaining):
+                return None
+
+        # keep one hop of slack so the window is not overwritten while in use
+        lag = ring.written - (self._next_end - self.chunk_size)
+        limit = ring.capacity - self.hop_size
+        if lag > limit:
+            skip = (lag - limit + self.hop_size - 1) // self.hop_size
+            self._next_end += skip * self.hop_size
+            self.overruns += skip
+        end = self._next_end
+        self._next_end += self.hop_size
+        window = ring.window(end, self.chunk_size)
+        if normalize is None:
+            normalize = self.normalize
+        return _normalize(window) if normalize else window
+
     def read_chunk(self, timeout=2.0):
+        if self.ring is not None:
+            window = self.read_window(timeout=timeout)
+            if window is not None and not self.normalize:
+                # chunks are queued to workers, so they must outlive the ring
+                window = window.copy()
+            return window
         frames = []
         needed = self.chunk_size
+        if self._pending is not None:
+            # samples left over from the previous chunk
+            frames.append(self._pending)
+            needed -= len(self._pending)
+            self._pending = None
         start = time.time()
         while needed > 0:
             try:
@@ -50,12 +153,10 @@ class AudioCapture:
         if not frames:
             return None
         arr = np.concatenate(frames, axis=0)
-        arr = arr[: self.chunk_size]
-        # simple normalization
-        maxv = np.max(np.abs(arr))
-        if maxv > 0:
-            arr = arr / maxv
-        return arr
+        if len(arr) > self.chunk_size:
+            self._pending = arr[self.chunk_size:]
+            arr = arr[: self.chunk_size]
+        return _normalize(arr) if self.normalize else arr
 
     def capture_for_seconds(self, seconds=5):
         self.start_stream()
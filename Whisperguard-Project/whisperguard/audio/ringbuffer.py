@@ -0,0 +1,81 @@
+"""Preallocated single-producer / single-consumer audio ring buffer.
+
+The audio callback writes blocks straight into a fixed NumPy array, so
+sustained capture does no per-block allocation. The storage is mirrored
+(every frame is written twice, `capacity` frames apart), which makes any
+window of up to `capacity` frames contiguous: readers get plain read-only
+slices instead of concatenated copies.
+
+There is no lock on the data path. The producer publishes frames by
+advancing `written` after the samples are stored; the consumer only reads
+frames below that counter. A window stays valid until the producer laps
+it, i.e. until `written` passes its start by `capacity` frames.
+"""
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity, channels=1, dtype='float32'):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.channels = channels
+        self._buf = np.zeros((2 * self.capacity, channels), dtype=dtype)
+        self.written = 0
+        self.dropped = 0
+
+    def reset(self):
+        """Forget buffered audio. Only call while no producer is running."""
+        self.written = 0
+        self.dropped = 0
+
+    def write(self, block):
+        """Append a (frames, channels) block; called from the audio thread."""
+        n = len(block)
+        if n == 0:
+            return
+        cap = self.capacity
+        if n > cap:
+            # larger than the whole ring: only the newest frames can survive
+            self.dropped += n - cap
+            self.written += n - cap
+            block = block[n - cap:]
+            n = cap
+        buf = self._buf
+        pos = self.written % cap
+        first = min(n, cap - pos)
+        buf[pos:pos + first] = block[:first]
+        buf[pos + cap:pos + cap + first] = block[:first]
+        rest = n - first
+        if rest:
+            buf[:rest] = block[first:]
+            buf[cap:cap + rest] = block[first:]
+        # publish only after the samples are in place
+        self.written += n
+
+    def skip(self, frames):
+        """Advance past `frames` frames that never arrived; they read back as silence."""
+        frames = int(frames)
+        if frames <= 0:
+            return
+        n = min(frames, self.capacity)
+        self.written += frames - n
+        self.write(np.zeros((n, self.channels), dtype=self._buf.dtype))
+
+    def oldest(self):
+        """Absolute index of the oldest frame still held in the ring."""
+        return max(0, self.written - self.capacity)
+
+    def window(self, end, length):
+        """Return a read-only view of frames [end - length, end).
+
+        `end` is an absolute frame index (see `written`). Raises ValueError
+        when the frames are not available (not yet written or overwritten).
+        """
+        start = end - length
+        if length > self.capacity or start < self.oldest() or end > self.written or start < 0:
+            raise ValueError("window [%d, %d) not available" % (start, end))
+        s = start % self.capacity
+        view = self._buf[s:s + length]
+        view.flags.writeable = False
+        return view
@@ -0,0 +1,278 @@
+"""Batch analysis of recorded audio and an offline bulk scanner CLI.
+
+Recordings are cut into fixed-length chunks that are stacked into
+(n, samples) arrays, so the STFT, mel projection and band energies run as
+one vectorized NumPy call per batch. Long files are split into segments
+that a process pool scans in parallel; per-chunk results come back in
+file order and are written as JSON lines.
+
+`stream_timeline` analyzes a file or file object of any length in fixed
+windows read through one preallocated block buffer, so peak memory does
+not depend on the recording's duration.
+
+Usage:
+    python -m whisperguard.batch recordings/ --workers 8 > results.jsonl
+"""
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+
+import numpy as np
+import soundfile as sf
+
+from whisperguard import config
+from whisperguard.fusion import fuse_batch
+from whisperguard.model.backends import CLASSES
+from whisperguard.model.cnn import CNNSpectrogramClassifier
+from whisperguard.model.features import extract_features_batch
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.oga', '.aiff', '.aif', '.mp3')
+
+_classifier = None
+
+
+def _get_classifier():
+    # one classifier per (worker) process
+    global _classifier
+    if _classifier is None:
+        _classifier = CNNSpectrogramClassifier(model_path=config.MODEL_PATH)
+    return _classifier
+
+
+def to_mono(data):
+    data = np.asarray(data)
+    return data.mean(axis=1) if data.ndim > 1 else data
+
+
+def frame_chunks(waveform, chunk_size):
+    """Split a mono waveform into an (n, chunk_size) stack.
+
+    The last partial chunk is zero-padded; an empty waveform gives n == 0.
+    """
+    n = -(-len(waveform) // chunk_size)
+    out = np.zeros((n, chunk_size), dtype=np.float32)
+    out.reshape(-1)[:len(waveform)] = waveform
+    return out
+
+
+def analyze_batch(chunks, sr, classifier=None, sensitivity=0.5, batch_size=32):
+    """Analyze an (n, samples) stack of chunks; return one result dict per chunk."""
+    classifier = classifier or _get_classifier()
+    results = []
+    for start in range(0, len(chunks), batch_size):
+        feats = extract_features_batch(chunks[start:start + batch_size], sr=sr)
+        probs = classifier.predict_batch(feats.log_mel, features=feats)
+        levels, scores = fuse_batch(feats.rule_ratios, probs, sensitivity=sensitivity)
+        for rule_ratio, row, level, score in zip(feats.rule_ratios.tolist(), probs.tolist(),
+                                                 levels.tolist(), scores.tolist()):
+            results.append({'rule_ratio': rule_ratio, 'ml_scores': dict(zip(CLASSES, row)),
+                            'level': level, 'score': score})
+    return results
+
+
+def analyze_waveform(waveform, sr, chunk_seconds=1.0, **kwargs):
+    """Chunk one mono waveform and analyze it; each result gets its 'offset'."""
+    chunk_size = max(1, int(sr * chunk_seconds))
+    results = analyze_batch(frame_chunks(waveform, chunk_size), sr, **kwargs)
+    for i, r in enumerate(results):
+        r['offset'] = i * chunk_seconds
+    return results
+
+
+def iter_window_batches(source, window_seconds=1.0, batch_windows=16, sr=None):
+    """Read `source` incrementally as stacks of mono windows.
+
+    `source` is a path or file object soundfile can read, already
+    decoded samples (an array, with `sr`), or an iterable of mono float32
+    blocks (with `sr`, or a `decode.PCMStream`). Yields (first_window_index,
+    windows, sr) where windows is an (k, window) float32 array with
+    k <= batch_windows; the final partial window is zero-padded. The
+    arrays may be reused between iterations, so copy anything that must
+    outlive the next step.
+    """
+    if isinstance(source, np.ndarray):
+        yield from _array_window_batches(to_mono(source), sr, window_seconds, batch_windows)
+        return
+    if not isinstance(source, (str, os.PathLike)) and not hasattr(source, 'read'):
+        yield from _block_window_batches(source, sr or source.sr, window_seconds, batch_windows)
+        return
+    with sf.SoundFile(source) as snd:
+        sr = snd.samplerate
+        window = max(1, int(sr * window_seconds))
+        block = np.empty((window * batch_windows, snd.channels), dtype=np.float32)
+        mono = np.empty(window * batch_windows, dtype=np.float32)
+        index = 0
+        for data in snd.blocks(out=block, always_2d=True, dtype='float32'):
+            n = len(data)
+            if n == 0:
+                break
+            np.mean(data, axis=1, out=mono[:n])
+            k = -(-n // window)
+            mono[n:k * window] = 0.0
+            yield index, mono[:k * window].reshape(k, window), sr
+            index += k
+
+
+def _array_window_batches(samples, sr, window_seconds, batch_windows):
+    window = max(1, int(sr * window_seconds))
+    step = window * batch_windows
+    for start in range(0, len(samples), step):
+        part = np.asarray(samples[start:start + step], dtype=np.float32)
+        k = -(-len(part) // window)
+        if len(part) < k * window:
+            part = frame_chunks(part, window)
+        yield start // window, part.reshape(k, window), sr
+
+
+def _block_window_batches(blocks, sr, window_seconds, batch_windows):
+    window = max(1, int(sr * window_seconds))
+    mono = np.empty(window * batch_windows, dtype=np.float32)
+    index, n = 0, 0
+    for block in blocks:
+        pos = 0
+        while pos < len(block):
+            take = min(len(block) - pos, len(mono) - n)
+            mono[n:n + take] = block[pos:pos + take]
+            n += take
+            pos += take
+            if n == len(mono):
+                yield index, mono.reshape(batch_windows, window), sr
+                index += batch_windows
+                n = 0
+    if n:
+        k = -(-n // window)
+        mono[n:k * window] = 0.0
+        yield index, mono[:k * window].reshape(k, window), sr
+
+
+def stream_timeline(source, window_seconds=1.0, batch_windows=16, sr=None, **kwargs):
+    """Analyze `source` window by window; yield (result, window) pairs.
+
+    Each result has the fields of `analyze_batch` plus 'offset'. `window`
+    is the analyzed mono samples and is only valid until the next pair.
+    """
+    for index, windows, sr in iter_window_batches(source, window_seconds, batch_windows, sr=sr):
+        results = analyze_batch(windows, sr, batch_size=batch_windows, **kwargs)
+        for i, r in enumerate(results):
+            r['offset'] = round((index + i) * window_seconds, 6)
+            yield r, windows[i]
+
+
+def summarize(results):
+    """Overall level/score of a clip: its highest-scoring chunk."""
+    if not results:
+        return {'level': 'SAFE', 'score': 0.0}
+    worst = max(results, key=lambda r: r['score'])
+    return {'level': worst['level'], 'score': worst['score'], 'offset': worst.get('offset', 0.0)}
+
+
+def scan_segment(path, start, frames, chunk_seconds=1.0, sensitivity=0.5, batch_size=32):
+    """Read frames [start, start + frames) of `path` and analyze its chunks."""
+    data, sr = sf.read(path, start=start, frames=frames, dtype='float32', always_2d=True)
+    results = analyze_waveform(to_mono(data), sr, chunk_seconds=chunk_seconds,
+                               sensitivity=sensitivity, batch_size=batch_size)
+    for r in results:
+        r['file'] = path
+        r['offset'] = round(start / sr + r['offset'], 6)
+    return results
+
+
+def iter_audio_files(paths, recursive=True):
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        yield os.path.join(dirpath, name)
+                if not recursive:
+                    break
+        else:
+            yield path
+
+
+def plan_segments(path, chunk_seconds=1.0, segment_seconds=60.0):
+    """Yield (path, start, frames) jobs covering a file in whole chunks."""
+    info = sf.info(path)
+    chunk = max(1, int(info.samplerate * chunk_seconds))
+    seg = max(chunk, int(info.samplerate * segment_seconds) // chunk * chunk)
+    for start in range(0, info.frames, seg):
+        yield path, start, min(seg, info.frames - start)
+
+
+def scan(paths, workers=None, chunk_seconds=1.0, segment_seconds=60.0, sensitivity=0.5,
+         batch_size=32, recursive=True):
+    """Scan files/directories and yield per-chunk results in file order.
+
+    At most a few jobs per worker are in flight, so memory stays bounded
+    for large archives. Unreadable files yield a single {'file', 'error'}
+    record.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    def jobs():
+        for path in iter_audio_files(paths, recursive=recursive):
+            try:
+                segments = list(plan_segments(path, chunk_seconds, segment_seconds))
+            except Exception as e:
+                yield path, None, str(e)
+                continue
+            for job in segments:
+                yield job
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        inflight = collections.deque()
+        for path, start, frames in jobs():
+            if start is None:
+                inflight.append((path, {'file': path, 'error': frames}))
+            else:
+                inflight.append((path, executor.submit(scan_segment, path, start, frames,
+                                                       chunk_seconds, sensitivity, batch_size)))
+            while len(inflight) > 4 * workers:
+                yield from _collect(*inflight.popleft())
+        while inflight:
+            yield from _collect(*inflight.popleft())
+
+
+def _collect(path, job):
+    if isinstance(job, dict):
+        yield job
+        return
+    try:
+        yield from job.result()
+    except Exception as e:
+        yield {'file': path, 'error': str(e)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan recorded audio offline and print JSON lines per chunk")
+    parser.add_argument("paths", nargs='+', help="audio files or directories")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-seconds", type=float, default=1.0, help="analysis chunk length")
+    parser.add_argument("--segment-seconds", type=float, default=60.0, help="audio per worker job")
+    parser.add_argument("--batch-size", type=int, default=32, help="chunks per stacked NumPy batch")
+    parser.add_argument("--sensitivity", type=float, default=0.5, help="0..1 sensitivity")
+    parser.add_argument("--no-recursive", action="store_true", help="do not descend into subdirectories")
+    parser.add_argument("--only-alerts", action="store_true", help="only print SUSPICIOUS/THREAT chunks")
+    parser.add_argument("-o", "--output", default=None, help="write JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for result in scan(args.paths, workers=args.workers, chunk_seconds=args.chunk_seconds,
+                           segment_seconds=args.segment_seconds, sensitivity=args.sensitivity,
+                           batch_size=args.batch_size, recursive=not args.no_recursive):
+            if args.only_alerts and result.get('level', 'ERROR') == 'SAFE':
+                continue
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Timing helpers shared by the benchmark scripts.
+
+Reports are plain dicts saved as JSON (`save_report`). Each one carries an
+`environment` block so runs from different versions or machines can be
+compared with `compare`, which pairs up entries by name and reports the
+ratio of one metric (e.g. p95 latency) between two runs.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+def summarize(seconds):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ms = np.asarray(seconds, dtype=float) * 1000.0
+    if not len(ms):
+        return {'count': 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {'count': int(len(ms)), 'mean_ms': round(float(ms.mean()), 4), 'min_ms': round(float(ms.min()), 4),
+            'p50_ms': round(float(p50), 4), 'p95_ms': round(float(p95), 4), 'p99_ms': round(float(p99), 4),
+            'max_ms': round(float(ms.max()), 4)}
+
+
+def time_call(fn, repeat=20, warmup=2, min_seconds=0.0):
+    """Call `fn()` `warmup` times untimed, then time it `repeat` times.
+
+    With `min_seconds`, keeps timing past `repeat` until that much time has
+    been spent, so very fast stages still get a stable estimate.
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    started = time.perf_counter()
+    while len(times) < repeat or time.perf_counter() - started < min_seconds:
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def environment():
+    env = {'python': sys.version.split()[0], 'numpy': np.__version__, 'platform': platform.platform(),
+           'machine': platform.machine(), 'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                       text=True, cwd=root, timeout=5).stdout.strip() or None
+    except Exception:
+        env['commit'] = None
+    return env
+
+
+def save_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, metric='p50_ms', threshold=1.1):
+    """Pair `current['results']` with `baseline['results']` by 'name'.
+
+    Returns rows of (name, baseline value, current value, ratio, flag)
+    where flag is 'slower' when the ratio exceeds `threshold`, 'faster'
+    below its inverse, else ''.
+    """
+    before = {r['name']: r for r in baseline.get('results', [])}
+    rows = []
+    for r in current.get('results', []):
+        b = before.get(r['name'])
+        if b is None or not b.get(metric) or metric not in r:
+            continue
+        ratio = r[metric] / b[metric]
+        flag = 'slower' if ratio > threshold else 'faster' if ratio < 1 / threshold else ''
+        rows.append((r['name'], b[metric], r[metric], round(ratio, 3), flag))
+    return rows
+
+
+def print_comparison(rows, metric):
+    print(f"\ncompared with baseline ({metric}):")
+    for name, before, after, ratio, flag in rows:
+        print(f"  {name:40s} {before:10.3f} -> {after:10.3f}  x{ratio:<6} {flag}")
@@ -0,0 +1,168 @@
+"""Content-addressed cache of analysis results.
+
+Clients retry uploads and test scripts resend the same clips; a cache hit
+skips decoding, the FFT, mel, classification and a duplicate evidence
+package. Keys are digests of the audio plus everything that changes the
+answer (`analysis_key`): the sample rate, sensitivity, window settings,
+mel backend and the classifier's model version.
+
+`ResultCache` is an LRU of JSON-serializable results with a bound on the
+number of entries and a time to live. With a `path` it also keeps entries
+in an SQLite file (WAL mode, like the evidence index), so they survive
+restarts and are shared by the worker processes of one server; the file
+has the same bounds, enforced on insert.
+"""
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+
+def digest_stream(stream, chunk_size=1 << 20):
+    """blake2b hex digest of a seekable stream's bytes; leaves it rewound."""
+    h = hashlib.blake2b(digest_size=20)
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        h.update(chunk)
+    stream.seek(0)
+    return h.hexdigest()
+
+
+def digest_pcm(samples, sr):
+    """Digest of decoded samples (any dtype and shape) and their sample rate."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f'{sr}|{samples.dtype.str}|{samples.shape}|'.encode())
+    h.update(np.ascontiguousarray(samples))
+    return h.hexdigest()
+
+
+def analysis_key(kind, digest, **params):
+    """Cache key for audio `digest` ('pcm' or 'raw' bytes) under `params`."""
+    return f'{kind}:{digest}:' + hashlib.blake2b(
+        json.dumps(params, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_entries=256, ttl=3600.0, path=None):
+        """
+        max_entries: entries kept (in memory, and in the file if any)
+        ttl: seconds an entry stays valid (0 = no expiry)
+        path: optional SQLite file shared across processes and restarts
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.path = path
+        self.counters = {'hits': 0, 'misses': 0, 'disk_hits': 0, 'stores': 0, 'evictions': 0, 'expired': 0}
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with closing(self._connect()) as conn, conn:
+                conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _expired(self, created, now):
+        return self.ttl > 0 and now - created > self.ttl
+
+    def get(self, key, count_miss=True):
+        """Return the cached result for `key` (a fresh copy), or None.
+
+        count_miss=False leaves a miss uncounted, for a first lookup that a
+        second one (with `count_miss`) follows, so the counters give one hit
+        or miss per request.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if self._expired(created, now):
+                    del self._entries[key]
+                    self.counters['expired'] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return json.loads(value)
+        if self.path:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute('SELECT value, created FROM results WHERE key = ?', (key,)).fetchone()
+                if row is not None and self._expired(row[1], now):
+                    conn.execute('DELETE FROM results WHERE key = ?', (key,))
+                    row = None
+                elif row is not None:
+                    conn.execute('UPDATE results SET accessed = ? WHERE key = ?', (now, key))
+            if row is not None:
+                with self._lock:
+                    self._remember(key, row[1], row[0])
+                    self.counters['hits'] += 1
+                    self.counters['disk_hits'] += 1
+                return json.loads(row[0])
+        if count_miss:
+            self.count_miss()
+        return None
+
+    def count_miss(self):
+        with self._lock:
+            self.counters['misses'] += 1
+
+    def put(self, key, result):
+        """Store `result` (JSON-serializable) under `key`."""
+        value = json.dumps(result, default=str)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self.counters['stores'] += 1
+        if self.path:
+            with closing(self._connect()) as conn, conn:
+                conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (key, value, now, now))
+                if self.ttl > 0:
+                    conn.execute('DELETE FROM results WHERE created < ?', (now - self.ttl,))
+                conn.execute('DELETE FROM results WHERE key IN (SELECT key FROM results '
+                             'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def _remember(self, key, created, value):
+        # caller holds the lock
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            with closing(self._connect()) as conn, conn:
+                conn.execute('DELETE FROM results')
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            out = dict(self.counters, entries=len(self._entries), max_entries=self.max_entries)
+        lookups = out['hits'] + out['misses']
+        out['hit_rate'] = round(out['hits'] / lookups, 4) if lookups else None
+        return out
@@ -0,0 +1,141 @@
+"""Runtime settings read from `WHISPERGUARD_*` environment variables.
+
+Values are read once at import; unset or malformed variables fall back to
+the defaults below.
+"""
+import os
+
+
+def env_str(name, default):
+    value = os.environ.get(name)
+    return value if value not in (None, '') else default
+
+
+def env_int(name, default):
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def env_float(name, default):
+    try:
+        return float(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def env_ints(name, default):
+    """Comma-separated integers as a tuple."""
+    try:
+        return tuple(int(v) for v in os.environ[name].split(','))
+    except (KeyError, ValueError):
+        return default
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Evidence writer: worker processes (0 = write inline), pending-job bound and
+# what to do with new jobs when the bound is reached (see EvidenceWriter).
+EVIDENCE_WORKERS = env_int('WHISPERGUARD_EVIDENCE_WORKERS', 2)
+EVIDENCE_QUEUE_SIZE = env_int('WHISPERGUARD_EVIDENCE_QUEUE_SIZE', 16)
+EVIDENCE_POLICY = env_str('WHISPERGUARD_EVIDENCE_POLICY', 'coalesce')
+
+# Spectrogram image style for evidence: 'fast' (NumPy renderer) or 'pretty'
+# (annotated matplotlib figure).
+EVIDENCE_RENDER = env_str('WHISPERGUARD_EVIDENCE_RENDER', 'fast')
+
+# Evidence audio encoding (see evidence.AUDIO_FORMATS): 'wav' (float32),
+# 'pcm16'/'pcm24' (integer WAV) or 'flac'/'flac24' (lossless for those
+# sample widths, half the float WAV size or less); plus an optional mono
+# 16-bit preview downsampled to EVIDENCE_PREVIEW_SR Hz (0 = no preview).
+EVIDENCE_AUDIO_FORMAT = env_str('WHISPERGUARD_EVIDENCE_AUDIO_FORMAT', 'wav')
+EVIDENCE_PREVIEW_SR = env_int('WHISPERGUARD_EVIDENCE_PREVIEW_SR', 0)
+
+# Evidence retention (see whisperguard.retention): quota in MiB and age in
+# days (0 = unbounded), levels in eviction order, seconds between sweeps.
+RETENTION_MAX_MB = env_int('WHISPERGUARD_RETENTION_MAX_MB', 0)
+RETENTION_MAX_AGE_DAYS = env_float('WHISPERGUARD_RETENTION_MAX_AGE_DAYS', 0.0)
+RETENTION_PRIORITY = env_str('WHISPERGUARD_RETENTION_PRIORITY', 'SAFE,SUSPICIOUS,THREAT')
+RETENTION_INTERVAL = env_float('WHISPERGUARD_RETENTION_INTERVAL', 60.0)
+
+# Incidents: consecutive alerting decisions of a stream are written as one
+# evidence package, with PRE_ROLL seconds of audio before the first hit and
+# closed after POST_ROLL quiet seconds (kept as audio) or MAX_SECONDS; a
+# decision scoring RELEASE x the SUSPICIOUS threshold keeps it open.
+INCIDENT_PRE_ROLL = env_float('WHISPERGUARD_INCIDENT_PRE_ROLL', 1.0)
+INCIDENT_POST_ROLL = env_float('WHISPERGUARD_INCIDENT_POST_ROLL', 2.0)
+INCIDENT_MAX_SECONDS = env_float('WHISPERGUARD_INCIDENT_MAX_SECONDS', 30.0)
+INCIDENT_RELEASE = env_float('WHISPERGUARD_INCIDENT_RELEASE', 0.8)
+
+# Alert event store: events kept in memory per process, or an optional
+# SQLite database shared by all server workers (empty = memory only),
+# trimmed to the newest EVENT_LOG_MAX_FILE_EVENTS.
+EVENT_LOG_SIZE = env_int('WHISPERGUARD_EVENT_LOG_SIZE', 1000)
+EVENT_LOG_PATH = env_str('WHISPERGUARD_EVENT_LOG_PATH', '')
+EVENT_LOG_MAX_FILE_EVENTS = env_int('WHISPERGUARD_EVENT_LOG_MAX_FILE_EVENTS', 10000)
+
+# /analyze result cache keyed by the audio content and analysis settings:
+# entries kept (0 = off), seconds an entry stays valid (0 = forever) and an
+# optional SQLite file shared by worker processes and kept across restarts.
+RESULT_CACHE_SIZE = env_int('WHISPERGUARD_RESULT_CACHE_SIZE', 256)
+RESULT_CACHE_TTL = env_float('WHISPERGUARD_RESULT_CACHE_TTL', 3600.0)
+RESULT_CACHE_PATH = env_str('WHISPERGUARD_RESULT_CACHE_PATH', '')
+
+# Uploads to /analyze at least this long are analyzed as a stream of
+# fixed windows (constant memory, per-window timeline in the response).
+STREAM_MIN_SECONDS = env_float('WHISPERGUARD_STREAM_MIN_SECONDS', 30.0)
+STREAM_WINDOW_SECONDS = env_float('WHISPERGUARD_STREAM_WINDOW_SECONDS', 1.0)
+
+# Live streaming sessions (/ws/stream and /stream): concurrent session
+# bound, idle expiry in seconds, analysis window length and default
+# decision hop (0 = one decision per non-overlapping window; clients can
+# ask for a hop per session).
+STREAM_MAX_SESSIONS = env_int('WHISPERGUARD_STREAM_MAX_SESSIONS', 64)
+STREAM_IDLE_TIMEOUT = env_float('WHISPERGUARD_STREAM_IDLE_TIMEOUT', 60.0)
+STREAM_SESSION_WINDOW_SECONDS = env_float('WHISPERGUARD_STREAM_SESSION_WINDOW_SECONDS', 1.0)
+STREAM_SESSION_HOP_SECONDS = env_float('WHISPERGUARD_STREAM_SESSION_HOP_SECONDS', 0.0)
+
+# Web serving (python -m whisperguard.serve). WEB_WORKERS=0 means one
+# worker process per CPU; each worker serves WEB_THREADS requests at once.
+WEB_HOST = env_str('WHISPERGUARD_WEB_HOST', '0.0.0.0')
+WEB_PORT = env_int('WHISPERGUARD_WEB_PORT', 5000)
+WEB_WORKERS = env_int('WHISPERGUARD_WEB_WORKERS', 0)
+WEB_THREADS = env_int('WHISPERGUARD_WEB_THREADS', 8)
+WEB_TIMEOUT = env_int('WHISPERGUARD_WEB_TIMEOUT', 120)
+WEB_GRACEFUL_TIMEOUT = env_int('WHISPERGUARD_WEB_GRACEFUL_TIMEOUT', 30)
+# Werkzeug debugger for `python -m whisperguard.web` (development only)
+WEB_DEBUG = env_bool('WHISPERGUARD_DEBUG', False)
+# Log level of whisperguard.web, and whether /analyze responses carry the
+# per-request debug trace by default (clients can ask with debug=1).
+WEB_LOG_LEVEL = env_str('WHISPERGUARD_WEB_LOG_LEVEL', 'INFO').upper()
+WEB_DEBUG_PAYLOADS = env_bool('WHISPERGUARD_DEBUG_PAYLOADS', False)
+
+# Per-stage latency histograms (whisperguard.metrics, served on /metrics)
+# and the on-demand sampling profiler endpoint /debug/profile.
+METRICS_ENABLED = env_bool('WHISPERGUARD_METRICS', True)
+PROFILER_ENABLED = env_bool('WHISPERGUARD_PROFILER', False)
+PROFILER_MAX_SECONDS = env_float('WHISPERGUARD_PROFILER_MAX_SECONDS', 30.0)
+
+# Classifier model: .onnx (ONNX Runtime) or .npz (NumPy reference); unset
+# uses the heuristic placeholder. Concurrent predictions are micro-batched
+# up to MODEL_MAX_BATCH items or MODEL_MAX_WAIT_MS milliseconds. ONNX
+# Runtime thread pools: 0 keeps the runtime default.
+MODEL_PATH = env_str('WHISPERGUARD_MODEL_PATH', None)
+MODEL_MAX_BATCH = env_int('WHISPERGUARD_MODEL_MAX_BATCH', 32)
+MODEL_MAX_WAIT_MS = env_float('WHISPERGUARD_MODEL_MAX_WAIT_MS', 2.0)
+MODEL_INTRA_OP_THREADS = env_int('WHISPERGUARD_MODEL_INTRA_OP_THREADS', 0)
+MODEL_INTER_OP_THREADS = env_int('WHISPERGUARD_MODEL_INTER_OP_THREADS', 0)
+
+# Warm-up (see whisperguard.warmup): sample rates whose feature caches and
+# compiled code paths are built before a process reports ready on /healthz.
+WARMUP_SAMPLE_RATES = env_ints('WHISPERGUARD_WARMUP_SAMPLE_RATES', (44100, 48000, 16000))
+
+# Mel filterbank implementation: 'numpy' (built in, no librosa needed) or
+# 'librosa' (falls back to 'numpy' when librosa is not installed).
+MEL_BACKEND = env_str('WHISPERGUARD_MEL_BACKEND', 'numpy')
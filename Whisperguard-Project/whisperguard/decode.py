@@ -0,0 +1,354 @@
+"""Audio decoding from memory without temp files or per-request ffmpeg forks.
+
+`sniff_format` looks at the first bytes of an upload so formats libsndfile
+cannot read (browser webm/opus, mp3, mp4/aac) skip the doomed `sf.read`
+attempt. Those are decoded by, in order of preference:
+
+- PyAV (an in-process FFmpeg binding), when installed;
+- `FFmpegPool`, which keeps pre-spawned `ffmpeg` processes waiting on
+  stdin, so a request only writes its bytes to a warm process and reads
+  float32 PCM back over pipes.
+
+`StreamDecoder` is one long-lived ffmpeg process for a continuous encoded
+stream (e.g. a MediaRecorder webm stream), fed incrementally.
+
+`PCMStream` decodes an encoded file object block by block (PyAV, or a
+`StreamDecoder` fed from the file), so long uploads are analyzed without
+holding either the encoded file or its PCM in memory.
+
+PyAV is only imported when a non-libsndfile upload arrives (or during
+`whisperguard.warmup`), keeping it out of the import path of every worker.
+"""
+import atexit
+import io
+import math
+from importlib.util import find_spec
+import queue
+import subprocess
+import threading
+
+import numpy as np
+import soundfile as sf
+
+_HAS_AV = find_spec('av') is not None
+
+# formats soundfile/libsndfile reads directly
+SOUNDFILE_FORMATS = ('wav', 'flac', 'ogg', 'aiff')
+
+
+class DecodeError(ValueError):
+    pass
+
+
+class AudioInfo:
+    """Sample rate, length and channel count of an opened audio source.
+
+    `frames` is None while the length is unknown (a long upload that is
+    still being decoded); its duration is then infinite.
+    """
+
+    def __init__(self, samplerate, frames, channels=1):
+        self.samplerate = samplerate
+        self.frames = frames
+        self.channels = channels
+
+    @property
+    def duration(self):
+        if self.frames is None:
+            return math.inf
+        return self.frames / self.samplerate if self.samplerate else 0.0
+
+
+def sniff_format(head):
+    """Guess the container format from the first bytes of a file.
+
+    Returns one of 'wav', 'flac', 'ogg', 'aiff', 'webm', 'mp3', 'mp4' or
+    None when unknown.
+    """
+    head = bytes(head[:16])
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[:4] == b'FORM' and head[8:12] in (b'AIFF', b'AIFC'):
+        return 'aiff'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'
+    if head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    return None
+
+
+def _ffmpeg_cmd(ffmpeg, sr):
+    return [ffmpeg, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+            '-f', 'f32le', '-ac', '1', '-ar', str(sr), 'pipe:1']
+
+
+class FFmpegPool:
+    """Pool of warm ffmpeg processes decoding whole files over pipes.
+
+    Each process handles one input (ffmpeg reads a single stream from
+    stdin), so after a process is taken a replacement is spawned in the
+    background to keep `size` warm ones ready.
+    """
+
+    def __init__(self, size=2, sr=44100, timeout=30.0, ffmpeg='ffmpeg'):
+        self.size = size
+        self.sr = sr
+        self.timeout = timeout
+        self.ffmpeg = ffmpeg
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+
+    def _popen(self):
+        try:
+            return subprocess.Popen(_ffmpeg_cmd(self.ffmpeg, self.sr), stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise DecodeError("ffmpeg not found on server. Install ffmpeg or upload WAV files.")
+
+    def _spawn(self):
+        proc = self._popen()
+        # checked under the lock so close() cannot miss a process added after
+        # it drained the pool, and so concurrent refills never exceed `size`
+        with self._lock:
+            if not self._closed and self._idle.qsize() < self.size:
+                self._idle.put(proc)
+                return
+        proc.kill()
+        proc.wait()
+
+    def _refill(self):
+        try:
+            self._spawn()
+        except DecodeError:
+            pass
+
+    def _take(self):
+        with self._lock:
+            if self._closed:
+                raise DecodeError("decoder pool is closed")
+            first = not self._started
+            self._started = True
+        if first:
+            atexit.register(self.close)
+            for _ in range(self.size):
+                self._spawn()
+        try:
+            proc = self._idle.get_nowait()
+        except queue.Empty:
+            # everything is in use (or close() emptied the pool): this
+            # request gets its own process, which leaves the pool as it is
+            return self._popen()
+        # replace the warm process just taken
+        threading.Thread(target=self._refill, daemon=True).start()
+        if proc.poll() is not None:
+            # it died while idle
+            proc = self._popen()
+        return proc
+
+    def decode(self, data):
+        """Decode encoded bytes to (mono float32 samples, sr)."""
+        proc = self._take()
+        try:
+            out, err = proc.communicate(data, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise DecodeError(f"ffmpeg timed out after {self.timeout}s")
+        if proc.returncode != 0:
+            raise DecodeError("ffmpeg conversion failed: " + err.decode('utf-8', 'replace').strip())
+        return np.frombuffer(out, dtype='<f4'), self.sr
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                proc = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            proc.kill()
+            proc.wait()
+
+
+class StreamDecoder:
+    """One ffmpeg process decoding a continuous encoded stream incrementally.
+
+    `feed` writes encoded bytes and returns whatever float32 PCM (as bytes)
+    has been decoded so far; `close` flushes and returns the rest.
+    """
+
+    def __init__(self, sr=44100, ffmpeg='ffmpeg'):
+        self.sr = sr
+        try:
+            self._proc = subprocess.Popen(_ffmpeg_cmd(ffmpeg, sr), stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            raise DecodeError("ffmpeg not found on server")
+        self._out = bytearray()
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            piece = self._proc.stdout.read1(65536)
+            if not piece:
+                break
+            with self._lock:
+                self._out += piece
+
+    def _drain(self):
+        with self._lock:
+            data = bytes(self._out)
+            self._out.clear()
+        return data
+
+    def feed(self, data):
+        try:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            raise DecodeError("stream decoder exited")
+        return self._drain()
+
+    def close(self, timeout=5.0):
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        self._reader.join(timeout)
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc.wait()
+        return self._drain()
+
+
+class PCMStream:
+    """Mono float32 blocks decoded incrementally from an encoded file object.
+
+    Iterate once to get the blocks as they are decoded. PyAV reads the
+    file itself and keeps its sample rate; without PyAV, `block_bytes` of
+    the file at a time are fed to a `StreamDecoder`, which resamples to
+    `sr`. Raises DecodeError, when opening or while iterating.
+    """
+
+    def __init__(self, f, sr=44100, block_bytes=1 << 16, ffmpeg='ffmpeg'):
+        self._f = f
+        self.block_bytes = block_bytes
+        self.ffmpeg = ffmpeg
+        self._container = None
+        self.sr = sr
+        if _HAS_AV:
+            import av
+
+            try:
+                self._container = av.open(f)
+                stream = self._container.streams.audio[0]
+            except (IndexError, av.error.FFmpegError) as e:
+                if self._container is not None:
+                    self._container.close()
+                raise DecodeError(f"could not decode audio: {e}")
+            self.sr = stream.rate or stream.codec_context.sample_rate
+
+    def __iter__(self):
+        if self._container is not None:
+            return self._iter_av()
+        return self._iter_ffmpeg()
+
+    def _iter_av(self):
+        import av
+
+        container = self._container
+        try:
+            resampler = av.AudioResampler(format='flt', layout='mono', rate=self.sr)
+            for frame in container.decode(container.streams.audio[0]):
+                for out in resampler.resample(frame):
+                    yield out.to_ndarray().reshape(-1)
+            for out in resampler.resample(None):
+                yield out.to_ndarray().reshape(-1)
+        except av.error.FFmpegError as e:
+            raise DecodeError(f"could not decode audio: {e}")
+        finally:
+            container.close()
+
+    def _iter_ffmpeg(self):
+        decoder = StreamDecoder(self.sr, ffmpeg=self.ffmpeg)
+        # a block can end inside a float32 sample
+        carry = b''
+        decoded = 0
+        finished = False
+        try:
+            while not finished:
+                data = self._f.read(self.block_bytes)
+                finished = not data
+                pcm = carry + (decoder.close() if finished else decoder.feed(data))
+                n = len(pcm) // 4 * 4
+                carry = pcm[n:]
+                if n:
+                    decoded += n
+                    yield np.frombuffer(pcm[:n], dtype='<f4')
+        finally:
+            if not finished:
+                # abandoned early or failed: stop ffmpeg
+                decoder.close(timeout=0)
+        if not decoded:
+            raise DecodeError("could not decode audio")
+
+
+def _decode_av(data):
+    import av
+
+    try:
+        with av.open(io.BytesIO(data)) as container:
+            stream = container.streams.audio[0]
+            sr = stream.rate or stream.codec_context.sample_rate
+            resampler = av.AudioResampler(format='flt', layout='mono', rate=sr)
+            pieces = []
+            for frame in container.decode(stream):
+                for out in resampler.resample(frame):
+                    pieces.append(out.to_ndarray().reshape(-1))
+            for out in resampler.resample(None):
+                pieces.append(out.to_ndarray().reshape(-1))
+    except (IndexError, av.error.FFmpegError) as e:
+        raise DecodeError(f"could not decode audio: {e}")
+    samples = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    return samples.astype(np.float32, copy=False), sr
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide `FFmpegPool`, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = FFmpegPool()
+        return _pool
+
+
+def decode_bytes(data, fmt=None):
+    """Decode an in-memory audio file to (samples, sr).
+
+    Soundfile formats give (frames, channels) or (frames,) float32 like
+    `sf.read`; everything else is decoded to mono. Raises DecodeError.
+    """
+    fmt = fmt or sniff_format(data)
+    if fmt in SOUNDFILE_FORMATS:
+        try:
+            return sf.read(io.BytesIO(data), dtype='float32')
+        except Exception:
+            # e.g. ogg/opus with an older libsndfile
+            pass
+    if _HAS_AV:
+        return _decode_av(data)
+    return get_pool().decode(data)
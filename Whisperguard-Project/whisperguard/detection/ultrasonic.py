@@ -3,13 +3,18 @@
 import numpy as np
 
 
-def detect_ultrasonic(audio_chunk, samplerate, threshold=0.1, min_freq=18000):
+def detect_ultrasonic(audio_chunk, samplerate, threshold=0.1, min_freq=18000, features=None):
     """Return energy ratio above min_freq and boolean flag using NumPy FFT.
 
     audio_chunk: 1-D numpy array
     samplerate: int
     threshold: fraction of total energy
+    features: optional `ChunkFeatures` for this chunk; when given, the ratio
+        is read from its precomputed spectrum and no FFT is run here
     """
+    if features is not None:
+        ratio = features.energy_ratio(min_freq)
+        return ratio, ratio >= threshold
     if audio_chunk is None or len(audio_chunk) == 0:
         return 0.0, False
     n = len(audio_chunk)
@@ -0,0 +1,332 @@
+"""Multi-device, multi-channel monitoring engine.
+
+`MonitorEngine` watches several capture inputs at once, e.g. one
+microphone per room or the channels of a multichannel interface. Every
+channel is an independent stream with its own detections; channels are
+never averaged together.
+
+- Each input (`Input`) has one preallocated `RingBuffer` written by its
+  audio callback, and one `StreamAnalyzer` over all of its channels, so a
+  hop of a 32-channel interface is one batched FFT, one classifier batch
+  and one fusion call, not a Python loop per channel.
+- A shared pool of worker threads analyzes inputs with new audio. Inputs
+  wait in a round-robin ready queue, an input is queued at most once, and
+  each turn processes at most `max_hops_per_turn` hops before the input
+  goes back to the tail, so a backlogged input cannot starve the others.
+  Only one worker touches an input's analyzer at a time. An input whose
+  backlog outgrows its ring skips the overwritten audio (counted in
+  `overruns` and `skipped_seconds`); its analyzer and open incidents
+  restart after the gap.
+- Per-stream status (last level, score, decisions, alerts) is kept in
+  arrays per input and reported by `status`; alerts go to `on_event`.
+- With `on_incident`, every channel also has an `IncidentTracker`, and
+  each closed incident (one per run of alerts, with its audio) goes to
+  `on_incident`.
+
+Inputs are either sound devices (`add_device`, needs sounddevice) or
+sources the caller writes blocks into (`add_source`, e.g. network feeds
+or tests).
+"""
+import collections
+import threading
+import time
+
+import numpy as np
+
+from whisperguard import metrics
+from whisperguard.audio.ringbuffer import RingBuffer
+from whisperguard.fusion import LEVELS
+from whisperguard.incident import IncidentTracker
+from whisperguard.model.backends import CLASSES
+from whisperguard.streaming import ALERT_LEVELS, StreamAnalyzer
+
+
+class Input:
+    """One capture input: its ring buffer, analyzer and per-channel status."""
+
+    def __init__(self, engine, name, channels, device=None, is_device=False):
+        self.engine = engine
+        self.name = name
+        self.channels = channels
+        self.device = device
+        self.is_device = is_device
+        sr = engine.samplerate
+        self.ring = RingBuffer(int(sr * engine.buffer_seconds), channels)
+        self.analyzer = StreamAnalyzer(sr, window_seconds=engine.window_seconds,
+                                       hop_seconds=engine.hop_seconds, sensitivity=engine.sensitivity,
+                                       classifier=engine.classifier, channels=channels,
+                                       on_alert=self._alert)
+        self.consumed = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.input_overflows = 0
+        self.scheduled = False
+        self.stream = None
+        # per-channel status
+        self.levels = np.full(channels, LEVELS[0], dtype=LEVELS.dtype)
+        self.scores = np.zeros(channels)
+        self.rule_ratios = np.zeros(channels)
+        self.alerts = np.zeros(channels, dtype=int)
+        self.decisions = 0
+        self.last_decision = None
+        self.incidents = None
+        if engine.on_incident is not None:
+            self.incidents = [IncidentTracker(sr, window_seconds=engine.window_seconds,
+                                              sensitivity=engine.sensitivity, **engine.incident_options)
+                              for _ in range(channels)]
+
+    def stream_names(self):
+        if self.channels == 1:
+            return [self.name]
+        return [f'{self.name}:{ch}' for ch in range(self.channels)]
+
+    def write(self, block):
+        """Append a (frames, channels) block (or (frames,) for one channel)."""
+        block = np.asarray(block, dtype=np.float32)
+        if block.ndim == 1:
+            block = block[:, np.newaxis]
+        self.ring.write(block)
+        self.engine._notify(self)
+
+    def _callback(self, indata, frames, time_info, status):
+        if status and status.input_overflow:
+            self.input_overflows += 1
+        self.ring.write(indata)
+        self.engine._notify(self)
+
+    def available(self):
+        return self.ring.written - self.consumed
+
+    def has_work(self):
+        """Whether the unanalyzed audio reaches the next decision."""
+        return self.available() >= self.analyzer.until_decision
+
+    def process(self, max_frames):
+        """Analyze up to `max_frames` new frames; called by one worker at a time."""
+        ring = self.ring
+        # keep one hop of slack so the block is not overwritten while in use
+        limit = ring.capacity - self.analyzer.hop
+        lag = ring.written - self.consumed
+        if lag > limit:
+            # the oldest audio was overwritten: skip it and restart the
+            # analyzer and incidents after the gap instead of joining across it
+            skipped = lag - limit
+            self.overruns += 1
+            self.skipped += skipped
+            self.consumed = ring.written - limit
+            self.analyzer.skip(skipped)
+            for ch, tracker in enumerate(self.incidents or ()):
+                self._incident(ch, tracker.gap(skipped))
+        take = min(ring.written - self.consumed, max_frames)
+        if take <= 0:
+            return 0
+        block = ring.window(self.consumed + take, take)
+        self.consumed += take
+        start = self.analyzer.samples
+        results = self.analyzer.feed(block)
+        if self.incidents is not None:
+            self._track(block, start, results)
+        if results:
+            last = results[-1]
+            self.levels[:] = last['levels']
+            self.scores[:] = last['scores']
+            self.rule_ratios[:] = last['rule_ratios']
+            for r in results:
+                self.alerts += np.isin(r['levels'], ALERT_LEVELS)
+            self.decisions += len(results)
+            self.last_decision = time.time()
+        return len(results)
+
+    def _track(self, block, start, results):
+        # feed each channel's tracker up to every decision, then decide
+        pos = 0
+        for r in results:
+            end = int(round(r['end'] * self.engine.samplerate))
+            for ch, tracker in enumerate(self.incidents):
+                tracker.feed(block[pos:end - start, ch])
+            pos = end - start
+            alerting = np.isin(r['levels'], ALERT_LEVELS)
+            for ch, tracker in enumerate(self.incidents):
+                if tracker.current is None and not alerting[ch]:
+                    continue
+                decision = {'level': str(r['levels'][ch]), 'score': float(r['scores'][ch]),
+                            'rule_ratio': float(r['rule_ratios'][ch]),
+                            'ml_scores': dict(zip(CLASSES, r['ml_scores'][ch].tolist()))}
+                self._incident(ch, tracker.decide(decision, end=end))
+        for ch, tracker in enumerate(self.incidents):
+            tracker.feed(block[pos:, ch])
+
+    def _incident(self, ch, incident):
+        if incident is not None:
+            incident.update(stream=self.stream_names()[ch], input=self.name, channel=ch)
+            self.engine.on_incident(incident)
+
+    def flush_incidents(self):
+        """Close and report every open incident of this input."""
+        for ch, tracker in enumerate(self.incidents or ()):
+            self._incident(ch, tracker.flush())
+
+    def _alert(self, result, window):
+        result['stream'] = self.stream_names()[result['channel']]
+        result['input'] = self.name
+        if self.engine.on_event is not None:
+            return self.engine.on_event(result, window)
+        return None
+
+    def status(self):
+        return [{'stream': stream, 'input': self.name, 'channel': ch,
+                 'level': str(self.levels[ch]), 'score': float(self.scores[ch]),
+                 'rule_ratio': float(self.rule_ratios[ch]), 'alerts': int(self.alerts[ch]),
+                 'decisions': self.decisions, 'last_decision': self.last_decision,
+                 'overruns': self.overruns, 'skipped_seconds': round(self.skipped / self.engine.samplerate, 6),
+                 'input_overflows': self.input_overflows}
+                for ch, stream in enumerate(self.stream_names())]
+
+
+class MonitorEngine:
+    def __init__(self, samplerate=44100, window_seconds=1.0, hop_seconds=0.25, sensitivity=0.5,
+                 workers=2, classifier=None, on_event=None, max_hops_per_turn=4, buffer_seconds=None,
+                 on_incident=None, incident_options=None):
+        """
+        workers: analysis threads shared by all inputs
+        on_event: optional callable(result, window) for every SUSPICIOUS or
+            THREAT decision of any channel; `result` carries 'stream',
+            'input' and 'channel' names, `window` is a read-only view of that
+            channel's audio (copy it to keep it); a returned dict is stored
+            as result['evidence']
+        max_hops_per_turn: work an input gets per scheduling turn
+        buffer_seconds: ring buffer length per input (default: enough for
+            one window plus a few turns of backlog)
+        on_incident: optional callable(incident) for every closed incident
+            of any channel (see `IncidentTracker`), with 'stream', 'input'
+            and 'channel' added; called from a worker thread, and from
+            `stop` for incidents still open
+        incident_options: IncidentTracker keyword arguments (pre_roll,
+            post_roll, max_seconds, release)
+        """
+        self.samplerate = samplerate
+        self.window_seconds = window_seconds
+        self.hop_seconds = hop_seconds
+        self.sensitivity = sensitivity
+        self.workers = max(1, int(workers))
+        self.classifier = classifier
+        self.on_event = on_event
+        self.on_incident = on_incident
+        self.incident_options = incident_options or {}
+        self.max_hops_per_turn = max(1, int(max_hops_per_turn))
+        self.buffer_seconds = buffer_seconds or max(4.0, window_seconds + 4 * max_hops_per_turn * hop_seconds)
+        self.inputs = []
+        self._ready = collections.deque()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self.counters = {'turns': 0, 'decisions': 0, 'errors': 0}
+
+    def add_device(self, device=None, channels=1, name=None):
+        """Monitor a sound device (index or name; None = default input).
+
+        Every one of its `channels` is analyzed as a separate stream. The
+        stream is opened by `start`.
+        """
+        if name is None:
+            name = 'default' if device is None else str(device)
+        inp = Input(self, name, channels, device=device, is_device=True)
+        self.inputs.append(inp)
+        return inp
+
+    def add_source(self, name, channels=1):
+        """Add an input fed by the caller through `Input.write`."""
+        inp = Input(self, name, channels)
+        self.inputs.append(inp)
+        return inp
+
+    def _notify(self, inp):
+        # called from audio callbacks: only queue bookkeeping under the lock
+        with self._cond:
+            if not inp.scheduled and inp.has_work():
+                inp.scheduled = True
+                self._ready.append(inp)
+                self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._stop.is_set():
+                    self._cond.wait(0.2)
+                if not self._ready:
+                    return
+                inp = self._ready.popleft()
+            failed = False
+            try:
+                with metrics.timer('engine_turn'):
+                    n = inp.process(self.max_hops_per_turn * inp.analyzer.hop)
+            except Exception as e:
+                n = 0
+                failed = True
+                print(f"Analysis of {inp.name} failed:", e)
+            with self._cond:
+                # counters are updated by every worker, only under the lock
+                self.counters['errors'] += failed
+                self.counters['turns'] += 1
+                self.counters['decisions'] += n
+                if inp.has_work() and not self._stop.is_set():
+                    # more backlog: back to the tail of the round robin
+                    self._ready.append(inp)
+                    self._cond.notify()
+                else:
+                    inp.scheduled = False
+
+    def start(self):
+        """Open the device streams and start the workers."""
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._worker, name=f'wg-engine-{i}', daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+        devices = [inp for inp in self.inputs if inp.is_device and inp.stream is None]
+        if devices:
+            # imported here so sources-only engines work without PortAudio
+            import sounddevice as sd
+
+            for inp in devices:
+                inp.stream = sd.InputStream(samplerate=self.samplerate, channels=inp.channels,
+                                            device=inp.device, dtype='float32', callback=inp._callback)
+                inp.stream.start()
+
+    def stop(self, timeout=5.0):
+        for inp in self.inputs:
+            if inp.stream is not None:
+                inp.stream.stop()
+                inp.stream.close()
+                inp.stream = None
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        for inp in self.inputs:
+            inp.flush_incidents()
+
+    def drain(self, timeout=5.0):
+        """Wait until every input's complete hops have been analyzed."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._cond:
+                busy = self._ready or any(inp.scheduled for inp in self.inputs)
+            if not busy:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def status(self):
+        """Per-stream status, one entry per channel of every input."""
+        return [s for inp in self.inputs for s in inp.status()]
+
+    def stats(self):
+        with self._cond:
+            out = dict(self.counters, ready=len(self._ready))
+        out['streams'] = sum(inp.channels for inp in self.inputs)
+        out['overruns'] = sum(inp.overruns for inp in self.inputs)
+        out['skipped_seconds'] = round(sum(inp.skipped for inp in self.inputs) / self.samplerate, 6)
+        return out
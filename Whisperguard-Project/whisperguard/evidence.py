@@ -1,18 +1,47 @@
 """Evidence packaging utilities: save WAV, spectrogram PNG, and metadata JSON.
 
-Saved under `whisperguard/static/evidence/<timestamp>/` so files can be served
-by the Flask static server during demos.
+Saved under `whisperguard/static/evidence/YYYY/MM/DD/<event_id>/` (see
+`whisperguard.storage`) so files can be served by the Flask static server
+during demos.
+
+Artifacts are encoded in memory and hashed from those bytes, written into a
+hidden staging folder, and published with a single directory rename, so a
+reader never sees a half-written event folder. `metadata.json` records the
+SHA-256 of the audio and image; `checksums.sha256` covers all three files.
+
+Spectrograms are rendered by `whisperguard.render` (NumPy colormap + PNG
+encoder) by default; the matplotlib figure is kept as the optional 'pretty'
+mode and is only imported when used.
+
+Audio is stored in one of `AUDIO_FORMATS`: float32 WAV (the default, bit
+exact), or 16/24-bit PCM as WAV or FLAC. FLAC is lossless for the
+quantized samples and half the float WAV size or less. An optional
+preview (`preview.<ext>`, mono 16-bit, downsampled to `preview_sr`) gives
+clients a small file to play. Storage is bounded by
+`whisperguard.retention`.
 """
+import io
 import os
+import shutil
+import tempfile
 import time
 import json
 import hashlib
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import logging
 import numpy as np
 import soundfile as sf
 
+from whisperguard import config
+from whisperguard.evidence_index import EvidenceIndex
+from whisperguard.storage import event_dir, new_event_id, relative_folder
+from whisperguard.model.features import stft_power
+from whisperguard.render import spectrogram_png
+
+
+logger = logging.getLogger('whisperguard.evidence')
+
+EVIDENCE_DIR = os.path.join(os.path.dirname(__file__), 'static', 'evidence')
+
 
 def _ensure_dir(path):
     os.makedirs(path, exist_ok=True)
@@ -26,20 +55,114 @@ def sha256_file(path):
     return h.hexdigest()
 
 
-def save_spectrogram(waveform, sr, out_path):
-    plt.figure(figsize=(6, 3))
-    # use matplotlib.specgram for a dependency-light spectrogram
-    Pxx, freqs, bins, im = plt.specgram(waveform, NFFT=1024, Fs=sr, noverlap=512, cmap='magma')
-    plt.ylim(0, sr/2)
-    plt.xlabel('Time')
-    plt.ylabel('Frequency (Hz)')
-    plt.colorbar(label='Intensity (dB)')
-    plt.tight_layout()
-    plt.savefig(out_path, dpi=150)
-    plt.close()
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _figure(figsize):
+    # object-oriented matplotlib: no pyplot state, nothing to close on error
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _figure_png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=150)
+    return buf.getvalue()
+
+
+def render_spectrogram(waveform, sr, power=None, mode='fast'):
+    """Return spectrogram PNG bytes for `waveform`.
+
+    mode 'fast' renders `power` (an STFT power spectrogram such as
+    `ChunkFeatures.power`, computed here when None) with NumPy; mode
+    'pretty' draws an annotated matplotlib figure with axes and colorbar.
+    """
+    if mode == 'pretty':
+        fig = _figure((6, 3))
+        ax = fig.add_subplot()
+        Pxx, freqs, bins, im = ax.specgram(waveform, NFFT=1024, Fs=sr, noverlap=512, cmap='magma')
+        ax.set_ylim(0, sr/2)
+        ax.set_xlabel('Time')
+        ax.set_ylabel('Frequency (Hz)')
+        fig.colorbar(im, ax=ax, label='Intensity (dB)')
+        fig.tight_layout()
+        return _figure_png(fig)
+    if power is None:
+        power = stft_power(waveform, n_fft=1024, hop_length=512)
+    return spectrogram_png(power)
+
+
+def render_waveform_plot(waveform, sr):
+    fig = _figure((6, 2))
+    ax = fig.add_subplot()
+    t = np.arange(len(waveform)) / float(sr)
+    ax.plot(t, waveform)
+    ax.set_xlabel('Time (s)')
+    fig.tight_layout()
+    return _figure_png(fig)
+
+
+def save_spectrogram(waveform, sr, out_path, power=None, mode='fast'):
+    """Write a spectrogram PNG of `waveform` to `out_path`."""
+    with open(out_path, 'wb') as f:
+        f.write(render_spectrogram(waveform, sr, power=power, mode=mode))
+
 
+# name: (file extension, soundfile format, subtype)
+AUDIO_FORMATS = {
+    'wav': ('wav', 'WAV', 'FLOAT'),
+    'pcm16': ('wav', 'WAV', 'PCM_16'),
+    'pcm24': ('wav', 'WAV', 'PCM_24'),
+    'flac': ('flac', 'FLAC', 'PCM_16'),
+    'flac24': ('flac', 'FLAC', 'PCM_24'),
+}
 
-def save_evidence(waveform, sr, ml_scores, rule_ratio, level, score, base_dir=None):
+
+def encode_audio(waveform, sr, audio_format='wav'):
+    """Return (file extension, bytes) of `waveform` in `audio_format` (see AUDIO_FORMATS).
+
+    Headers are patched after the samples are written, so the file is built
+    in memory and hashed once complete rather than streamed to disk.
+    """
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"unknown evidence audio format: {audio_format}")
+    ext, fmt, subtype = AUDIO_FORMATS[audio_format]
+    if subtype != 'FLOAT':
+        # integer PCM wraps around outside [-1, 1]
+        waveform = np.clip(waveform, -1.0, 1.0)
+    buf = io.BytesIO()
+    sf.write(buf, waveform, sr, format=fmt, subtype=subtype)
+    return ext, buf.getvalue()
+
+
+def encode_wav(waveform, sr):
+    """Return float WAV bytes for `waveform`."""
+    return encode_audio(waveform, sr, 'wav')[1]
+
+
+def downsample(waveform, sr, target_sr):
+    """Band-limited resampling of a 1-D signal to `target_sr` (FFT truncation)."""
+    n_out = max(1, int(round(len(waveform) * target_sr / float(sr))))
+    spectrum = np.fft.rfft(np.asarray(waveform, dtype=np.float64))[:n_out // 2 + 1]
+    return (np.fft.irfft(spectrum, n_out) * (n_out / len(waveform))).astype(np.float32)
+
+
+def artifact_paths(rel_folder, names):
+    """Paths (relative to static) of an event's artifacts, keyed as save_evidence returns them."""
+    paths = {'folder': rel_folder}
+    for name in names:
+        key = name.rsplit('.', 1)[0]
+        if key in ('audio', 'spectrogram', 'metadata', 'checksums', 'preview'):
+            paths[key] = f'{rel_folder}/{name}'
+    return paths
+
+
+def save_evidence(waveform, sr, ml_scores, rule_ratio, level, score, base_dir=None, event_id=None,
+                  spectrogram=None, render=None, incident=None, audio_format=None, preview_sr=None):
     """Save evidence artifacts and return paths.
 
     waveform: 1-D numpy array
@@ -49,49 +172,79 @@ def save_evidence(waveform, sr, ml_scores, rule_ratio, level, score, base_dir=No
     level: str
     score: float
     base_dir: optional base dir for saving (defaults to whisperguard/static/evidence)
+    event_id: optional event ID assigned up front (defaults to storage.new_event_id())
+    spectrogram: optional STFT power spectrogram already computed for `waveform`
+    render: 'fast' or 'pretty' spectrogram image (defaults to config.EVIDENCE_RENDER)
+    incident: optional incident details (span, hits, per-decision timeline;
+        see `whisperguard.incident`) stored in the metadata
+    audio_format: key of AUDIO_FORMATS (defaults to config.EVIDENCE_AUDIO_FORMAT)
+    preview_sr: sample rate of a downsampled preview clip; 0 for none
+        (defaults to config.EVIDENCE_PREVIEW_SR)
     """
     if base_dir is None:
-        base_dir = os.path.join(os.path.dirname(__file__), 'static', 'evidence')
-    ts = int(time.time())
-    folder = os.path.join(base_dir, f'event_{ts}')
-    _ensure_dir(folder)
-
-    wav_path = os.path.join(folder, 'audio.wav')
-    sf.write(wav_path, waveform, sr)
+        base_dir = EVIDENCE_DIR
+    ts = time.time()
+    event_id = event_id or new_event_id(ts)
+    folder = event_dir(base_dir, event_id)
+    _ensure_dir(os.path.dirname(folder))
 
-    png_path = os.path.join(folder, 'spectrogram.png')
+    audio_format = audio_format or config.EVIDENCE_AUDIO_FORMAT
+    preview_sr = config.EVIDENCE_PREVIEW_SR if preview_sr is None else preview_sr
+    ext, audio = encode_audio(waveform, sr, audio_format)
+    audio_name = f'audio.{ext}'
+    artifacts = {audio_name: audio}
     try:
-        save_spectrogram(waveform, sr, png_path)
+        artifacts['spectrogram.png'] = render_spectrogram(
+            waveform, sr, power=spectrogram, mode=render or config.EVIDENCE_RENDER)
     except Exception:
         # fallback: save a simple waveform plot
-        plt.figure(figsize=(6, 2))
-        t = np.arange(len(waveform)) / float(sr)
-        plt.plot(t, waveform)
-        plt.xlabel('Time (s)')
-        plt.tight_layout()
-        plt.savefig(png_path, dpi=150)
-        plt.close()
-
-    fingerprint = sha256_file(wav_path)
+        artifacts['spectrogram.png'] = render_waveform_plot(waveform, sr)
+    if preview_sr and preview_sr < sr:
+        preview = downsample(waveform, sr, preview_sr)
+        artifacts[f'preview.{ext}'] = encode_audio(preview, preview_sr, 'flac' if ext == 'flac' else 'pcm16')[1]
+    hashes = {name: sha256_bytes(data) for name, data in artifacts.items()}
 
     meta = {
+        'id': event_id,
         'ts': ts,
         'level': level,
         'score': float(score),
         'rule_ratio': float(rule_ratio),
         'ml_scores': ml_scores,
-        'fingerprint': fingerprint,
+        'fingerprint': hashes[audio_name],
+        'duration': round(len(waveform) / float(sr), 6),
+        'audio_format': audio_format,
+        'sr': int(sr),
+        'artifacts': {name: {'sha256': hashes[name], 'bytes': len(data)}
+                      for name, data in artifacts.items()},
     }
-    meta_path = os.path.join(folder, 'metadata.json')
-    with open(meta_path, 'w', encoding='utf-8') as f:
-        json.dump(meta, f, indent=2)
+    if incident is not None:
+        meta['incident'] = incident
+    artifacts['metadata.json'] = json.dumps(meta, indent=2).encode('utf-8')
+    hashes['metadata.json'] = sha256_bytes(artifacts['metadata.json'])
+    artifacts['checksums.sha256'] = ''.join(
+        f'{hashes[name]}  {name}\n' for name in artifacts).encode('ascii')
+
+    # hidden staging dir next to the final folder, renamed into place when
+    # complete; event IDs are unique, so the rename never replaces a folder
+    staging = tempfile.mkdtemp(prefix=f'.{event_id}.', suffix='.tmp', dir=os.path.dirname(folder))
+    try:
+        for name, data in artifacts.items():
+            with open(os.path.join(staging, name), 'wb') as f:
+                f.write(data)
+        os.rename(staging, folder)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    try:
+        EvidenceIndex.for_dir(base_dir).add(meta, relative_folder(event_id), list(artifacts),
+                                             size=sum(len(data) for data in artifacts.values()))
+    except Exception:
+        # the folder is published either way; EvidenceIndex.rebuild recovers it
+        logger.exception('could not index evidence %s', folder)
 
     # Return paths relative to static so Flask can serve them
     rel_base = os.path.relpath(folder, os.path.join(os.path.dirname(__file__), 'static'))
     rel_base_normalized = rel_base.replace('\\', '/')
-    return {
-        'folder': rel_base_normalized,
-        'audio': f'{rel_base_normalized}/audio.wav',
-        'spectrogram': f'{rel_base_normalized}/spectrogram.png',
-        'metadata': f'{rel_base_normalized}/metadata.json',
-    }
+    return dict(artifact_paths(rel_base_normalized, artifacts), id=event_id, hashes=hashes)
@@ -0,0 +1,221 @@
+"""SQLite index of saved evidence packages.
+
+`save_evidence` adds one row per published event folder, so listing
+evidence is an indexed query instead of a directory walk that opens every
+metadata file. Results are ordered newest first and paginated with an
+opaque `(ts, id)` cursor. A revision counter bumped on every change lets
+HTTP handlers answer unchanged polls with 304 Not Modified.
+
+The database lives next to the evidence (`<base_dir>/.index.sqlite3`) and
+is opened in WAL mode so the web server and evidence worker processes can
+read and write it concurrently. Each row also records the package's size
+on disk, which `whisperguard.retention` sums and evicts by.
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+INDEX_FILENAME = '.index.sqlite3'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    ts REAL NOT NULL,
+    level TEXT,
+    score REAL,
+    rule_ratio REAL,
+    folder TEXT NOT NULL,
+    files TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts, id);
+CREATE INDEX IF NOT EXISTS events_level_ts ON events (level, ts, id);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('revision', 0);
+"""
+
+
+def encode_cursor(ts, event_id):
+    return f'{ts!r}:{event_id}'
+
+
+def decode_cursor(cursor):
+    """Split a cursor from `encode_cursor`; ValueError if it is not one."""
+    ts, sep, event_id = str(cursor).partition(':')
+    ts = float(ts)
+    if not sep or not event_id or ts != ts:
+        raise ValueError(f'malformed cursor: {cursor!r}')
+    return ts, event_id
+
+
+class EvidenceIndex:
+    def __init__(self, path):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(events)')]
+            if 'bytes' not in columns:
+                # indexes created before sizes were tracked; filled in by backfill
+                conn.execute('ALTER TABLE events ADD COLUMN bytes INTEGER NOT NULL DEFAULT 0')
+
+    @classmethod
+    def for_dir(cls, base_dir):
+        """Open (creating if needed) the index stored in `base_dir`."""
+        os.makedirs(base_dir, exist_ok=True)
+        return cls(os.path.join(base_dir, INDEX_FILENAME))
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def add(self, meta, folder, files, size=None):
+        """Insert or replace the row for one evidence folder.
+
+        meta: the event's metadata dict (must contain 'id' and 'ts')
+        folder: folder path relative to the evidence base dir
+        files: list of file names in the folder
+        size: bytes on disk (defaults to the artifact sizes in `meta`)
+        """
+        self.add_many([(meta, folder, files, size)])
+
+    def add_many(self, entries):
+        """Add several (meta, folder, files[, size]) entries in one transaction."""
+        rows = []
+        for meta, folder, files, *size in entries:
+            size = size[0] if size and size[0] is not None else sum(
+                a.get('bytes', 0) for a in (meta.get('artifacts') or {}).values())
+            rows.append((meta['id'], float(meta['ts']), meta.get('level'), meta.get('score'),
+                         meta.get('rule_ratio'), folder, json.dumps(sorted(files)), json.dumps(meta), int(size)))
+        if not rows:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.executemany('INSERT OR REPLACE INTO events (id, ts, level, score, rule_ratio, folder, files, '
+                             'metadata, bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'revision'")
+
+    def remove(self, event_id):
+        with closing(self._connect()) as conn, conn:
+            cur = conn.execute('DELETE FROM events WHERE id = ?', (event_id,))
+            if cur.rowcount:
+                conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'revision'")
+            return cur.rowcount > 0
+
+    def usage(self):
+        """(number of events, total bytes) in the index."""
+        with closing(self._connect()) as conn:
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM events').fetchone()
+        return count, total
+
+    def older_than(self, ts, limit=500):
+        """[(id, folder, bytes)] of the oldest events with `ts` before the given time."""
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT id, folder, bytes FROM events WHERE ts < ? ORDER BY ts, id LIMIT ?',
+                                (float(ts), int(limit))).fetchall()
+
+    def eviction_order(self, priority, limit=500):
+        """[(id, folder, bytes)] in eviction order: by position of the level in
+        `priority` (levels not listed first), then oldest first."""
+        rank = 'CASE level ' + ' '.join(f'WHEN ? THEN {i + 1}' for i in range(len(priority))) + ' ELSE 0 END'
+        with closing(self._connect()) as conn:
+            return conn.execute(f'SELECT id, folder, bytes FROM events ORDER BY {rank}, ts, id LIMIT ?',
+                                list(priority) + [int(limit)]).fetchall()
+
+    def unsized(self, limit=500):
+        """[(id, folder)] of events whose size is not known (indexed before sizes were kept)."""
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT id, folder FROM events WHERE bytes = 0 LIMIT ?', (int(limit),)).fetchall()
+
+    def set_sizes(self, sizes):
+        """Record bytes on disk for [(id, bytes)]."""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany('UPDATE events SET bytes = ? WHERE id = ?', [(int(b), i) for i, b in sizes])
+
+    def claim(self, name, interval, now):
+        """Take the periodic task `name` if nobody ran it in the last `interval` seconds.
+
+        Lets several processes sharing the index run a task such as a
+        retention sweep once per interval between them.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)', (name,))
+            cur = conn.execute('UPDATE counters SET value = ? WHERE name = ? AND value <= ?',
+                               (int(now), name, int(now - interval)))
+            return cur.rowcount == 1
+
+    def revision(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT value FROM counters WHERE name = 'revision'").fetchone()[0]
+
+    def count(self):
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+
+    def query(self, limit=100, cursor=None, levels=None, min_score=None, max_score=None,
+              since=None, until=None):
+        """Return (items, next_cursor) newest first.
+
+        items are dicts with 'name' (folder), 'metadata' and 'files'.
+        next_cursor is None on the last page. levels is an iterable of level
+        names; since/until bound `ts` (inclusive/exclusive, epoch seconds).
+        """
+        where, args = [], []
+        if cursor:
+            ts, event_id = decode_cursor(cursor)
+            where.append('(ts < ? OR (ts = ? AND id < ?))')
+            args += [ts, ts, event_id]
+        if levels:
+            levels = list(levels)
+            where.append('level IN (%s)' % ','.join('?' * len(levels)))
+            args += levels
+        if min_score is not None:
+            where.append('score >= ?')
+            args.append(float(min_score))
+        if max_score is not None:
+            where.append('score <= ?')
+            args.append(float(max_score))
+        if since is not None:
+            where.append('ts >= ?')
+            args.append(float(since))
+        if until is not None:
+            where.append('ts < ?')
+            args.append(float(until))
+        sql = 'SELECT id, ts, folder, files, metadata FROM events'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY ts DESC, id DESC LIMIT ?'
+        args.append(int(limit) + 1)
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, args).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        items = [{'name': folder, 'metadata': json.loads(meta), 'files': json.loads(files)}
+                 for _, _, folder, files, meta in rows]
+        return items, next_cursor
+
+    def rebuild(self, base_dir):
+        """Index every published event folder under `base_dir`; return the count."""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(base_dir):
+            # never descend into staging folders
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            if 'metadata.json' not in filenames:
+                continue
+            try:
+                with open(os.path.join(dirpath, 'metadata.json'), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            folder = os.path.relpath(dirpath, base_dir).replace('\\', '/')
+            meta['id'] = os.path.basename(dirpath)
+            meta.setdefault('ts', os.path.getmtime(dirpath))
+            size = sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+            entries.append((meta, folder, filenames, size))
+        self.add_many(entries)
+        return len(entries)
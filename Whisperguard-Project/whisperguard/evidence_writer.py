@@ -0,0 +1,219 @@
+"""Queued evidence writer backed by a pool of worker processes.
+
+`EvidenceWriter.submit` assigns an evidence ID and returns immediately;
+`save_evidence` runs in a worker process and `status(evidence_id)` reports
+progress ('queued', 'writing', 'ready', 'failed', 'dropped' or 'deleted').
+
+At most `workers` jobs are handed to the process pool at a time. Further
+jobs wait in a pending list of at most `max_pending` entries; when it is
+full the `policy` decides what happens to a new job:
+
+- 'drop_newest': the new job is dropped
+- 'drop_oldest': the oldest pending job is dropped
+- 'coalesce':    the new job is folded into the newest pending job, which
+                 keeps whichever chunk scored higher; the returned ID is
+                 that pending job's ID
+"""
+import collections
+import concurrent.futures
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from whisperguard import metrics
+from whisperguard.evidence import artifact_paths, save_evidence
+from whisperguard.storage import event_dir, new_event_id as new_evidence_id, relative_folder
+
+
+POLICIES = ('drop_newest', 'drop_oldest', 'coalesce')
+
+
+class EvidenceWriter:
+    def __init__(self, workers=2, max_pending=16, policy='coalesce', base_dir=None, history=1024):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown evidence policy: {policy}")
+        self.workers = max(0, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.policy = policy
+        self.base_dir = base_dir
+        self.history = history
+        self.counters = {'submitted': 0, 'written': 0, 'failed': 0, 'dropped': 0, 'coalesced': 0}
+        self._jobs = collections.OrderedDict()
+        self._pending = collections.deque()
+        self._inflight = 0
+        self._executor = None
+        # re-entrant: a future that is already done runs its callback inline
+        self._lock = threading.Condition(threading.RLock())
+
+    def submit(self, waveform, sr, ml_scores, rule_ratio, level, score, spectrogram=None, incident=None):
+        """Queue an evidence package and return its ID without waiting.
+
+        `spectrogram` is an optional precomputed STFT power spectrogram; it
+        is sent to the worker as float32 to keep the pickled job small.
+        `incident` is passed through to `save_evidence`.
+        """
+        if spectrogram is not None:
+            spectrogram = np.asarray(spectrogram, dtype=np.float32)
+        kwargs = {'waveform': waveform, 'sr': sr, 'ml_scores': ml_scores,
+                  'rule_ratio': rule_ratio, 'level': level, 'score': float(score),
+                  'base_dir': self.base_dir, 'spectrogram': spectrogram, 'incident': incident}
+        if self.workers == 0:
+            evidence_id = new_evidence_id()
+            with self._lock:
+                self.counters['submitted'] += 1
+                self._record(evidence_id, level, score)
+            self._run_inline(evidence_id, kwargs)
+            return evidence_id
+
+        with self._lock:
+            self.counters['submitted'] += 1
+            if len(self._pending) >= self.max_pending:
+                if self.policy == 'coalesce':
+                    return self._coalesce(kwargs)
+                if self.policy == 'drop_newest':
+                    evidence_id = new_evidence_id()
+                    self._record(evidence_id, level, score, state='dropped')
+                    self.counters['dropped'] += 1
+                    return evidence_id
+                old_id, _ = self._pending.popleft()
+                self._jobs[old_id]['state'] = 'dropped'
+                self.counters['dropped'] += 1
+            evidence_id = new_evidence_id()
+            self._record(evidence_id, level, score)
+            self._pending.append((evidence_id, kwargs))
+            self._pump()
+        return evidence_id
+
+    def status(self, evidence_id):
+        """Return the job record for `evidence_id`, or None if unknown.
+
+        IDs not tracked by this writer (e.g. written by another process) are
+        reported 'ready' when their metadata file exists on disk. Written
+        packages removed since (see `whisperguard.retention`) are 'deleted'.
+        """
+        base_dir = self.base_dir or os.path.join(os.path.dirname(__file__), 'static', 'evidence')
+        with self._lock:
+            job = self._jobs.get(evidence_id)
+            if job is not None:
+                job = dict(job)
+        if job is not None:
+            if job['state'] == 'ready' and not os.path.isdir(event_dir(base_dir, evidence_id)):
+                job['state'] = 'deleted'
+            return job
+        if not re.fullmatch(r'[\w-]+', evidence_id or ''):
+            return None
+        try:
+            names = os.listdir(event_dir(base_dir, evidence_id))
+        except OSError:
+            return None
+        if 'metadata.json' not in names:
+            return None
+        return {'id': evidence_id, 'state': 'ready',
+                'evidence': artifact_paths(f'evidence/{relative_folder(evidence_id)}', names)}
+
+    def stats(self):
+        with self._lock:
+            out = dict(self.counters)
+            out.update({'pending': len(self._pending), 'inflight': self._inflight,
+                        'max_pending': self.max_pending, 'policy': self.policy})
+            return out
+
+    def flush(self, timeout=None):
+        """Wait until no job is pending or in flight; return True if drained."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while self._pending or self._inflight:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+        return True
+
+    def shutdown(self, wait=True, timeout=None):
+        """Stop the pool; with `wait`, finish queued jobs first."""
+        if wait:
+            self.flush(timeout)
+        with self._lock:
+            executor, self._executor = self._executor, None
+            for evidence_id, _ in self._pending:
+                self._jobs[evidence_id]['state'] = 'dropped'
+                self.counters['dropped'] += 1
+            self._pending.clear()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    # -- internals (call with self._lock held unless noted) --
+
+    def _record(self, evidence_id, level, score, state='queued'):
+        self._jobs[evidence_id] = {'id': evidence_id, 'state': state, 'level': level,
+                                   'score': float(score), 'submitted': time.time()}
+        while len(self._jobs) > self.history:
+            oldest = next(iter(self._jobs))
+            if self._jobs[oldest]['state'] in ('queued', 'writing'):
+                break
+            self._jobs.popitem(last=False)
+
+    def _coalesce(self, kwargs):
+        evidence_id, current = self._pending[-1]
+        job = self._jobs[evidence_id]
+        if kwargs['score'] > current['score']:
+            self._pending[-1] = (evidence_id, kwargs)
+            job['level'] = kwargs['level']
+            job['score'] = kwargs['score']
+        job['coalesced'] = job.get('coalesced', 0) + 1
+        self.counters['coalesced'] += 1
+        return evidence_id
+
+    def _pump(self):
+        while self._pending and self._inflight < self.workers:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            evidence_id, kwargs = self._pending.popleft()
+            self._jobs[evidence_id]['state'] = 'writing'
+            try:
+                fut = self._executor.submit(save_evidence, event_id=evidence_id, **kwargs)
+            except Exception as e:
+                # e.g. BrokenProcessPool; start a fresh pool for later jobs
+                self._executor = None
+                self.counters['failed'] += 1
+                self._jobs[evidence_id].update({'state': 'failed', 'error': str(e)})
+                self._lock.notify_all()
+                continue
+            self._inflight += 1
+            fut.add_done_callback(lambda f, eid=evidence_id, t=time.perf_counter(): self._done(eid, f, t))
+
+    def _done(self, evidence_id, fut, started):
+        # runs on the executor's callback thread; takes the lock itself
+        metrics.observe('evidence', time.perf_counter() - started)
+        with self._lock:
+            self._inflight -= 1
+            job = self._jobs.get(evidence_id)
+            try:
+                evidence = fut.result()
+            except Exception as e:
+                self.counters['failed'] += 1
+                if job is not None:
+                    job.update({'state': 'failed', 'error': str(e)})
+            else:
+                self.counters['written'] += 1
+                if job is not None:
+                    job.update({'state': 'ready', 'evidence': evidence, 'finished': time.time()})
+            if self._executor is not None:
+                self._pump()
+            self._lock.notify_all()
+
+    def _run_inline(self, evidence_id, kwargs):
+        try:
+            with metrics.timer('evidence'):
+                evidence = save_evidence(event_id=evidence_id, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self.counters['failed'] += 1
+                self._jobs[evidence_id].update({'state': 'failed', 'error': str(e)})
+            return
+        with self._lock:
+            self.counters['written'] += 1
+            self._jobs[evidence_id].update({'state': 'ready', 'evidence': evidence, 'finished': time.time()})
@@ -1,21 +1,50 @@
 """Combine rule-based and ML scores to produce a risk level."""
+import numpy as np
+
+LEVELS = np.array(["SAFE", "SUSPICIOUS", "THREAT"])
+
+
+def thresholds(sensitivity=0.5):
+    """Return the (SUSPICIOUS, THREAT) combined-score thresholds for `sensitivity`."""
+    # sensitivity shifts thresholds
+    scale = 1.0 - sensitivity * 0.5
+    return 0.6 * scale, 0.85 * scale
+
+
+def fuse_batch(rule_scores, ml_scores, sensitivity=0.5, whitelist=False, normal_index=0):
+    """Vectorized fusion for N chunks; return (levels, combined).
+
+    rule_scores: (N,) energy ratios or binary flags (0..1)
+    ml_scores: (N, C) class confidences; column `normal_index` is Normal
+        (None if there is no Normal column)
+    sensitivity: user setting (0..1) increases alerts
+    whitelist: if True, force safe
+    levels is an (N,) array of level names, combined an (N,) float array.
+    """
+    rule_scores = np.asarray(rule_scores, dtype=float)
+    if whitelist:
+        return np.full(rule_scores.shape, "SAFE", dtype=LEVELS.dtype), np.zeros(rule_scores.shape)
+    ml_scores = np.asarray(ml_scores, dtype=float)
+    # Consider maximum non-normal class confidence
+    if normal_index is not None:
+        ml_scores = np.delete(ml_scores, normal_index, axis=1)
+    non_normal = np.maximum(ml_scores.max(axis=1), 0.0) if ml_scores.shape[1] else np.zeros(len(ml_scores))
+    combined = np.maximum(rule_scores, non_normal)
+    suspicious, threat = thresholds(sensitivity)
+    index = (combined >= suspicious).astype(int) + (combined >= threat)
+    return LEVELS[index], combined
+
 
 def fuse_scores(rule_score, ml_scores, sensitivity=0.5, whitelist=False):
-    """Return risk level and combined score.
+    """Return risk level and combined score (single-chunk `fuse_batch`).
 
     rule_score: float (0..1) energy ratio or binary
     ml_scores: dict of class->confidence
     sensitivity: user setting (0..1) increases alerts
     whitelist: if True, force safe
     """
-    if whitelist:
-        return "SAFE", 0.0
-    # Consider maximum non-normal class confidence
-    non_normal = max([v for k, v in ml_scores.items() if k != "Normal"] + [0.0])
-    combined = max(rule_score, non_normal)
-    # sensitivity shifts thresholds
-    if combined >= 0.85 * (1.0 - sensitivity * 0.5):
-        return "THREAT", combined
-    if combined >= 0.6 * (1.0 - sensitivity * 0.5):
-        return "SUSPICIOUS", combined
-    return "SAFE", combined
+    names = list(ml_scores)
+    values = np.array([[ml_scores[k] for k in names]], dtype=float).reshape(1, len(names))
+    normal_index = names.index("Normal") if "Normal" in names else None
+    levels, combined = fuse_batch([rule_score], values, sensitivity, whitelist, normal_index)
+    return str(levels[0]), float(combined[0])
@@ -0,0 +1,166 @@
+"""Coalesce alerting decisions into incidents.
+
+Decisions arrive every chunk or hop, so a 30 s attack alerts 30 or more
+times. `IncidentTracker` sits after fusion and turns consecutive hits
+into one incident:
+
+- the first SUSPICIOUS or THREAT decision opens an incident, whose audio
+  starts `pre_roll` seconds before that decision's window;
+- while it is open, a decision counts as a hit if it alerts or its score
+  stays above `release` times the SUSPICIOUS threshold (hysteresis, so a
+  score hovering around the threshold does not split the incident);
+- `post_roll` seconds of stream time without a hit close it, keeping that
+  much audio after the last hit; an incident longer than `max_seconds`
+  is closed early and a still-alerting stream opens the next one.
+
+Between incidents the stream's audio only goes into a small fixed ring
+holding the pre-roll, so a quiet stream costs one copy into the ring per
+chunk and no allocation; an open incident collects the audio that
+follows. `gap` marks audio that never reached the tracker (muted or
+dropped chunks): it closes the open incident rather than splicing audio
+across the hole. A closed incident carries one contiguous copy of its audio, its
+peak decision and a per-decision timeline, ready for a single
+`save_evidence` call.
+"""
+import time
+
+import numpy as np
+
+from whisperguard.audio.ringbuffer import RingBuffer
+from whisperguard.fusion import thresholds
+
+ALERT_LEVELS = ('SUSPICIOUS', 'THREAT')
+_RANK = {'SAFE': 0, 'SUSPICIOUS': 1, 'THREAT': 2}
+
+
+class IncidentTracker:
+    def __init__(self, sr, window_seconds=1.0, pre_roll=1.0, post_roll=2.0, max_seconds=30.0,
+                 sensitivity=0.5, release=0.8, on_open=None):
+        """
+        sr: sample rate of the tracked stream
+        window_seconds: audio each decision looks at (ends at the decision)
+        pre_roll: seconds of audio kept before the first hit's window
+        post_roll: seconds without a hit that close an incident, kept as
+            audio after the last hit
+        max_seconds: longest incident before it is closed and restarted
+        release: keep-alive score as a fraction of the SUSPICIOUS threshold
+        on_open: optional callable(incident) when an incident opens
+        """
+        if pre_roll < 0 or post_roll < 0 or max_seconds <= 0:
+            raise ValueError("pre_roll and post_roll must be >= 0 and max_seconds positive")
+        self.sr = int(sr)
+        self.window = max(1, int(sr * window_seconds))
+        self.pre_roll = int(sr * pre_roll)
+        self.post_roll = int(sr * post_roll)
+        self.max_samples = max(1, int(sr * max_seconds))
+        self.release_score = release * thresholds(sensitivity)[0]
+        self.on_open = on_open
+        # pre-roll plus the first hit's window, and slack for audio fed
+        # ahead of the decisions
+        self._audio = RingBuffer(self.pre_roll + 3 * self.window)
+        self._floor = 0
+        self.current = None
+        self.opened = 0
+        self.closed = 0
+
+    @property
+    def written(self):
+        return self._audio.written
+
+    def feed(self, samples):
+        """Append the stream's next mono samples."""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        self._audio.write(samples[:, np.newaxis])
+        if self.current is not None and len(samples):
+            self.current['chunks'].append(samples.copy())
+
+    def decide(self, result, end=None):
+        """Track one decision; return the incident it closes, or None.
+
+        result: a decision with 'level', 'score', 'rule_ratio' and
+            'ml_scores' (e.g. from `analyze_batch` or `StreamAnalyzer`)
+        end: absolute sample index where the decision's window ends
+            (defaults to all audio fed so far)
+        """
+        end = self.written if end is None else int(end)
+        level, score = result['level'], float(result['score'])
+        hit = level in ALERT_LEVELS
+        inc = self.current
+        closed = None
+        if inc is not None:
+            if hit or score >= self.release_score:
+                inc['last_hit'] = end
+            if end - inc['last_hit'] >= self.post_roll:
+                closed = self._close(inc['last_hit'] + self.post_roll, 'quiet')
+            elif end - inc['start'] > self.max_samples:
+                closed = self._close(end, 'max_length')
+            else:
+                self._record(inc, result, end, hit)
+                return None
+        if hit:
+            self._open(result, end)
+        return closed
+
+    def flush(self, reason='flush'):
+        """Close the open incident with the audio fed so far (e.g. at the end of a stream)."""
+        if self.current is None:
+            return None
+        return self._close(min(self.written, self.current['last_hit'] + self.post_roll), reason)
+
+    def gap(self, frames=0):
+        """Mark `frames` samples missing before the next `feed`.
+
+        Closes the open incident where its audio stops (returned, or None),
+        keeps stream times counting through the gap and takes the next
+        incident's pre-roll only from audio after it.
+        """
+        closed = self.flush('gap')
+        self._audio.skip(frames)
+        self._floor = self.written
+        return closed
+
+    def _open(self, result, end):
+        start = max(0, end - self.window - self.pre_roll, self._audio.oldest(), self._floor)
+        written = self.written
+        self.current = {'start': start, 'last_hit': end, 'opened_at': time.time(),
+                        'level': 'SAFE', 'score': -1.0, 'hits': 0, 'timeline': [],
+                        'chunks': [self._audio.window(written, written - start)[:, 0].copy()]}
+        self.opened += 1
+        self._record(self.current, result, end, True)
+        if self.on_open is not None:
+            self.on_open(self._summary(self.current, end))
+
+    def _record(self, inc, result, end, hit):
+        level, score = result['level'], float(result['score'])
+        inc['timeline'].append({'offset': round(max(0, end - self.window) / self.sr, 6),
+                                'end': round(end / self.sr, 6), 'level': level,
+                                'score': round(score, 6), 'rule_ratio': round(float(result['rule_ratio']), 6)})
+        inc['hits'] += hit
+        if (_RANK[level], score) > (_RANK[inc['level']], inc['score']):
+            inc.update(level=level, score=score, rule_ratio=float(result['rule_ratio']),
+                       ml_scores=dict(result['ml_scores']))
+
+    def _summary(self, inc, end):
+        return {'start': round(inc['start'] / self.sr, 6), 'end': round(end / self.sr, 6),
+                'duration': round((end - inc['start']) / self.sr, 6), 'opened_at': inc['opened_at'],
+                'level': inc['level'], 'score': inc['score'], 'rule_ratio': inc['rule_ratio'],
+                'ml_scores': inc['ml_scores'], 'hits': inc['hits'], 'decisions': len(inc['timeline']),
+                'timeline': list(inc['timeline'])}
+
+    def _close(self, end, reason):
+        inc, self.current = self.current, None
+        end = max(inc['start'], min(end, self.written))
+        self.closed += 1
+        incident = self._summary(inc, end)
+        audio = np.concatenate(inc['chunks'])[:end - inc['start']]
+        incident.update(closed_at=time.time(), reason=reason, audio=audio)
+        return incident
+
+    def stats(self):
+        return {'opened': self.opened, 'closed': self.closed, 'open': self.current is not None}
+
+
+def metadata(incident):
+    """The parts of a closed incident stored with its evidence (no audio, no peak scores)."""
+    return {k: incident[k] for k in ('start', 'end', 'duration', 'opened_at', 'closed_at', 'reason',
+                                     'hits', 'decisions', 'timeline')}
@@ -1,11 +1,145 @@
-"""Simple event logger for WhisperGuard."""
+"""Event store for WhisperGuard.
+
+`EventLogger` numbers every event with an increasing `seq`. Clients pass
+the last seq they saw to `since` and get only newer events, instead of
+the whole history on every chunk.
+
+Without a `path` the newest `maxlen` events are kept in memory (older
+ones fall off the ring, so memory stays flat however long the process
+runs).
+
+With a `path` the events live in an SQLite database opened in WAL mode,
+like the evidence index, and survive restarts. Every server worker
+process appends to and reads from the same database, and `seq` is the
+table's AUTOINCREMENT key: one ordering shared by all workers, so a
+cursor from one worker is valid on any other. Only the newest
+`max_file_events` rows are kept; per-level counters live in their own
+table, so `counts` stays exact.
+"""
+import collections
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    event TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counts (level TEXT PRIMARY KEY, n INTEGER NOT NULL);
+"""
+
 
 class EventLogger:
-    def __init__(self):
-        self._events = []
+    def __init__(self, maxlen=1000, path=None, max_file_events=10000):
+        """
+        maxlen: events kept in memory, and returned by `list` (None for no bound)
+        path: optional SQLite database shared by every process using it
+        max_file_events: events kept in the database
+        """
+        self.maxlen = maxlen
+        self.max_file_events = max(1, int(max_file_events))
+        self.path = path
+        self._events = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._counts = collections.Counter()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with closing(self._connect()) as conn, conn:
+                conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        # one connection per call: safe across threads and forked workers
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
 
     def append(self, event):
-        self._events.append(event)
+        """Store a copy of `event` with the next seq; return the copy."""
+        level = event.get('level', 'UNKNOWN')
+        if self.path:
+            with closing(self._connect()) as conn, conn:
+                seq = conn.execute('INSERT INTO events (event) VALUES (?)',
+                                   (json.dumps(event, default=str),)).lastrowid
+                conn.execute('INSERT INTO counts (level, n) VALUES (?, 1) '
+                             'ON CONFLICT (level) DO UPDATE SET n = n + 1', (level,))
+                conn.execute('DELETE FROM events WHERE seq <= ?', (seq - self.max_file_events,))
+            return dict(event, seq=seq)
+        with self._lock:
+            self._seq += 1
+            event = dict(event, seq=self._seq)
+            self._events.append(event)
+            self._counts[level] += 1
+            return event
+
+    def _rows(self, sql, params=()):
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [dict(json.loads(event), seq=seq) for seq, event in rows]
 
     def list(self):
-        return list(self._events)
+        """The newest `maxlen` events, oldest first."""
+        if self.path:
+            limit = -1 if self.maxlen is None else self.maxlen
+            return self._rows('SELECT seq, event FROM (SELECT seq, event FROM events '
+                              'ORDER BY seq DESC LIMIT ?) ORDER BY seq', (limit,))
+        with self._lock:
+            return list(self._events)
+
+    def since(self, cursor=0, limit=None):
+        """Return (events with seq > cursor, oldest first, next cursor).
+
+        With `limit`, returns the oldest `limit` of them; pass the returned
+        cursor back to get the rest. Events no longer held are skipped
+        (compare `oldest()` with your cursor to detect a gap).
+        """
+        cursor = int(cursor or 0)
+        if cursor > self.cursor:
+            # cursor from before a restart of a memory-only store
+            cursor = 0
+        if self.path:
+            newer = self._rows('SELECT seq, event FROM events WHERE seq > ? ORDER BY seq LIMIT ?',
+                               (cursor, -1 if limit is None else limit))
+        else:
+            with self._lock:
+                newer = []
+                for event in reversed(self._events):
+                    if event['seq'] <= cursor:
+                        break
+                    newer.append(event)
+            newer.reverse()
+            if limit is not None:
+                newer = newer[:limit]
+        return newer, (newer[-1]['seq'] if newer else cursor)
+
+    @property
+    def cursor(self):
+        """Seq of the newest event (0 when there are none)."""
+        if self.path:
+            with closing(self._connect()) as conn:
+                row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+            return row[0] if row else 0
+        return self._seq
+
+    def oldest(self):
+        """Seq of the oldest event still held, or None."""
+        if self.path:
+            with closing(self._connect()) as conn:
+                return conn.execute('SELECT MIN(seq) FROM events').fetchone()[0]
+        with self._lock:
+            return self._events[0]['seq'] if self._events else None
+
+    def counts(self):
+        """Events logged per level since the store was created, plus 'total'."""
+        if self.path:
+            with closing(self._connect()) as conn:
+                counts = dict(conn.execute('SELECT level, n FROM counts').fetchall())
+        else:
+            with self._lock:
+                counts = dict(self._counts)
+        counts['total'] = sum(counts.values())
+        return counts
@@ -0,0 +1,176 @@
+"""Per-stage latency histograms for the analysis hot path.
+
+Callers wrap a stage in `timer(stage)`:
+
+    with metrics.timer('predict'):
+        ml_scores = classifier.predict(...)
+
+Each observation is one `perf_counter` pair, a bisect into fixed
+exponential buckets (50 us .. 13 s) and a few increments under an
+uncontended lock, i.e. about a microsecond, so the timers stay on in
+production (set WHISPERGUARD_METRICS=0 to turn them off).
+
+Stages used by the web app and the CLI: 'decode', 'features' (STFT and
+log-mel), 'ultrasonic', 'predict', 'fusion', 'evidence' (writing one
+package), 'analyze' (a whole /analyze request) and 'stream_hop' (one
+incremental stream decision).
+
+`summary` gives count, mean and p50/p95/p99 per stage (quantiles are
+interpolated within buckets); `render_prometheus` gives the Prometheus
+text exposition served on /metrics. Histograms are per process, so
+/metrics labels them with the worker's pid.
+"""
+import bisect
+import threading
+import time
+
+from whisperguard import config
+
+# seconds; 50 us doubling up to ~13 s, plus +Inf
+BUCKETS = tuple(0.00005 * 2 ** k for k in range(19))
+
+enabled = config.METRICS_ENABLED
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        """(bucket counts, sum, count, max) taken atomically."""
+        with self._lock:
+            return list(self.counts), self.sum, self.count, self.max
+
+    def quantile(self, q, snapshot=None):
+        counts, _, count, top = snapshot or self.snapshot()
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else top
+                return min(lo + (hi - lo) * (rank - seen) / n, top)
+            seen += n
+        return top
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def histogram(stage):
+    h = _histograms.get(stage)
+    if h is None:
+        with _lock:
+            h = _histograms.setdefault(stage, Histogram())
+    return h
+
+
+def observe(stage, seconds):
+    if enabled:
+        histogram(stage).observe(seconds)
+
+
+class timer:
+    """Context manager recording the time spent in its block under `stage`."""
+
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if enabled:
+            histogram(self.stage).observe(time.perf_counter() - self.started)
+        return False
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def _stages():
+    # copied under the lock: a timer may add a stage while we iterate
+    with _lock:
+        return sorted(_histograms.items())
+
+
+def summary():
+    """{stage: {'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}}."""
+    out = {}
+    for stage, h in _stages():
+        snap = h.snapshot()
+        _, total, count, top = snap
+        if not count:
+            continue
+        out[stage] = {'count': count, 'mean_ms': round(total / count * 1000, 3),
+                      'p50_ms': round(h.quantile(0.5, snap) * 1000, 3),
+                      'p95_ms': round(h.quantile(0.95, snap) * 1000, 3),
+                      'p99_ms': round(h.quantile(0.99, snap) * 1000, 3),
+                      'max_ms': round(top * 1000, 3)}
+    return out
+
+
+def format_summary(stats=None):
+    """Fixed-width table of `summary()` for terminal output."""
+    stats = summary() if stats is None else stats
+    lines = [f"{'stage':12s} {'count':>8s} {'mean ms':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}"]
+    for stage, s in stats.items():
+        lines.append(f"{stage:12s} {s['count']:8d} {s['mean_ms']:9.3f} {s['p50_ms']:9.3f} {s['p95_ms']:9.3f} "
+                     f"{s['p99_ms']:9.3f} {s['max_ms']:9.3f}")
+    return '\n'.join(lines)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+def render_prometheus(extra=(), labels=None):
+    """Prometheus text format: the stage histograms plus `extra` metrics.
+
+    extra: iterable of (name, type, help, samples) where samples is a list
+        of (labels dict, value)
+    labels: labels added to every histogram sample, e.g. the worker's pid
+    """
+    labels = dict(labels or {})
+    lines = ['# HELP whisperguard_stage_seconds Time spent per analysis stage.',
+             '# TYPE whisperguard_stage_seconds histogram']
+    for stage, h in _stages():
+        counts, total, count, _ = h.snapshot()
+        stage_labels = dict(labels, stage=stage)
+        cumulative = 0
+        for le, n in zip(h.buckets + (float('inf'),), counts):
+            cumulative += n
+            le = '+Inf' if le == float('inf') else f'{le:.6g}'
+            lines.append(f'whisperguard_stage_seconds_bucket{_labels(dict(stage_labels, le=le))} {cumulative}')
+        lines.append(f'whisperguard_stage_seconds_sum{_labels(stage_labels)} {total:.9g}')
+        lines.append(f'whisperguard_stage_seconds_count{_labels(stage_labels)} {count}')
+    for name, kind, help_text, samples in extra:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            lines.append(f'{name}{_labels(labels)} {float(value):.9g}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,223 @@
+"""Inference backends for `CNNSpectrogramClassifier`.
+
+Both backends run the same small CNN on batches of normalized log-mel
+spectrograms shaped (batch, 1, n_mels, frames) and return class
+probabilities (batch, len(CLASSES)):
+
+    conv3x3(C1) -> ReLU -> maxpool 2x2 -> conv3x3(C2) -> ReLU
+    -> global average pool -> linear -> softmax
+
+- `NumpyCNN` is the pure-NumPy reference. Weights are an .npz file with
+  PyTorch-style names (conv1.weight, conv1.bias, conv2.weight,
+  conv2.bias, fc.weight, fc.bias), so a trained torch state_dict exports
+  directly. `to_onnx` writes the equivalent ONNX graph.
+- `OnnxBackend` runs an .onnx model with ONNX Runtime on the CPU, with
+  configurable intra-/inter-op thread counts. Its first output is read as
+  probabilities or as logits (softmax applied) according to the model's
+  `OUTPUT_KEY` metadata, which `to_onnx` writes, or else the output's
+  name ('probs' or 'logits').
+
+`load_backend` picks one from the file extension.
+"""
+import os
+import threading
+
+import numpy as np
+
+CLASSES = ('Normal', 'Ultrasonic', 'Hidden', 'Deepfake')
+
+# log-mel values are dB relative to the chunk maximum, i.e. about [-80, 0]
+INPUT_OFFSET = 40.0
+INPUT_SCALE = 40.0
+
+# ONNX metadata entry saying what the model's first output holds
+OUTPUT_KEY = 'whisperguard.output'
+OUTPUT_KINDS = ('probs', 'logits')
+
+
+def normalize_log_mel(log_mel):
+    """Map a (n_mels, t) log-mel spectrogram to a (1, n_mels, t) model input."""
+    x = (np.asarray(log_mel, dtype=np.float32) + INPUT_OFFSET) / INPUT_SCALE
+    return x[np.newaxis]
+
+
+def softmax(logits, axis=-1):
+    z = logits - logits.max(axis=axis, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=axis, keepdims=True)
+
+
+def conv2d_same(x, weight, bias):
+    """3x3 (odd kernel) stride-1 convolution with zero 'same' padding.
+
+    x: (B, Cin, H, W); weight: (Cout, Cin, kh, kw); returns (B, Cout, H, W).
+    """
+    kh, kw = weight.shape[2:]
+    xp = np.pad(x, ((0, 0), (0, 0), (kh // 2, kh // 2), (kw // 2, kw // 2)))
+    windows = np.lib.stride_tricks.sliding_window_view(xp, (kh, kw), axis=(2, 3))
+    out = np.tensordot(windows, weight, axes=([1, 4, 5], [1, 2, 3]))  # (B, H, W, Cout)
+    out += bias
+    return out.transpose(0, 3, 1, 2)
+
+
+def maxpool2x2(x):
+    b, c, h, w = x.shape
+    x = x[:, :, :h - h % 2, :w - w % 2]
+    return x.reshape(b, c, h // 2, 2, w // 2, 2).max(axis=(3, 5))
+
+
+class NumpyCNN:
+    WEIGHT_NAMES = ('conv1.weight', 'conv1.bias', 'conv2.weight', 'conv2.bias', 'fc.weight', 'fc.bias')
+
+    def __init__(self, weights):
+        missing = [k for k in self.WEIGHT_NAMES if k not in weights]
+        if missing:
+            raise ValueError(f"missing weights: {missing}")
+        self.weights = {k: np.ascontiguousarray(weights[k], dtype=np.float32) for k in self.WEIGHT_NAMES}
+        for w in self.weights.values():
+            w.flags.writeable = False
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({k: data[k] for k in data.files})
+
+    @classmethod
+    def random(cls, seed=0, channels=(8, 16), n_classes=len(CLASSES)):
+        """Randomly initialised weights (for tests and pipeline smoke runs)."""
+        rng = np.random.default_rng(seed)
+        c1, c2 = channels
+        return cls({
+            'conv1.weight': rng.normal(0, 0.5, (c1, 1, 3, 3)),
+            'conv1.bias': rng.normal(0, 0.1, c1),
+            'conv2.weight': rng.normal(0, 1.0 / np.sqrt(9 * c1), (c2, c1, 3, 3)),
+            'conv2.bias': rng.normal(0, 0.1, c2),
+            'fc.weight': rng.normal(0, 1.0 / np.sqrt(c2), (n_classes, c2)),
+            'fc.bias': np.zeros(n_classes),
+        })
+
+    def save(self, path):
+        np.savez(path, **self.weights)
+
+    def forward(self, batch):
+        """(B, 1, n_mels, t) inputs -> (B, n_classes) probabilities."""
+        w = self.weights
+        x = np.asarray(batch, dtype=np.float32)
+        x = np.maximum(conv2d_same(x, w['conv1.weight'], w['conv1.bias']), 0.0)
+        x = maxpool2x2(x)
+        x = np.maximum(conv2d_same(x, w['conv2.weight'], w['conv2.bias']), 0.0)
+        x = x.mean(axis=(2, 3))
+        return softmax(x @ w['fc.weight'].T + w['fc.bias'])
+
+    def to_onnx(self, path=None):
+        """Export the network as an ONNX graph; return the model bytes.
+
+        Needs the `onnx` package. Batch size, mel bins and frames are
+        dynamic axes.
+        """
+        import onnx
+        from onnx import TensorProto, helper, numpy_helper
+
+        w = self.weights
+        inits = [numpy_helper.from_array(w[k], name=k) for k in self.WEIGHT_NAMES]
+        nodes = [
+            helper.make_node('Conv', ['input', 'conv1.weight', 'conv1.bias'], ['c1'], pads=[1, 1, 1, 1]),
+            helper.make_node('Relu', ['c1'], ['r1']),
+            helper.make_node('MaxPool', ['r1'], ['p1'], kernel_shape=[2, 2], strides=[2, 2]),
+            helper.make_node('Conv', ['p1', 'conv2.weight', 'conv2.bias'], ['c2'], pads=[1, 1, 1, 1]),
+            helper.make_node('Relu', ['c2'], ['r2']),
+            helper.make_node('GlobalAveragePool', ['r2'], ['g']),
+            helper.make_node('Flatten', ['g'], ['f']),
+            helper.make_node('Gemm', ['f', 'fc.weight', 'fc.bias'], ['logits'], transB=1),
+            helper.make_node('Softmax', ['logits'], ['probs'], axis=1),
+        ]
+        graph = helper.make_graph(
+            nodes, 'whisperguard_cnn',
+            [helper.make_tensor_value_info('input', TensorProto.FLOAT, ['batch', 1, 'n_mels', 'frames'])],
+            [helper.make_tensor_value_info('probs', TensorProto.FLOAT, ['batch', len(w['fc.bias'])])],
+            initializer=inits)
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+        helper.set_model_props(model, {OUTPUT_KEY: 'probs'})
+        # IR 8 pairs with opset 13 and loads in older ONNX Runtime releases
+        model.ir_version = 8
+        onnx.checker.check_model(model)
+        data = model.SerializeToString()
+        if path is not None:
+            with open(path, 'wb') as f:
+                f.write(data)
+        return data
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU backend.
+
+    The model bytes are read once (e.g. in a preloading server master);
+    the InferenceSession and its thread pools are created lazily in each
+    process that runs inference, since they do not survive a fork.
+
+    `output` ('probs' or 'logits') overrides what the model says its
+    first output holds.
+    """
+
+    def __init__(self, path, intra_op_threads=0, inter_op_threads=0, output=None):
+        import onnxruntime  # noqa: F401  fail early when the runtime is missing
+
+        if output is not None and output not in OUTPUT_KINDS:
+            raise ValueError(f"output must be one of {OUTPUT_KINDS}: {output}")
+
+        with open(path, 'rb') as f:
+            self._model = f.read()
+        self.path = path
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.output = output
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                self._create_session()
+            return self._session
+
+    def _create_session(self):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        if self.intra_op_threads:
+            opts.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads:
+            opts.inter_op_num_threads = self.inter_op_threads
+        self._session = ort.InferenceSession(self._model, sess_options=opts,
+                                             providers=['CPUExecutionProvider'])
+        self._input = self._session.get_inputs()[0].name
+        if self.output is None:
+            self.output = self._output_kind(self._session)
+        self._pid = os.getpid()
+
+    def _output_kind(self, session):
+        kind = session.get_modelmeta().custom_metadata_map.get(OUTPUT_KEY)
+        if kind is None:
+            kind = session.get_outputs()[0].name
+        if kind not in OUTPUT_KINDS:
+            raise ValueError(f"{self.path}: cannot tell whether the output holds probabilities or logits; "
+                             f"set the {OUTPUT_KEY!r} metadata or pass output='probs' or 'logits'")
+        return kind
+
+    def forward(self, batch):
+        session = self._get_session()
+        out = session.run(None, {self._input: np.asarray(batch, dtype=np.float32)})[0]
+        if self.output == 'logits':
+            out = softmax(out, axis=1)
+        return out
+
+
+def load_backend(model_path, intra_op_threads=0, inter_op_threads=0):
+    """Backend for `model_path` by extension (.onnx or .npz)."""
+    ext = os.path.splitext(model_path)[1].lower()
+    if ext == '.onnx':
+        return OnnxBackend(model_path, intra_op_threads, inter_op_threads)
+    if ext == '.npz':
+        return NumpyCNN.load(model_path)
+    raise ValueError(f"unsupported model file (expected .onnx or .npz): {model_path}")
@@ -0,0 +1,88 @@
+"""Dynamic micro-batching of concurrent inference requests.
+
+Web sessions and analysis threads call `predict` one chunk at a time.
+`MicroBatcher` queues those calls and a single worker thread runs them as
+one batched forward pass once `max_batch` items are waiting or the oldest
+has waited `max_wait_ms`, whichever comes first. Inputs of different
+shapes (e.g. different chunk lengths) are batched separately.
+"""
+import collections
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    def __init__(self, fn, max_batch=32, max_wait_ms=2.0):
+        """fn: callable taking a stacked (B, ...) array, returning (B, ...) results."""
+        self.fn = fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self.counters = {'items': 0, 'batches': 0, 'max_batch_seen': 0}
+
+    def _ensure_worker(self):
+        # threads do not survive fork: start one per process on first use
+        if self._thread is None or self._pid != os.getpid():
+            self._queue.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='whisperguard-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, x):
+        """Queue one input and return a Future for its result row."""
+        fut = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append((np.asarray(x), fut, time.monotonic()))
+            self._cond.notify()
+        return fut
+
+    def __call__(self, x):
+        """Run one input through the batcher and wait for its result."""
+        if self.max_batch == 1 or self.max_wait == 0:
+            return self.fn(np.asarray(x)[np.newaxis])[0]
+        return self.submit(x).result()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                # the oldest request bounds how long this batch may gather
+                deadline = self._queue[0][2] + self.max_wait
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+            self._process(batch)
+
+    def _process(self, batch):
+        groups = collections.defaultdict(list)
+        for x, fut, _ in batch:
+            groups[x.shape].append((x, fut))
+        for items in groups.values():
+            try:
+                out = self.fn(np.stack([x for x, _ in items]))
+            except Exception as e:
+                for _, fut in items:
+                    fut.set_exception(e)
+                continue
+            with self._cond:
+                self.counters['items'] += len(items)
+                self.counters['batches'] += 1
+                self.counters['max_batch_seen'] = max(self.counters['max_batch_seen'], len(items))
+            for row, (_, fut) in zip(out, items):
+                fut.set_result(row)
+
+    def stats(self):
+        with self._cond:
+            return dict(self.counters, pending=len(self._queue))
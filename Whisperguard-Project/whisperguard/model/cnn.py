@@ -1,95 +1,160 @@
-"""Lightweight CNN classifier interface (placeholder).
+"""CNN spectrogram classifier.
 
-This module is a scaffold for model inference. Replace with a real
-inference backend (ONNXRuntime / TorchScript) and trained weights.
+With a `model_path` (.onnx or .npz, see `whisperguard.model.backends`)
+predictions come from the trained network; concurrent `predict` calls
+are gathered by a `MicroBatcher` into batched forward passes. Without
+one, a heuristic placeholder derives scores from the spectrum.
+
+`predict_batch` scores a whole (N, n_mels, t) stack with array
+operations; `predict` is the single-chunk wrapper.
 """
+import hashlib
+import os
+
 import numpy as np
 
+from whisperguard import config
+from whisperguard.model.backends import CLASSES, INPUT_OFFSET, INPUT_SCALE, load_backend, normalize_log_mel
+from whisperguard.model.batcher import MicroBatcher
+from whisperguard.model.features import MID_MIN_FREQ, ULTRASONIC_MIN_FREQ
+
 
 class CNNSpectrogramClassifier:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, backend=None, max_batch=None, max_wait_ms=None,
+                 intra_op_threads=None, inter_op_threads=None):
+        """
+        model_path: .onnx (ONNX Runtime) or .npz (NumPy reference) weights
+        backend: an already loaded backend (takes precedence over model_path)
+        max_batch / max_wait_ms: micro-batching limits
+        intra_op_threads / inter_op_threads: ONNX Runtime thread pools
+            (0 = runtime default)
+        Unset limits and thread counts come from `whisperguard.config`.
+        """
         self.model_path = model_path
+        # identifies the scores this instance produces (e.g. for result caches)
+        self.version = 'heuristic'
+        if model_path:
+            self.version = f'{os.path.basename(model_path)}@{_file_digest(model_path)}'
+        elif backend is not None:
+            self.version = f'{type(backend).__name__}@{id(backend):x}'
+        if backend is None and model_path:
+            backend = load_backend(
+                model_path,
+                intra_op_threads=config.MODEL_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads,
+                inter_op_threads=config.MODEL_INTER_OP_THREADS if inter_op_threads is None else inter_op_threads)
+        self.backend = backend
+        self.batcher = None
+        if backend is not None:
+            self.batcher = MicroBatcher(
+                backend.forward,
+                max_batch=config.MODEL_MAX_BATCH if max_batch is None else max_batch,
+                max_wait_ms=config.MODEL_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms)
 
-    def predict(self, log_mel, waveform=None, sr=44100):
-        """Heuristic predictor returning interpretable, variable confidences.
-
-        This is still a placeholder but derives scores from the provided
-        `log_mel` when available, otherwise falls back to simple FFT
-        statistics computed from `waveform`.
+    def predict(self, log_mel, waveform=None, sr=44100, features=None):
+        """Return a dict with keys: Normal, Ultrasonic, Hidden, Deepfake.
 
-        Returns a dict with keys: Normal, Ultrasonic, Hidden, Deepfake
+        Single-chunk wrapper around `predict_batch`. With a model backend
+        the call goes through the micro-batcher, so concurrent callers
+        share forward passes. Without `log_mel` the heuristic uses the
+        band energies of `features` (a `ChunkFeatures`) or of `waveform`.
         """
-        # Defaults
-        normal = 0.6
-        ultrasonic = 0.0
-        hidden = 0.0
-        deepfake = 0.0
-
-        if log_mel is not None:
-            # log_mel expected shape (n_mels, t) or (t, n_mels)
-            arr = np.array(log_mel)
-            if arr.ndim == 2:
-                # ensure shape (n_mels, t)
-                if arr.shape[0] < arr.shape[1]:
-                    pass
-                # energy per mel bin
-                energies = np.mean(np.maximum(arr, -80.0), axis=1)  # dB-like
-                # normalize to 0..1
-                e_min, e_max = energies.min(), energies.max()
-                if e_max - e_min > 1e-6:
-                    norm = (energies - e_min) / (e_max - e_min)
-                else:
-                    norm = energies * 0.0
-
-                n = len(norm)
-                high_idx = np.arange(int(n * 0.75), n)
-                mid_idx = np.arange(int(n * 0.3), int(n * 0.75))
-                high_energy = float(np.mean(norm[high_idx])) if high_idx.size else 0.0
-                mid_energy = float(np.mean(norm[mid_idx])) if mid_idx.size else 0.0
-
-                ultrasonic = min(1.0, high_energy * 1.6)
-                hidden = min(1.0, mid_energy * 1.2 * (1.0 - ultrasonic))
-                # deepfake heuristic: low variance across time -> synthetic
-                time_var = float(np.mean(np.var(arr, axis=1)))
-                # normalize time variance to a 0..1-like scale then invert
-                denom = (abs(arr).mean() + 1e-6)
-                df_score = (1.0 - (time_var / denom)) * 0.8
-                deepfake = float(np.clip(df_score, 0.0, 1.0))
-                normal = max(0.0, 1.0 - (ultrasonic + hidden + deepfake) * 0.9)
-        elif waveform is not None:
+        if self.batcher is not None and log_mel is not None:
+            probs = self.batcher(normalize_log_mel(log_mel))
+        elif log_mel is not None and np.ndim(log_mel) == 2:
+            probs = self.predict_batch(np.asarray(log_mel)[np.newaxis])[0]
+        elif log_mel is None and features is not None:
+            energies = {k: np.array([v]) for k, v in features.band_energies.items()}
+            probs = self.predict_batch(None, band_energies=energies)[0]
+        elif log_mel is None and waveform is not None and np.size(waveform) > 0:
             x = np.asarray(waveform, dtype=float)
-            if x.size == 0:
-                return {"Normal": 1.0, "Ultrasonic": 0.0, "Hidden": 0.0, "Deepfake": 0.0}
-            # FFT-based fallback
-            n = len(x)
-            yf = np.abs(np.fft.rfft(x * np.hanning(n)))
-            freqs = np.fft.rfftfreq(n, d=1.0 / sr)
-            high_mask = freqs >= 18000
-            mid_mask = (freqs >= 300) & (freqs < 18000)
-            high_energy = float(np.sum(yf[high_mask] ** 2))
-            mid_energy = float(np.sum(yf[mid_mask] ** 2))
-            total_energy = float(np.sum(yf ** 2)) + 1e-12
-            high_ratio = high_energy / total_energy
-            mid_ratio = mid_energy / total_energy
-            ultrasonic = min(1.0, high_ratio * 10.0)
-            hidden = min(1.0, mid_ratio * 2.0 * (1.0 - ultrasonic))
-            # deepfake: overly smooth waveform (low variance)
-            var = float(np.var(x))
-            deepfake = 0.0 if var > 1e-6 else 0.0
-            normal = max(0.0, 1.0 - (ultrasonic + hidden + deepfake))
-
-        # assemble and normalize
-        scores = np.array([normal, ultrasonic, hidden, deepfake], dtype=float)
-        # ensure non-negative
-        scores = np.clip(scores, 0.0, None)
-        if scores.sum() <= 0:
-            scores = np.array([1.0, 0.0, 0.0, 0.0])
+            probs = self.predict_batch(None, band_energies=_fft_band_energies(x, sr))[0]
         else:
-            scores = scores / float(scores.sum())
-
-        return {
-            "Normal": float(scores[0]),
-            "Ultrasonic": float(scores[1]),
-            "Hidden": float(scores[2]),
-            "Deepfake": float(scores[3]),
-        }
+            # nothing to score
+            probs = np.array([1.0, 0.0, 0.0, 0.0])
+        return dict(zip(CLASSES, probs.tolist()))
+
+    def predict_batch(self, log_mels, features=None, band_energies=None):
+        """Scores for a stack of chunks as an (N, 4) array in `CLASSES` order.
+
+        log_mels: (N, n_mels, t) log-mel spectrograms, or None to score from
+            band energies only
+        features: a `BatchFeatures`; its band energies are used when
+            `log_mels` is None
+        band_energies: dict of (N,) 'high', 'mid' and 'total' arrays
+            (alternative to `features`)
+        """
+        if log_mels is not None:
+            log_mels = np.asarray(log_mels)
+            if self.backend is not None:
+                x = (log_mels.astype(np.float32) + INPUT_OFFSET) / INPUT_SCALE
+                return np.asarray(self.backend.forward(x[:, np.newaxis]), dtype=float)
+            return _normalize_rows(_heuristic_log_mel_scores(log_mels))
+        if band_energies is None:
+            band_energies = features.band_energies
+        return _normalize_rows(_heuristic_band_scores(band_energies))
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _heuristic_log_mel_scores(arr):
+    """Placeholder scores from (N, n_mels, t) log-mel stacks, unnormalized (N, 4)."""
+    arr = np.asarray(arr, dtype=float)
+    # energy per mel bin, dB-like, normalized to 0..1 per chunk
+    energies = np.mean(np.maximum(arr, -80.0), axis=2)
+    e_min = energies.min(axis=1, keepdims=True)
+    e_range = energies.max(axis=1, keepdims=True) - e_min
+    norm = np.where(e_range > 1e-6, (energies - e_min) / np.where(e_range > 1e-6, e_range, 1.0), 0.0)
+
+    n = arr.shape[1]
+    high = norm[:, int(n * 0.75):n]
+    mid = norm[:, int(n * 0.3):int(n * 0.75)]
+    high_energy = high.mean(axis=1) if high.shape[1] else np.zeros(len(arr))
+    mid_energy = mid.mean(axis=1) if mid.shape[1] else np.zeros(len(arr))
+
+    ultrasonic = np.minimum(1.0, high_energy * 1.6)
+    hidden = np.minimum(1.0, mid_energy * 1.2 * (1.0 - ultrasonic))
+    # deepfake heuristic: low variance across time -> synthetic
+    time_var = np.var(arr, axis=2).mean(axis=1)
+    denom = np.abs(arr).mean(axis=(1, 2)) + 1e-6
+    deepfake = np.clip((1.0 - time_var / denom) * 0.8, 0.0, 1.0)
+    normal = np.maximum(0.0, 1.0 - (ultrasonic + hidden + deepfake) * 0.9)
+    return np.stack([normal, ultrasonic, hidden, deepfake], axis=1)
+
+
+def _heuristic_band_scores(band_energies):
+    """Placeholder scores from per-chunk band energies, unnormalized (N, 4)."""
+    total = np.asarray(band_energies['total'], dtype=float) + 1e-12
+    high_ratio = np.asarray(band_energies['high'], dtype=float) / total
+    mid_ratio = np.asarray(band_energies['mid'], dtype=float) / total
+    ultrasonic = np.minimum(1.0, high_ratio * 10.0)
+    hidden = np.minimum(1.0, mid_ratio * 2.0 * (1.0 - ultrasonic))
+    # deepfake: not estimated from band energies
+    deepfake = np.zeros_like(ultrasonic)
+    normal = np.maximum(0.0, 1.0 - (ultrasonic + hidden + deepfake))
+    return np.stack([normal, ultrasonic, hidden, deepfake], axis=1)
+
+
+def _fft_band_energies(x, sr):
+    # single-FFT fallback when neither log-mel nor features are available
+    n = len(x)
+    yf = np.abs(np.fft.rfft(x * np.hanning(n)))
+    freqs = np.fft.rfftfreq(n, d=1.0 / sr)
+    power = yf ** 2
+    return {'high': np.array([power[freqs >= ULTRASONIC_MIN_FREQ].sum()]),
+            'mid': np.array([power[(freqs >= MID_MIN_FREQ) & (freqs < ULTRASONIC_MIN_FREQ)].sum()]),
+            'total': np.array([power.sum()])}
+
+
+def _normalize_rows(scores):
+    """Clip to non-negative and make each row sum to 1 (all-zero rows -> Normal)."""
+    scores = np.clip(scores, 0.0, None)
+    sums = scores.sum(axis=1, keepdims=True)
+    out = np.divide(scores, sums, out=np.zeros_like(scores), where=sums > 0)
+    out[sums[:, 0] <= 0, 0] = 1.0
+    return out
@@ -0,0 +1,456 @@
+"""Shared single-FFT feature frontend for the per-chunk pipeline.
+
+The ultrasonic rule, the log-mel conversion and the classifier's FFT
+fallback all need a spectrum of the same waveform. `extract_features`
+computes one STFT per chunk and derives everything from it, so each chunk
+is transformed exactly once. Windows, frequency grids and mel filterbanks
+are cached per parameter set.
+
+Mel filterbanks come from a NumPy implementation of librosa's default
+(Slaney) filterbank, so log-mel features never depend on librosa being
+installed. The 'librosa' backend (`set_mel_backend`, or
+WHISPERGUARD_MEL_BACKEND) uses `librosa.filters.mel` instead; it is
+imported on first use and compiles numba helpers then.
+
+`MelFrontend` preallocates every intermediate array for fixed-length
+windows, so steady-state streaming analysis reuses its buffers instead of
+allocating per window; `stft_power`, `log_mel_spectrogram` and
+`power_to_db` also accept `out=` arrays.
+"""
+from functools import lru_cache
+from importlib.util import find_spec
+
+import numpy as np
+
+from whisperguard import config
+
+_HAS_LIBROSA = find_spec('librosa') is not None
+
+MEL_BACKENDS = ('numpy', 'librosa')
+_mel_backend = config.MEL_BACKEND if config.MEL_BACKEND in MEL_BACKENDS else 'numpy'
+
+
+# band edges used by the rule detector and the classifier fallback
+ULTRASONIC_MIN_FREQ = 18000
+MID_MIN_FREQ = 300
+
+
+@lru_cache(maxsize=16)
+def hann_window(n_fft):
+    """Periodic Hann window (same as librosa / scipy `fftbins=True`)."""
+    n = np.arange(n_fft, dtype=float)
+    win = 0.5 - 0.5 * np.cos(2.0 * np.pi * n / n_fft)
+    win.flags.writeable = False
+    return win
+
+
+@lru_cache(maxsize=16)
+def fft_frequencies(sr, n_fft):
+    freqs = np.fft.rfftfreq(n_fft, d=1.0 / sr)
+    freqs.flags.writeable = False
+    return freqs
+
+
+def set_mel_backend(name):
+    """Select the mel filterbank implementation: 'numpy' or 'librosa'."""
+    global _mel_backend
+    if name not in MEL_BACKENDS:
+        raise ValueError(f"mel backend must be one of {MEL_BACKENDS}")
+    _mel_backend = name
+
+
+def get_mel_backend():
+    return _mel_backend
+
+
+def resolve_mel_backend(backend=None):
+    """The backend to use for `backend` (None = current setting).
+
+    'librosa' falls back to 'numpy' when librosa is not installed.
+    """
+    backend = backend or _mel_backend
+    if backend == 'librosa' and not _HAS_LIBROSA:
+        return 'numpy'
+    return backend
+
+
+def hz_to_mel(frequencies):
+    """Slaney mel scale: linear below 1 kHz, logarithmic above."""
+    f = np.asarray(frequencies, dtype=float)
+    mels = f / (200.0 / 3)
+    # log region starts at 1 kHz = 15 mels
+    return np.where(f >= 1000.0, 15.0 + np.log(np.maximum(f, 1e-10) / 1000.0) / (np.log(6.4) / 27.0), mels)
+
+
+def mel_to_hz(mels):
+    """Inverse of `hz_to_mel`."""
+    m = np.asarray(mels, dtype=float)
+    freqs = m * (200.0 / 3)
+    return np.where(m >= 15.0, 1000.0 * np.exp((np.log(6.4) / 27.0) * (m - 15.0)), freqs)
+
+
+def slaney_mel_filterbank(sr, n_fft, n_mels, fmin=0.0, fmax=None):
+    """NumPy equivalent of `librosa.filters.mel` with its defaults
+    (Slaney mel scale, 'slaney' area normalization, float32).
+    """
+    fmax = float(sr) / 2 if fmax is None else fmax
+    mel_f = mel_to_hz(np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_mels + 2))
+    fdiff = np.diff(mel_f)
+    ramps = np.subtract.outer(mel_f, fft_frequencies(sr, n_fft))
+    lower = -ramps[:-2] / fdiff[:-1, np.newaxis]
+    upper = ramps[2:] / fdiff[1:, np.newaxis]
+    weights = np.maximum(0, np.minimum(lower, upper)).astype(np.float32)
+    weights *= 2.0 / (mel_f[2:n_mels + 2] - mel_f[:n_mels])[:, np.newaxis]
+    return weights
+
+
+def mel_basis(sr, n_fft, n_mels, backend=None):
+    """Cached mel filterbank of shape (n_mels, 1 + n_fft // 2)."""
+    return _mel_basis(sr, n_fft, n_mels, resolve_mel_backend(backend))
+
+
+@lru_cache(maxsize=32)
+def _mel_basis(sr, n_fft, n_mels, backend):
+    if backend == 'librosa':
+        import librosa
+
+        basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    else:
+        basis = slaney_mel_filterbank(sr, n_fft, n_mels)
+    basis.flags.writeable = False
+    return basis
+
+
+def stft_power(waveform, n_fft=1024, hop_length=512, out=None):
+    """Return the centered STFT power spectrogram with shape (1 + n_fft // 2, t).
+
+    Framing matches `librosa.stft(center=True, pad_mode='constant')` so the
+    mel projection of this power equals `librosa.feature.melspectrogram`.
+    A stacked (n, samples) input gives an (n, 1 + n_fft // 2, t) result.
+    `out` is an optional float64 array of the result shape to write into.
+    """
+    x = np.asarray(waveform, dtype=float)
+    pad = n_fft // 2
+    x = np.pad(x, [(0, 0)] * (x.ndim - 1) + [(pad, pad)])
+    frames = np.lib.stride_tricks.sliding_window_view(x, n_fft, axis=-1)[..., ::hop_length, :]
+    spec = np.fft.rfft(frames * hann_window(n_fft), axis=-1)
+    if out is None:
+        power = spec.real ** 2 + spec.imag ** 2
+        return np.swapaxes(power, -1, -2)
+    power = np.swapaxes(out, -1, -2)
+    np.square(spec.real, out=power)
+    power += np.square(spec.imag, out=spec.imag)
+    return out
+
+
+def power_to_db(S, amin=1e-10, top_db=80.0, out=None):
+    """NumPy equivalent of `librosa.power_to_db(S, ref=np.max)`.
+
+    For stacked (n, bins, t) input the reference and floor are per item.
+    `out` may be `S` itself to convert in place.
+    """
+    S = np.asarray(S)
+    axes = (-2, -1) if S.ndim >= 2 else None
+    ref = 10.0 * np.log10(np.maximum(amin, S.max(axis=axes, keepdims=True)))
+    log_spec = np.maximum(S, amin, out=out)
+    np.log10(log_spec, out=log_spec)
+    log_spec *= 10.0
+    log_spec -= ref
+    if top_db is not None:
+        np.maximum(log_spec, log_spec.max(axis=axes, keepdims=True) - top_db, out=log_spec)
+    return log_spec
+
+
+def log_mel_spectrogram(power, sr, n_fft=1024, n_mels=64, backend=None, out=None):
+    """Log-mel spectrogram (dB relative to the maximum) of an STFT power
+    spectrogram (n_bins, t), or (n, n_bins, t) for a stack.
+    """
+    basis = mel_basis(sr, n_fft, n_mels, backend)
+    return power_to_db(np.matmul(basis, power, out=out), out=out)
+
+
+class ChunkFeatures:
+    """Spectral features of one audio chunk.
+
+    Attributes:
+        sr: sample rate
+        power: STFT power spectrogram, shape (n_bins, t)
+        freqs: centre frequency of each STFT bin
+        spectrum: power summed over time, shape (n_bins,)
+        band_energies: dict with 'high', 'mid' and 'total' energy
+        log_mel: log-mel spectrogram (n_mels, t), or None if not computed
+    """
+
+    def __init__(self, sr, power, freqs, log_mel=None, spectrum=None, band_energies=None):
+        """`spectrum` and `band_energies` may be passed in when the caller
+        already maintains them (see `StreamingFeatures`)."""
+        self.sr = sr
+        self.power = power
+        self.freqs = freqs
+        self.spectrum = power.sum(axis=1) if spectrum is None else spectrum
+        self.log_mel = log_mel
+        if band_energies is None:
+            band_energies = {
+                'high': self.band_energy(ULTRASONIC_MIN_FREQ),
+                'mid': self.band_energy(MID_MIN_FREQ, ULTRASONIC_MIN_FREQ),
+                'total': float(self.spectrum.sum()),
+            }
+        self.band_energies = band_energies
+
+    def band_energy(self, lo, hi=None):
+        """Energy in [lo, hi) Hz (hi=None means up to Nyquist)."""
+        mask = self.freqs >= lo
+        if hi is not None:
+            mask &= self.freqs < hi
+        return float(self.spectrum[mask].sum())
+
+    def energy_ratio(self, min_freq=ULTRASONIC_MIN_FREQ):
+        """Fraction of total energy at or above `min_freq`."""
+        if min_freq == ULTRASONIC_MIN_FREQ:
+            high = self.band_energies['high']
+        else:
+            high = self.band_energy(min_freq)
+        return high / (self.band_energies['total'] + 1e-12)
+
+    @property
+    def rule_ratio(self):
+        return self.energy_ratio(ULTRASONIC_MIN_FREQ)
+
+
+def extract_features(waveform, sr=44100, n_mels=64, n_fft=1024, hop_length=512):
+    """Compute the STFT of `waveform` once and derive all per-chunk features.
+
+    Returns a `ChunkFeatures`, or None for an empty/missing waveform.
+    """
+    if waveform is None:
+        return None
+    waveform = np.asarray(waveform)
+    if waveform.ndim > 1:
+        waveform = np.mean(waveform, axis=1)
+    if waveform.size == 0:
+        return None
+
+    power = stft_power(waveform, n_fft=n_fft, hop_length=hop_length)
+    log_mel = log_mel_spectrogram(power, sr, n_fft=n_fft, n_mels=n_mels)
+    return ChunkFeatures(sr, power, fft_frequencies(sr, n_fft), log_mel=log_mel)
+
+
+class MelFrontend:
+    """`extract_features` for a stream of fixed-length windows, with
+    preallocated buffers.
+
+    Padding, frames, spectrum, power and log-mel arrays are allocated once
+    for windows of `length` samples and reused by every `compute` call, so
+    steady-state analysis does not allocate per window. The returned
+    features are views into those buffers: they are only valid until the
+    next call (copy what must be kept). Not thread-safe; use one per
+    stream or worker.
+    """
+
+    def __init__(self, length, sr=44100, n_mels=64, n_fft=1024, hop_length=512, backend=None):
+        self.length = length
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        pad = n_fft // 2
+        n_frames = 1 + length // hop_length
+        n_bins = 1 + n_fft // 2
+        # window repeated per frame: broadcasting, strided or transposed
+        # operands make ufuncs allocate iterator buffers on every call
+        self._window = np.tile(hann_window(n_fft), (n_frames, 1))
+        self._basis = mel_basis(sr, n_fft, n_mels, backend).astype(float)
+        self._freqs = fft_frequencies(sr, n_fft)
+        self._padded = np.zeros(length + 2 * pad)
+        self._signal = self._padded[pad:pad + length]
+        self._frames = np.lib.stride_tricks.sliding_window_view(self._padded, n_fft)[::hop_length]
+        self._windowed = np.empty((n_frames, n_fft))
+        self._spec = np.empty((n_frames, n_bins), dtype=complex)
+        self._power = np.empty((n_frames, n_bins))
+        self.power = self._power.T
+        self.log_mel = np.empty((n_mels, n_frames))
+
+    def compute(self, waveform):
+        """Features of one mono window of `length` samples (a `ChunkFeatures`)."""
+        if len(waveform) != self.length:
+            raise ValueError(f"expected {self.length} samples, got {len(waveform)}")
+        self._signal[:] = waveform
+        np.copyto(self._windowed, self._frames)
+        self._windowed *= self._window
+        np.fft.rfft(self._windowed, axis=-1, out=self._spec)
+        np.square(self._spec.real, out=self._power)
+        self._power += np.square(self._spec.imag, out=self._spec.imag)
+        np.matmul(self._basis, self.power, out=self.log_mel)
+        power_to_db(self.log_mel, out=self.log_mel)
+        return ChunkFeatures(self.sr, self.power, self._freqs, log_mel=self.log_mel)
+
+
+class StreamingFeatures:
+    """Incremental STFT features of one continuous stream (or of the
+    channels of one multichannel stream, analyzed side by side).
+
+    Keeps the STFT frames already computed for the current window and adds
+    only the frames completed by newly fed samples, so the FFT and mel work
+    per `feed` scales with the number of new samples, not with the window
+    length. Per-band energies and the summed spectrum of the window are
+    rolling sums (new frames added, frames leaving the window subtracted;
+    recomputed exactly once per window length to bound rounding drift), so
+    `detect_ultrasonic` gets its ratio without touching the whole window.
+
+    Frames use the centered framing of `extract_features` with the stream
+    treated as preceded by silence; a window is the newest `n_frames`
+    complete frames (as many as `extract_features` produces for
+    `window_seconds` of audio), which ends at most `n_fft` samples before
+    the newest fed sample. Frame rings are mirrored like `RingBuffer`, so
+    window views are contiguous without copying.
+
+    With `channels` set, `feed` takes (samples, channels) blocks and every
+    channel is transformed in the same array operations; `features`
+    returns a `BatchFeatures` with one entry per channel. Not thread-safe.
+    """
+
+    def __init__(self, sr, window_seconds=1.0, n_mels=64, n_fft=1024, hop_length=512,
+                 backend=None, amin=1e-10, top_db=80.0, channels=None):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.amin = amin
+        self.top_db = top_db
+        self.channels = channels
+        self.n_frames = 1 + int(sr * window_seconds) // hop_length
+        self.freqs = fft_frequencies(sr, n_fft)
+        self._window = hann_window(n_fft)
+        self._basis_t = np.ascontiguousarray(mel_basis(sr, n_fft, n_mels, backend).T, dtype=float)
+        # bins are sorted by frequency, so each band is a contiguous slice
+        self._high = int(np.searchsorted(self.freqs, ULTRASONIC_MIN_FREQ))
+        self._mid = int(np.searchsorted(self.freqs, MID_MIN_FREQ))
+        self.reset()
+
+    def reset(self):
+        """Start over as a new stream (e.g. after a gap in the input)."""
+        n_bins = len(self.freqs)
+        n_mels = self._basis_t.shape[1]
+        C = self.channels or 1
+        T = self.n_frames
+        # leading channel axis throughout; mono uses a single channel
+        self._power = np.zeros((C, 2 * T, n_bins))
+        self._mel_db = np.full((C, 2 * T, n_mels), 10.0 * np.log10(self.amin))
+        self._mel_max = np.zeros((C, 2 * T))
+        self._bands = np.zeros((C, 2 * T, 3))  # high, mid, total per frame
+        self._log_mel = np.empty((C, n_mels, T))
+        self._spectrum = np.zeros((C, n_bins))
+        self._band_sums = np.zeros((C, 3))
+        # samples of the next, incomplete frames (leading silence = centering pad)
+        self._pending = np.zeros((C, self.n_fft // 2))
+        self.frames = 0
+
+    def feed(self, samples):
+        """Append samples ((n,) mono, or (n, channels)); return how many new
+        frames they completed."""
+        samples = np.asarray(samples, dtype=float)
+        samples = samples[np.newaxis] if self.channels is None else samples.T
+        x = np.concatenate([self._pending, samples], axis=1)
+        k = max(0, (x.shape[1] - self.n_fft) // self.hop_length + 1)
+        if k == 0:
+            self._pending = x
+            return 0
+        frames = np.lib.stride_tricks.sliding_window_view(x, self.n_fft, axis=1)[:, ::self.hop_length][:, :k]
+        spec = np.fft.rfft(frames * self._window, axis=-1)
+        power = spec.real ** 2 + spec.imag ** 2
+        self._pending = x[:, k * self.hop_length:]
+
+        if k > self.n_frames:
+            # only the newest window's worth of frames can matter
+            self.frames += k - self.n_frames
+            power = power[:, -self.n_frames:]
+            k = self.n_frames
+        mel = power @ self._basis_t
+        bands = np.stack([power[..., self._high:].sum(axis=-1),
+                          power[..., self._mid:self._high].sum(axis=-1),
+                          power.sum(axis=-1)], axis=-1)
+        self._push(power, mel, bands)
+        return k
+
+    def _push(self, power, mel, bands):
+        T = self.n_frames
+        k = power.shape[1]
+        idx = (self.frames + np.arange(k)) % T
+        # frames leaving the window are the ones whose slots are reused
+        self._spectrum += power.sum(axis=1) - self._power[:, idx].sum(axis=1)
+        self._band_sums += bands.sum(axis=1) - self._bands[:, idx].sum(axis=1)
+        mel_db = 10.0 * np.log10(np.maximum(mel, self.amin))
+        mel_max = mel.max(axis=2)
+        for ring, rows in ((self._power, power), (self._mel_db, mel_db),
+                           (self._mel_max, mel_max), (self._bands, bands)):
+            ring[:, idx] = rows
+            ring[:, idx + T] = rows
+        before = self.frames
+        self.frames += k
+        if self.frames // T != before // T:
+            # resynchronize the rolling sums once per window length
+            self._spectrum[:] = self._power[:, :T].sum(axis=1)
+            self._band_sums[:] = self._bands[:, :T].sum(axis=1)
+
+    def features(self):
+        """Features of the current window: a `ChunkFeatures` for a mono
+        stream, a `BatchFeatures` (one entry per channel) otherwise.
+
+        `power` is a view into the frame ring and `log_mel` a reused
+        buffer; both change on the next `feed`, so copy what must be kept.
+        """
+        T = self.n_frames
+        start = self.frames % T
+        power = self._power[:, start:start + T].transpose(0, 2, 1)
+        ref = 10.0 * np.log10(np.maximum(self.amin, self._mel_max[:, start:start + T].max(axis=1)))
+        log_mel = np.subtract(self._mel_db[:, start:start + T].transpose(0, 2, 1),
+                              ref[:, np.newaxis, np.newaxis], out=self._log_mel)
+        if self.top_db is not None:
+            np.maximum(log_mel, -self.top_db, out=log_mel)
+        high, mid, total = np.maximum(self._band_sums, 0.0).T
+        if self.channels is None:
+            return ChunkFeatures(self.sr, power[0], self.freqs, log_mel=log_mel[0], spectrum=self._spectrum[0],
+                                 band_energies={'high': float(high[0]), 'mid': float(mid[0]),
+                                                'total': float(total[0])})
+        return BatchFeatures(self.sr, power, self.freqs, log_mel=log_mel, spectrum=self._spectrum,
+                             band_energies={'high': high, 'mid': mid, 'total': total})
+
+
+class BatchFeatures:
+    """Features of a stack of equal-length chunks.
+
+    Attributes mirror `ChunkFeatures` with a leading batch axis: power
+    (n, n_bins, t), spectrum (n, n_bins), band_energies (dict of (n,)
+    arrays), rule_ratios (n,) and log_mel (n, n_mels, t) or None.
+    Indexing returns the `ChunkFeatures` of one chunk.
+    """
+
+    def __init__(self, sr, power, freqs, log_mel=None, spectrum=None, band_energies=None):
+        self.sr = sr
+        self.power = power
+        self.freqs = freqs
+        self.spectrum = power.sum(axis=-1) if spectrum is None else spectrum
+        self.log_mel = log_mel
+        if band_energies is None:
+            band_energies = {
+                'high': self.spectrum[:, freqs >= ULTRASONIC_MIN_FREQ].sum(axis=1),
+                'mid': self.spectrum[:, (freqs >= MID_MIN_FREQ) & (freqs < ULTRASONIC_MIN_FREQ)].sum(axis=1),
+                'total': self.spectrum.sum(axis=1),
+            }
+        self.band_energies = band_energies
+        self.rule_ratios = self.band_energies['high'] / (self.band_energies['total'] + 1e-12)
+
+    def __len__(self):
+        return len(self.power)
+
+    def __getitem__(self, i):
+        log_mel = self.log_mel[i] if self.log_mel is not None else None
+        return ChunkFeatures(self.sr, self.power[i], self.freqs, log_mel=log_mel)
+
+
+def extract_features_batch(waveforms, sr=44100, n_mels=64, n_fft=1024, hop_length=512):
+    """Batched `extract_features` for an (n, samples) stack of mono chunks."""
+    waveforms = np.asarray(waveforms)
+    if waveforms.ndim != 2:
+        raise ValueError("expected an (n, samples) array of mono chunks")
+    power = stft_power(waveforms, n_fft=n_fft, hop_length=hop_length)
+    log_mel = log_mel_spectrogram(power, sr, n_fft=n_fft, n_mels=n_mels)
+    return BatchFeatures(sr, power, fft_frequencies(sr, n_fft), log_mel=log_mel)
@@ -2,29 +2,28 @@
 
 import numpy as np
 
-try:
-    import librosa
-    _HAS_LIBROSA = True
-except Exception:
-    _HAS_LIBROSA = False
+from whisperguard.model.features import log_mel_spectrogram, resolve_mel_backend, stft_power, _HAS_LIBROSA
 
 
-def waveform_to_log_mel(waveform, sr=44100, n_mels=64, n_fft=1024, hop_length=512):
+def waveform_to_log_mel(waveform, sr=44100, n_mels=64, n_fft=1024, hop_length=512, backend=None):
     """Convert waveform to log-mel spectrogram.
 
-    If `librosa` is unavailable, return None as a safe fallback (classifier is
-    a placeholder and accepts None).
+    backend: 'numpy' or 'librosa' (default: the current mel backend, see
+    `whisperguard.model.features`); without librosa installed the NumPy
+    implementation is used either way.
     """
     if waveform is None:
         return None
     if waveform.ndim > 1:
         waveform = np.mean(waveform, axis=1)
 
-    if _HAS_LIBROSA:
+    if resolve_mel_backend(backend) == 'librosa':
+        import librosa
+
         S = librosa.feature.melspectrogram(y=waveform.astype(float), sr=sr, n_fft=n_fft,
                                            hop_length=hop_length, n_mels=n_mels)
         log_S = librosa.power_to_db(S, ref=np.max)
         return log_S
 
-    # Fallback: return None so downstream dummy classifier uses default behavior.
-    return None
+    power = stft_power(waveform, n_fft=n_fft, hop_length=hop_length)
+    return log_mel_spectrogram(power, sr, n_fft=n_fft, n_mels=n_mels, backend='numpy')
@@ -0,0 +1,265 @@
+"""Threaded capture -> analysis -> response pipeline.
+
+The stages run on their own threads and are linked by bounded queues:
+
+- capture: one thread reading chunks from an `AudioCapture`-like source
+- analysis: a pool of worker threads running `analyze(chunk)` (NumPy FFTs
+  release the GIL, so workers overlap); stateful analyzers, which need
+  chunks in order, use one worker. `analyze` may return None when a chunk
+  produced no decision
+- response: one thread running `respond(result)` (alerts, mute, evidence)
+
+A slow response stage never blocks analysis: the result queue always
+evicts its oldest entry when full. The chunk queue between capture and
+analysis uses a configurable backpressure policy. Muting is a flag that
+makes the capture stage discard chunks, so the input stream keeps running.
+
+With `ordered=True` the workers hand results on in capture order (a
+small reorder buffer keyed by the chunk's sequence number), and every
+result carries 'gap': how many chunks before it never reached the
+response stage (muted, dropped by backpressure, failed or without a
+decision). Consumers that stitch chunks back together, such as the
+incident tracker, use it to avoid splicing audio across the gap.
+
+Stateful analyzers see the same holes from the other side: with
+`input_gaps=True` (one worker) `analyze` is called as `analyze(chunk, gap)`,
+where `gap` counts the chunks since the previous analyzed one that never
+reached analysis (muted, dropped by backpressure, or skipped by a capture
+overrun), so the analyzer can restart instead of joining both sides.
+"""
+import collections
+import threading
+import time
+
+
+BACKPRESSURE_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+
+class BoundedQueue:
+    """Small bounded FIFO with a backpressure policy for full puts.
+
+    policy:
+        'block'       -- put waits for free space
+        'drop_oldest' -- evict the oldest item to make room
+        'drop_newest' -- discard the item being put
+    """
+
+    def __init__(self, maxsize, policy='block'):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"unknown backpressure policy: {policy}")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.dropped = 0
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item, stop_event=None):
+        """Enqueue `item`; return False if it was discarded instead."""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.policy == 'drop_newest':
+                    self.dropped += 1
+                    return False
+                if self.policy == 'drop_oldest':
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._items) >= self.maxsize:
+                        if stop_event is not None and stop_event.is_set():
+                            return False
+                        self._cond.wait(0.1)
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Dequeue the oldest item, or return None after `timeout` seconds.
+
+        With `timeout=None` waits until an item arrives.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            # loop: a wakeup does not guarantee an item (another getter may
+            # have taken it, or the wait ended spuriously)
+            while not self._items:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+
+class Pipeline:
+    def __init__(self, capture, analyze, respond, workers=2, queue_size=8,
+                 backpressure='drop_oldest', read_timeout=2.0, ordered=False,
+                 input_gaps=False):
+        if input_gaps and int(workers) > 1:
+            raise ValueError("input_gaps needs chunks in order, i.e. one worker")
+        self.capture = capture
+        self.analyze = analyze
+        self.respond = respond
+        self.workers = max(1, int(workers))
+        self.read_timeout = read_timeout
+        self.ordered = ordered
+        self.input_gaps = input_gaps
+        self.chunks = BoundedQueue(queue_size, backpressure)
+        self.results = BoundedQueue(queue_size, 'drop_oldest')
+        self.counters = {'captured': 0, 'empty_reads': 0, 'muted': 0,
+                         'analyzed': 0, 'responded': 0, 'errors': 0, 'gaps': 0}
+        self._counter_lock = threading.Lock()
+        self._muted_until = 0.0
+        self._stop = threading.Event()
+        self._threads = []
+        self._seq = 0
+        self._overruns = 0
+        self._analyzed_seq = 0
+        # reorder state (ordered mode): sequence numbers held by workers,
+        # finished results waiting for earlier ones, the newest number taken
+        self._order_lock = threading.Lock()
+        self._take_lock = threading.Lock()
+        self._in_flight = set()
+        self._done = {}
+        self._taken = 0
+        self._next_out = 1
+        self._last_out = 0
+
+    def start(self):
+        self._stop.clear()
+        self._overruns = getattr(self.capture, 'overruns', 0)
+        self._threads = [threading.Thread(target=self._capture_loop, name='wg-capture', daemon=True)]
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._analysis_loop, name=f'wg-analysis-{i}', daemon=True))
+        self._threads.append(threading.Thread(target=self._response_loop, name='wg-response', daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def mute(self, seconds):
+        """Discard captured audio for `seconds` without stopping the stream."""
+        self._muted_until = max(self._muted_until, time.time() + seconds)
+
+    @property
+    def muted(self):
+        return time.time() < self._muted_until
+
+    def stats(self):
+        """Queue depths, drop counts and per-stage counters."""
+        out = dict(self.counters)
+        out.update({
+            'chunk_queue': len(self.chunks),
+            'chunk_queue_max': self.chunks.maxsize,
+            'chunks_dropped': self.chunks.dropped,
+            'result_queue': len(self.results),
+            'result_queue_max': self.results.maxsize,
+            'results_dropped': self.results.dropped,
+        })
+        return out
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            chunk = self.capture.read_chunk(timeout=self.read_timeout)
+            if chunk is None:
+                self._count('empty_reads')
+                continue
+            # muted chunks use up a sequence number, so ordered consumers see
+            # the gap; so do windows a ring-mode capture skipped on overrun
+            overruns = getattr(self.capture, 'overruns', 0)
+            self._seq += 1 + overruns - self._overruns
+            self._overruns = overruns
+            if self.muted:
+                self._count('muted')
+                continue
+            if not chunk.flags.writeable:
+                # ring-buffer views are overwritten as capture advances
+                chunk = chunk.copy()
+            self._count('captured')
+            self.chunks.put((self._seq, time.time(), chunk), stop_event=self._stop)
+
+    def _analysis_loop(self):
+        while not self._stop.is_set():
+            item = self._take()
+            if item is None:
+                continue
+            seq, ts, chunk = item
+            result = None
+            try:
+                if self.input_gaps:
+                    gap = seq - self._analyzed_seq - 1
+                    self._analyzed_seq = seq
+                    result = self.analyze(chunk, gap)
+                else:
+                    result = self.analyze(chunk)
+            except Exception as e:
+                self._count('errors')
+                print("Analysis failed:", e)
+            else:
+                self._count('analyzed')
+            if result is not None:
+                result['seq'] = seq
+                result['captured_at'] = ts
+            if self.ordered:
+                self._release(seq, result)
+            elif result is not None:
+                self.results.put(result)
+
+    def _take(self):
+        if not self.ordered:
+            return self.chunks.get(timeout=0.2)
+        # taking and registering a chunk is one step, so a number below
+        # `_taken` that no worker holds is known to be lost
+        with self._take_lock:
+            item = self.chunks.get(timeout=0.2)
+            if item is not None:
+                with self._order_lock:
+                    self._in_flight.add(item[0])
+                    self._taken = item[0]
+            return item
+
+    def _release(self, seq, result):
+        with self._order_lock:
+            self._in_flight.discard(seq)
+            self._done[seq] = result
+            while True:
+                n = self._next_out
+                if n in self._done:
+                    result = self._done.pop(n)
+                    if result is not None:
+                        self.results.put(result)
+                elif n in self._in_flight or n > self._taken:
+                    return
+                # else: muted or dropped before analysis, skip it
+                self._next_out += 1
+
+    def _response_loop(self):
+        while not self._stop.is_set():
+            result = self.results.get(timeout=0.2)
+            if result is None:
+                continue
+            if self.ordered:
+                # chunks lost anywhere upstream, including the result queue
+                result['gap'] = result['seq'] - self._last_out - 1
+                self._last_out = result['seq']
+                if result['gap']:
+                    with self._counter_lock:
+                        self.counters['gaps'] += result['gap']
+            try:
+                self.respond(result)
+            except Exception as e:
+                self._count('errors')
+                print("Response failed:", e)
+                continue
+            self._count('responded')
@@ -0,0 +1,77 @@
+"""Fast spectrogram images without matplotlib.
+
+Turns a power spectrogram (e.g. `ChunkFeatures.power`) into a colormapped
+PNG using a 256-entry NumPy lookup table and a minimal zlib-based PNG
+encoder. No global plotting state is involved, so rendering is safe from
+any thread and much cheaper than a pyplot figure.
+"""
+import struct
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from whisperguard.model.features import power_to_db
+
+
+# (position, r, g, b) anchors sampled from matplotlib's colormaps
+_COLORMAP_ANCHORS = {
+    'magma': [
+        (0.000, 0, 0, 4), (0.125, 29, 17, 71), (0.250, 81, 18, 124),
+        (0.375, 131, 38, 129), (0.500, 183, 55, 121), (0.625, 231, 82, 99),
+        (0.750, 252, 137, 97), (0.875, 254, 196, 136), (1.000, 252, 253, 191),
+    ],
+    'gray': [(0.0, 0, 0, 0), (1.0, 255, 255, 255)],
+}
+
+
+@lru_cache(maxsize=8)
+def colormap_lut(name='magma'):
+    """Return a read-only (256, 3) uint8 lookup table for colormap `name`."""
+    anchors = np.array(_COLORMAP_ANCHORS[name], dtype=float)
+    x = np.linspace(0.0, 1.0, 256)
+    lut = np.stack([np.interp(x, anchors[:, 0], anchors[:, c]) for c in (1, 2, 3)], axis=1)
+    lut = np.round(lut).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def _png_chunk(tag, data):
+    return (struct.pack('>I', len(data)) + tag + data
+            + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+
+def encode_png(rgb, compresslevel=3):
+    """Encode an (h, w, 3) uint8 array as PNG bytes (8-bit RGB, no filtering)."""
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    h, w = rgb.shape[:2]
+    raw = np.zeros((h, 1 + 3 * w), dtype=np.uint8)  # filter byte 0 per row
+    raw[:, 1:] = rgb.reshape(h, 3 * w)
+    header = struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', header),
+        _png_chunk(b'IDAT', zlib.compress(raw.tobytes(), compresslevel)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+
+def spectrogram_image(power, top_db=80.0, cmap='magma', min_width=512):
+    """Map a power spectrogram (n_bins, t) to an (n_bins, w, 3) RGB array.
+
+    Low frequencies end up at the bottom of the image. Short spectrograms
+    are stretched along time by whole-pixel repetition to `min_width`.
+    """
+    power = np.asarray(power)
+    db = power_to_db(power, top_db=top_db)
+    idx = ((db + top_db) * (255.0 / top_db)).clip(0, 255).astype(np.uint8)
+    idx = idx[::-1]
+    t = idx.shape[1]
+    if 0 < t < min_width:
+        idx = np.repeat(idx, -(-min_width // t), axis=1)
+    return colormap_lut(cmap)[idx]
+
+
+def spectrogram_png(power, top_db=80.0, cmap='magma', min_width=512):
+    """Return PNG bytes for a power spectrogram."""
+    return encode_png(spectrogram_image(power, top_db=top_db, cmap=cmap, min_width=min_width))
@@ -0,0 +1,173 @@
+"""Bounded evidence storage.
+
+`RetentionManager` keeps an evidence directory within a byte quota and a
+maximum age. Each sweep works from the evidence index (which records
+every package's size), so it never walks the directory tree:
+
+- packages older than `max_age` seconds are deleted;
+- while the total is above `max_bytes`, packages are deleted by level
+  priority (levels listed first in `priority` go first, so SAFE and
+  SUSPICIOUS packages are given up before THREAT ones), oldest first
+  within a level.
+
+A package is renamed to a hidden folder, removed from the index and then
+deleted, so readers never see a half-deleted package. Sweeps run on a
+daemon thread every `interval` seconds; processes sharing one evidence
+directory (server workers) take turns through `EvidenceIndex.claim`, so
+one sweep runs per interval between them.
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+
+from whisperguard import config
+from whisperguard.evidence_index import EvidenceIndex
+
+logger = logging.getLogger('whisperguard.retention')
+
+PRIORITY = ('SAFE', 'SUSPICIOUS', 'THREAT')
+
+
+class RetentionManager:
+    def __init__(self, base_dir, max_bytes=0, max_age=0, priority=PRIORITY, interval=60.0):
+        """
+        base_dir: evidence base directory (holding the index)
+        max_bytes: quota for all packages (0 = none)
+        max_age: seconds a package is kept (0 = forever)
+        priority: levels in eviction order; unlisted levels go first
+        interval: seconds between background sweeps
+        """
+        self.base_dir = base_dir
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_age = max(0.0, float(max_age))
+        self.priority = tuple(priority)
+        self.interval = float(interval)
+        self.index = EvidenceIndex.for_dir(base_dir)
+        self.counters = {'sweeps': 0, 'expired': 0, 'evicted': 0, 'freed_bytes': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self):
+        return bool(self.max_bytes or self.max_age)
+
+    def sweep(self, now=None):
+        """Apply the age limit and the quota once; return what was removed."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._backfill()
+            removed = {'expired': 0, 'evicted': 0, 'freed_bytes': 0}
+            if self.max_age:
+                while True:
+                    deleted = self._delete_rows(self.index.older_than(now - self.max_age), removed, 'expired')
+                    if not deleted:
+                        break
+            if self.max_bytes:
+                _, total = self.index.usage()
+                while total > self.max_bytes:
+                    deleted = 0
+                    for row in self.index.eviction_order(self.priority, limit=100):
+                        if total <= self.max_bytes:
+                            break
+                        # only what was actually deleted counts toward the quota
+                        if self._delete_row(row, removed, 'evicted'):
+                            total -= row[2]
+                            deleted += 1
+                    if not deleted:
+                        break
+            self.counters['sweeps'] += 1
+            for key, value in removed.items():
+                self.counters[key] += value
+        if removed['expired'] or removed['evicted']:
+            logger.info('retention removed %d expired and %d evicted packages (%d bytes)',
+                        removed['expired'], removed['evicted'], removed['freed_bytes'])
+        return removed
+
+    def _delete_rows(self, rows, removed, reason):
+        return sum(self._delete_row(row, removed, reason) for row in rows)
+
+    def _delete_row(self, row, removed, reason):
+        event_id, folder, size = row
+        if not self._delete(event_id, folder):
+            return False
+        removed[reason] += 1
+        removed['freed_bytes'] += size
+        return True
+
+    def _backfill(self):
+        # rows indexed before sizes were recorded
+        while True:
+            rows = self.index.unsized()
+            sizes = [(event_id, max(1, _folder_size(self._path(folder)))) for event_id, folder in rows]
+            self.index.set_sizes(sizes)
+            if len(rows) < 500:
+                return
+
+    def _path(self, folder):
+        return os.path.join(self.base_dir, *folder.split('/'))
+
+    def _delete(self, event_id, folder):
+        path = self._path(folder)
+        trash = os.path.join(os.path.dirname(path), f'.{event_id}.deleted')
+        try:
+            os.rename(path, trash)
+        except FileNotFoundError:
+            # already gone (another process, or removed by hand)
+            trash = None
+        except OSError:
+            self.counters['errors'] += 1
+            logger.exception('could not remove evidence %s', path)
+            return False
+        self.index.remove(event_id)
+        if trash is not None:
+            shutil.rmtree(trash, ignore_errors=True)
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                if self.index.claim('retention_sweep', self.interval, time.time()):
+                    self.sweep()
+            except Exception:
+                self.counters['errors'] += 1
+                logger.exception('retention sweep failed')
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        """Start background sweeps (once; no-op without limits)."""
+        with self._thread_lock:
+            if self._thread is None and self.enabled:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='whisperguard-retention', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        count, total = self.index.usage()
+        return dict(self.counters, events=count, bytes=total, max_bytes=self.max_bytes, max_age=self.max_age)
+
+
+def _folder_size(path):
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    except OSError:
+        return 0
+
+
+def from_config(base_dir):
+    """RetentionManager with the WHISPERGUARD_RETENTION_* settings."""
+    return RetentionManager(base_dir, max_bytes=config.RETENTION_MAX_MB * 2 ** 20,
+                            max_age=config.RETENTION_MAX_AGE_DAYS * 86400,
+                            priority=[p.strip().upper() for p in config.RETENTION_PRIORITY.split(',') if p.strip()],
+                            interval=config.RETENTION_INTERVAL)
@@ -0,0 +1,125 @@
+"""Production entry point for the web server.
+
+    python -m whisperguard.serve
+
+Runs `whisperguard.web:app` under gunicorn with several worker processes,
+each serving requests on a pool of threads (the `gthread` worker, which
+also carries the /ws/stream WebSockets). The app is imported once in the
+master (`preload_app`) and warmed up there (`whisperguard.warmup`), so the
+classifier, Hann windows and mel filterbanks (and any compiled helpers) are
+built before forking and shared copy-on-write by every worker, and each
+worker answers /healthz as ready from the start; `gc.freeze()` keeps the
+garbage collector from touching (and thereby copying) those pages.
+
+All workers share the event store (WHISPERGUARD_EVENT_LOG_PATH, an
+SQLite database in WAL mode), so event cursors are valid on any worker.
+
+On SIGTERM/SIGINT gunicorn stops accepting connections, lets in-flight
+requests finish within the graceful timeout, and each worker flushes its
+queued evidence before exiting.
+
+Without gunicorn (e.g. on Windows) it falls back to waitress, then to the
+threaded Werkzeug server in a single process; neither forks workers.
+
+Settings come from `whisperguard.config` (WHISPERGUARD_WEB_* variables)
+and can be overridden on the command line.
+"""
+import argparse
+import gc
+import logging
+import os
+
+from whisperguard import config
+
+logger = logging.getLogger('whisperguard.serve')
+
+
+def preload():
+    """Import the app and warm it up (see `whisperguard.warmup`); return the app."""
+    from whisperguard import warmup, web
+
+    state = warmup.run(web.classifier)
+    if state['status'] != 'ready':
+        logger.warning(f"warm-up failed ({state['error']}); workers will report not ready")
+    gc.collect()
+    gc.freeze()
+    return web.app
+
+
+def shutdown_worker():
+    """Flush this process's queued evidence and stop its helpers."""
+    from whisperguard import web
+    from whisperguard.decode import get_pool
+
+    web.evidence_writer.shutdown(wait=True, timeout=config.WEB_GRACEFUL_TIMEOUT)
+    get_pool().close()
+
+
+def worker_count():
+    return config.WEB_WORKERS if config.WEB_WORKERS > 0 else (os.cpu_count() or 1)
+
+
+def run_gunicorn(app, host, port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class WhisperGuardApplication(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': f'{host}:{port}',
+                'workers': workers,
+                'threads': threads,
+                'worker_class': 'gthread',
+                'preload_app': True,
+                'timeout': config.WEB_TIMEOUT,
+                'graceful_timeout': config.WEB_GRACEFUL_TIMEOUT,
+                'keepalive': 5,
+                'worker_exit': lambda server, worker: shutdown_worker(),
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    WhisperGuardApplication().run()
+
+
+def run_fallback(app, host, port, threads):
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    try:
+        if serve is not None:
+            logger.warning('gunicorn not available; serving with waitress in one process')
+            serve(app, host=host, port=port, threads=threads)
+        else:
+            from werkzeug.serving import run_simple
+            logger.warning('gunicorn and waitress not available; serving with the threaded '
+                           'Werkzeug server in one process')
+            run_simple(host, port, app, threaded=True, use_reloader=False, use_debugger=False)
+    finally:
+        shutdown_worker()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the WhisperGuard web app for production")
+    parser.add_argument("--host", default=config.WEB_HOST)
+    parser.add_argument("--port", type=int, default=config.WEB_PORT)
+    parser.add_argument("--workers", type=int, default=worker_count(), help="worker processes (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=config.WEB_THREADS, help="request threads per worker")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    app = preload()
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_fallback(app, args.host, args.port, args.threads)
+        return
+    logger.info(f'serving on {args.host}:{args.port} with {args.workers} workers x {args.threads} threads')
+    run_gunicorn(app, args.host, args.port, args.workers, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Per-client streaming analysis sessions.
+
+A monitoring client opens one session and then sends raw mono PCM frames
+(any size) over a WebSocket or repeated HTTP bodies. Each session keeps
+the samples of its current, incomplete window in a fixed buffer; every
+time a window fills up it is analyzed (several completed windows go
+through `analyze_batch` as one stacked batch) and the results are
+returned to the transport, which pushes them back to the client.
+
+Raw PCM needs no decoding, temp file or subprocess per frame, and memory
+per session is one analysis window. Sessions opened with a hop instead
+decide every `hop_seconds` on overlapping windows through a per-session
+`StreamAnalyzer`, which only transforms the new audio of each hop. Encoded streams ('webm'/'ogg', e.g.
+from MediaRecorder) go through one long-lived `StreamDecoder` per session.
+
+With `on_incident`, a session's alerting windows are coalesced by an
+`IncidentTracker` and reported once per incident instead of per window.
+"""
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from whisperguard.batch import analyze_batch
+from whisperguard.decode import StreamDecoder
+from whisperguard.incident import IncidentTracker
+from whisperguard.streaming import StreamAnalyzer
+
+# wire formats for PCM frames: little-endian float32 or int16
+PCM_FORMATS = {'f32': np.dtype('<f4'), 's16': np.dtype('<i2')}
+# encoded streams decoded by one long-lived decoder per session
+ENCODED_FORMATS = ('webm', 'ogg')
+
+
+class StreamSession:
+    def __init__(self, sr, sensitivity=0.5, window_seconds=1.0, pcm_format='f32',
+                 classifier=None, on_alert=None, hop_seconds=None, on_incident=None,
+                 incident_options=None):
+        """
+        sr: sample rate of the incoming PCM
+        hop_seconds: decide every `hop_seconds` on the newest
+            `window_seconds` of audio (overlapping windows) instead of once
+            per non-overlapping window
+        pcm_format: 'f32' or 's16' (see PCM_FORMATS), or 'webm'/'ogg' for
+            a continuous encoded stream (needs ffmpeg)
+        on_alert: optional callable(session, result, window) for SUSPICIOUS
+            and THREAT windows; a dict it returns is stored as
+            result['evidence']
+        on_incident: optional callable(session, incident) for each closed
+            incident (see `IncidentTracker`); a dict it returns is stored as
+            result['incident'] on the window that closed it
+        incident_options: IncidentTracker keyword arguments (pre_roll,
+            post_roll, max_seconds, release)
+        """
+        if pcm_format not in PCM_FORMATS and pcm_format not in ENCODED_FORMATS:
+            raise ValueError(f"pcm_format must be one of {sorted(PCM_FORMATS) + list(ENCODED_FORMATS)}")
+        sr = int(sr)
+        if not 8000 <= sr <= 384000:
+            raise ValueError("sr must be between 8000 and 384000")
+        if window_seconds <= 0:
+            raise ValueError("window_seconds must be positive")
+        if hop_seconds is not None and not 0 < hop_seconds <= window_seconds:
+            raise ValueError("hop_seconds must be positive and at most window_seconds")
+        self.id = uuid.uuid4().hex
+        self.sr = sr
+        self.sensitivity = float(sensitivity)
+        self.window_seconds = float(window_seconds)
+        self.hop_seconds = float(hop_seconds) if hop_seconds else None
+        self.window = max(1, int(sr * window_seconds))
+        self.pcm_format = pcm_format
+        self.classifier = classifier
+        self.on_alert = on_alert
+        self._dtype = PCM_FORMATS.get(pcm_format, PCM_FORMATS['f32'])
+        self._scale = 1.0 / 32768 if pcm_format == 's16' else 1.0
+        self._buf = np.zeros(self.window, dtype=np.float32)
+        self._fill = 0
+        self._partial = b''
+        self._lock = threading.Lock()
+        self.created = time.time()
+        self.last_active = time.monotonic()
+        self.samples = 0
+        self.windows = 0
+        self.alerts = 0
+        self.last_result = None
+        self.on_incident = on_incident
+        self._incidents = None
+        if on_incident is not None:
+            self._incidents = IncidentTracker(sr, window_seconds=window_seconds, sensitivity=sensitivity,
+                                              **(incident_options or {}))
+        self._decoder = StreamDecoder(sr) if pcm_format in ENCODED_FORMATS else None
+        self._analyzer = None
+        if self.hop_seconds:
+            alert = (lambda r, w: on_alert(self, r, w)) if on_alert is not None else None
+            self._analyzer = StreamAnalyzer(sr, window_seconds=window_seconds, hop_seconds=hop_seconds,
+                                            sensitivity=sensitivity, classifier=classifier, on_alert=alert)
+
+    def feed(self, data):
+        """Append PCM bytes and analyze every window they complete.
+
+        Returns the list of new window results (possibly empty). Each
+        result has the `analyze_batch` fields plus 'window' (index) and
+        'offset' (seconds since the session started); hop sessions return
+        one result per hop (see `StreamAnalyzer.feed`). Encoded sessions
+        raise `DecodeError` if their decoder has died.
+        """
+        with self._lock:
+            self.last_active = time.monotonic()
+            if self._decoder is not None:
+                data = self._decoder.feed(data)
+            if self._partial:
+                data = self._partial + bytes(data)
+            data = memoryview(data).cast('B')
+            usable = len(data) - len(data) % self._dtype.itemsize
+            self._partial = bytes(data[usable:])
+            samples = np.frombuffer(data[:usable], dtype=self._dtype)
+            self.samples += len(samples)
+            if self._analyzer is not None:
+                return self._feed_analyzer(samples)
+
+            k = (self._fill + len(samples)) // self.window
+            if k == 0:
+                self._buf[self._fill:self._fill + len(samples)] = samples * self._scale
+                self._fill += len(samples)
+                return []
+
+            stack = np.empty((k, self.window), dtype=np.float32)
+            flat = stack.reshape(-1)
+            used = k * self.window - self._fill
+            flat[:self._fill] = self._buf[:self._fill]
+            flat[self._fill:] = samples[:used] * self._scale
+            rest = samples[used:]
+            self._buf[:len(rest)] = rest * self._scale
+            self._fill = len(rest)
+
+            results = analyze_batch(stack, self.sr, classifier=self.classifier,
+                                    sensitivity=self.sensitivity)
+            for i, r in enumerate(results):
+                r['window'] = self.windows + i
+                r['offset'] = round((self.windows + i) * self.window_seconds, 6)
+                if r['level'] in ('SUSPICIOUS', 'THREAT'):
+                    self.alerts += 1
+                    if self.on_alert is not None:
+                        evidence = self.on_alert(self, r, stack[i])
+                        if evidence is not None:
+                            r['evidence'] = evidence
+                if self._incidents is not None:
+                    self._incidents.feed(stack[i])
+                    self._track(r, self._incidents.decide(r))
+            self.windows += k
+            self.last_result = results[-1]
+            return results
+
+    def _feed_analyzer(self, samples):
+        if self._scale != 1.0:
+            samples = samples * np.float32(self._scale)
+        start = self._analyzer.samples
+        results = self._analyzer.feed(samples)
+        if self._incidents is not None:
+            # feed the tracker up to each decision so its audio ends there
+            pos = 0
+            for r in results:
+                end = int(round(r['end'] * self.sr)) - start
+                self._incidents.feed(samples[pos:end])
+                pos = end
+                self._track(r, self._incidents.decide(r))
+            self._incidents.feed(samples[pos:])
+        self.windows += len(results)
+        self.alerts += sum(r['level'] in ('SUSPICIOUS', 'THREAT') for r in results)
+        if results:
+            self.last_result = results[-1]
+        return results
+
+    def _track(self, result, incident):
+        if incident is not None:
+            report = self.on_incident(self, incident)
+            if report is not None:
+                result['incident'] = report
+
+    def close(self):
+        """Report the open incident, if any, and release the stream decoder."""
+        if self._incidents is not None:
+            with self._lock:
+                incident = self._incidents.flush()
+            if incident is not None:
+                self.on_incident(self, incident)
+        if self._decoder is not None:
+            self._decoder.close()
+            self._decoder = None
+
+    def info(self):
+        return {'session': self.id, 'sr': self.sr, 'format': self.pcm_format,
+                'window_seconds': self.window_seconds, 'hop_seconds': self.hop_seconds,
+                'sensitivity': self.sensitivity,
+                'samples': self.samples, 'windows': self.windows, 'alerts': self.alerts,
+                'buffered': self._fill if self._analyzer is None else self.samples % self._analyzer.hop,
+                'last_result': self.last_result,
+                'incidents': self._incidents.stats() if self._incidents is not None else None}
+
+
+class SessionManager:
+    """Thread-safe registry of open sessions with a size bound and idle expiry.
+
+    Idle sessions are reaped whenever the registry is used (`open`, `get`,
+    `stats`), so they are closed, and their open incidents flushed, even
+    when no new session is opened.
+    """
+
+    def __init__(self, max_sessions=64, idle_timeout=60.0, **session_defaults):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.session_defaults = session_defaults
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.counters = {'opened': 0, 'closed': 0, 'expired': 0, 'rejected': 0}
+
+    def open(self, **kwargs):
+        """Create a session; raises RuntimeError when `max_sessions` are open."""
+        session = StreamSession(**dict(self.session_defaults, **kwargs))
+        self.reap()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                self.counters['rejected'] += 1
+                session.close()
+                raise RuntimeError("too many open streaming sessions")
+            self._sessions[session.id] = session
+            self.counters['opened'] += 1
+        return session
+
+    def get(self, session_id):
+        self.reap()
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self.counters['closed'] += 1
+        if session is not None:
+            session.close()
+        return session
+
+    def reap(self):
+        """Close sessions idle for longer than `idle_timeout`; return how many."""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if s.last_active < cutoff]
+            expired = [self._sessions.pop(sid) for sid in idle]
+            self.counters['expired'] += len(idle)
+        for session in expired:
+            session.close()
+        return len(expired)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self):
+        self.reap()
+        with self._lock:
+            return dict(self.counters, open=len(self._sessions))
@@ -27,7 +27,6 @@ function App(){
   const [sensitivity, setSensitivity] = useState(0.5);
   const [forceSave, setForceSave] = useState(false);
   const fileRef = useRef(null);
-  const mediaRecorderRef = useRef(null);
   const continuousRef = useRef({ running: false, stream: null });
   const [continuousRunning, setContinuousRunning] = useState(false);
 
@@ -37,43 +36,91 @@ function App(){
 
   useEffect(()=>{ fetchEvidence(); const id = setInterval(fetchEvidence, 10000); return ()=>clearInterval(id); }, []);
 
-  function encodeWAV(samples, sampleRate){
-    const buffer = new ArrayBuffer(44 + samples.length * 2);
-    const view = new DataView(buffer);
-    function writeString(v, o, s){ for(let i=0;i<s.length;i++) v.setUint8(o+i,s.charCodeAt(i)); }
-    writeString(view,0,'RIFF'); view.setUint32(4,36 + samples.length*2, true); writeString(view,8,'WAVE');
-    writeString(view,12,'fmt '); view.setUint32(16,16,true); view.setUint16(20,1,true); view.setUint16(22,1,true);
-    view.setUint32(24,sampleRate,true); view.setUint32(28,sampleRate*2,true); view.setUint16(32,2,true); view.setUint16(34,16,true);
-    writeString(view,36,'data'); view.setUint32(40,samples.length*2,true);
-    let off=44; for(let i=0;i<samples.length;i++,off+=2){ let s=Math.max(-1,Math.min(1,samples[i])); view.setInt16(off, s<0?s*0x8000:s*0x7FFF, true); }
-    return new Blob([view], {type:'audio/wav'});
+  // Continuous mode streams raw mono float32 PCM to one long-lived session:
+  // a WebSocket (/ws/stream) when the server supports it, otherwise an HTTP
+  // session (/stream) that receives the buffered PCM once per second.
+  function onStreamResults(results){
+    if (!results || results.length === 0) return;
+    const last = results[results.length - 1];
+    // evidence is saved once per incident, when the incident closes; the
+    // latest incident stays on screen while the stream goes on
+    const closed = results.filter(r => r.incident).pop();
+    if (!closed) {
+      setResult(prev => Object.assign({}, last, prev && prev.incident ? {incident: prev.incident, evidence: prev.evidence} : {}));
+      return;
+    }
+    const ev = closed.incident.evidence || (closed.incident.error ? {error: closed.incident.error} : null);
+    setResult(Object.assign({}, last, {incident: closed.incident}, ev ? {evidence: ev} : {}));
+    if (ev && ev.status_url && ev.state !== 'ready') pollEvidence(ev.status_url);
+  }
+
+  function openWebSocketSender(config){
+    return new Promise((resolve, reject) => {
+      const proto = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+      const ws = new WebSocket(proto + window.location.host + '/ws/stream');
+      ws.binaryType = 'arraybuffer';
+      let opened = false;
+      ws.onopen = () => ws.send(JSON.stringify(config));
+      ws.onmessage = (e) => {
+        const msg = JSON.parse(e.data);
+        if (!opened){
+          if (msg.error){ reject(new Error(msg.error)); return; }
+          opened = true;
+          resolve({ send: (frame) => { if (ws.readyState === 1) ws.send(frame.buffer); }, close: () => { try{ ws.send('close'); ws.close(); }catch(_){ } } });
+          return;
+        }
+        if (msg.error) console.warn('stream error', msg.error);
+        onStreamResults(msg.results);
+      };
+      ws.onerror = () => { if (!opened) reject(new Error('websocket unavailable')); };
+      ws.onclose = () => { if (!opened) reject(new Error('websocket closed')); };
+    });
+  }
+
+  async function openHttpSender(config){
+    // sessions live in one server worker process; if a request lands on
+    // another worker (or the session expired) open a new one and resend
+    const openSession = async () => (await axios.post('/stream', config)).data.session;
+    let session = await openSession();
+    const post = (body) => axios.post(`/stream/${session}`, body, { headers: {'Content-Type':'application/octet-stream'} });
+    let pending = [];
+    let busy = false;
+    const timer = setInterval(async () => {
+      if (busy || pending.length === 0) return;
+      const frames = pending; pending = [];
+      const body = new Float32Array(frames.reduce((n, f) => n + f.length, 0));
+      let off = 0; frames.forEach(f => { body.set(f, off); off += f.length; });
+      busy = true;
+      try{
+        let r;
+        try{ r = await post(body.buffer); }
+        catch(e){
+          if (!e.response || e.response.status !== 404) throw e;
+          session = await openSession();
+          r = await post(body.buffer);
+        }
+        onStreamResults(r.data.results);
+      }catch(e){ console.warn('stream post failed', e); }
+      busy = false;
+    }, 1000);
+    return { send: (frame) => pending.push(frame), close: () => { clearInterval(timer); axios.delete(`/stream/${session}`).catch(()=>{}); } };
   }
 
   async function startContinuous(){
     if (continuousRunning) return;
     try{
       const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-      const opts = {};
-      let mime = '';
-      try{ mime = MediaRecorder.isTypeSupported('audio/webm;codecs=opus') ? 'audio/webm;codecs=opus' : (MediaRecorder.isTypeSupported('audio/webm') ? 'audio/webm' : ''); }catch(_){ mime = ''; }
-      if (mime) opts.mimeType = mime;
-      const mr = new MediaRecorder(stream, opts);
-      mr.ondataavailable = async (e) => {
-        if (!e.data || e.data.size === 0) return;
-        try{
-          const ab = await e.data.arrayBuffer();
-          const ctx = new (window.AudioContext || window.webkitAudioContext)();
-          const audioBuf = await ctx.decodeAudioData(ab.slice(0));
-          const data = audioBuf.numberOfChannels > 1 ? audioBuf.getChannelData(0) : audioBuf.getChannelData(0);
-          const wav = encodeWAV(data, audioBuf.sampleRate);
-          await analyzeFile(new File([wav],'chunk.wav',{type:'audio/wav'}));
-          try{ ctx.close(); }catch(_){ }
-        }catch(err){ console.warn('continuous chunk decode/send failed', err); }
-      };
-      mr.onerror = (ev)=> console.warn('MediaRecorder error', ev);
-      mr.start(1000);
-      mediaRecorderRef.current = mr;
-      continuousRef.current = { running: true, stream };
+      const ctx = new (window.AudioContext || window.webkitAudioContext)();
+      const config = { sr: ctx.sampleRate, sensitivity: sensitivity, format: 'f32' };
+      let sender;
+      try{ sender = await openWebSocketSender(config); }
+      catch(err){ console.warn('falling back to HTTP streaming', err); sender = await openHttpSender(config); }
+      const source = ctx.createMediaStreamSource(stream);
+      const proc = ctx.createScriptProcessor(4096, 1, 1);
+      proc.onaudioprocess = (e) => sender.send(new Float32Array(e.inputBuffer.getChannelData(0)));
+      source.connect(proc);
+      proc.connect(ctx.destination);
+      continuousRef.current = { running: true, stream, ctx, sender };
       setContinuousRunning(true);
       setStatus('continuous');
     }catch(e){ console.warn('startContinuous failed', e); setStatus('error'); }
@@ -81,13 +128,11 @@ function App(){
 
   function stopContinuous(){
     try{
-      const mr = mediaRecorderRef.current;
-      if (mr && mr.state !== 'inactive') mr.stop();
-      if (continuousRef.current && continuousRef.current.stream){
-        continuousRef.current.stream.getTracks().forEach(t=>t.stop());
-      }
+      const cur = continuousRef.current;
+      if (cur.sender) cur.sender.close();
+      if (cur.ctx) cur.ctx.close();
+      if (cur.stream) cur.stream.getTracks().forEach(t=>t.stop());
     }catch(_){ }
-    mediaRecorderRef.current = null;
     continuousRef.current = { running:false, stream:null };
     setContinuousRunning(false);
     setStatus('idle');
@@ -100,10 +145,30 @@ function App(){
       const r = await axios.post('/analyze', fd, { headers: {'Accept':'application/json'} });
       setResult(r.data);
       setStatus('done');
-      fetchEvidence();
+      const ev = r.data.evidence;
+      if (ev && ev.status_url && ev.state !== 'ready') pollEvidence(ev.status_url);
+      else fetchEvidence();
     }catch(e){ setStatus('error'); setResult({error: e.message || String(e)}); }
   }
 
+  async function pollEvidence(url, tries=20){
+    for (let i=0;i<tries;i++){
+      await new Promise(res=>setTimeout(res, 500));
+      try{
+        const job = (await axios.get(url)).data;
+        if (job.state === 'queued' || job.state === 'writing') continue;
+        setResult(prev => (prev && prev.evidence && prev.evidence.id === job.id) ? Object.assign({}, prev, {evidence: Object.assign({}, prev.evidence, job)}) : prev);
+        fetchEvidence();
+        return;
+      }catch(e){ console.warn('evidence status failed', e); return; }
+    }
+  }
+
+  function evidenceFiles(res){
+    if (!res || !res.evidence) return null;
+    return res.evidence.evidence || null;
+  }
+
   function onUpload(){ const f = fileRef.current.files[0]; if(!f) return alert('Select a file'); analyzeFile(f); }
 
   function vendorListFromResult(res){
@@ -172,12 +237,18 @@ function App(){
                   </div>
                   <div className="mb-2"><strong>Details</strong></div>
                   <pre style={{whiteSpace:'pre-wrap', background:'#041021', padding:12, borderRadius:6, color:'#cfeefe'}}>{JSON.stringify(result, null, 2)}</pre>
-                  {result.evidence && (
+                  {result.incident && (
+                    <div className="mt-3 small-muted">Incident {result.incident.start}s – {result.incident.end}s{result.incident.level ? `: ${result.incident.level} (${result.incident.hits} alerting decisions)` : ''}</div>
+                  )}
+                  {result.evidence && !evidenceFiles(result) && (
+                    <div className="mt-3 small-muted">Evidence {result.evidence.id}: {result.evidence.state || result.evidence.error}</div>
+                  )}
+                  {evidenceFiles(result) && (
                     <div className="mt-3">
                       <h6>Evidence Files</h6>
-                      <a className="evidence-link d-block" href={`/static/${result.evidence.audio}`} target="_blank" rel="noreferrer">Download audio</a>
-                      <a className="evidence-link d-block" href={`/static/${result.evidence.spectrogram}`} target="_blank" rel="noreferrer">View spectrogram</a>
-                      <a className="evidence-link d-block" href={`/static/${result.evidence.metadata}`} target="_blank" rel="noreferrer">View metadata</a>
+                      <a className="evidence-link d-block" href={`/static/${evidenceFiles(result).audio}`} target="_blank" rel="noreferrer">Download audio</a>
+                      <a className="evidence-link d-block" href={`/static/${evidenceFiles(result).spectrogram}`} target="_blank" rel="noreferrer">View spectrogram</a>
+                      <a className="evidence-link d-block" href={`/static/${evidenceFiles(result).metadata}`} target="_blank" rel="noreferrer">View metadata</a>
                     </div>
                   )}
                 </div>
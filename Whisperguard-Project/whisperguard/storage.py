@@ -0,0 +1,89 @@
+"""Evidence storage layout: unique event IDs and date-sharded folders.
+
+Event IDs look like `20261018T093012345678-1f2c-000042`: the UTC capture
+time to the microsecond, the writer's process ID (hex) and a per-process
+sequence number. They are unique across concurrent writer processes on a
+host and sort chronologically as plain strings.
+
+Each event lives in `<base_dir>/YYYY/MM/DD/<event_id>/`, so no directory
+grows beyond one day of events. IDs that do not follow this format (the
+old flat `event_<ts>` folders) map to `<base_dir>/<event_id>/`;
+`migrate_flat_layout` moves those into the sharded layout.
+"""
+import calendar
+import itertools
+import json
+import os
+import re
+import time
+
+_seq = itertools.count(1)
+_ID_RE = re.compile(r'^(\d{4})(\d{2})(\d{2})T(\d{2})(\d{2})(\d{2})(\d{6})-[0-9a-f]+-\d+$')
+
+
+def new_event_id(ts=None):
+    """Return a new unique event ID for capture time `ts` (default: now)."""
+    if ts is None:
+        ts = time.time()
+    # round once, so .9999996 carries into the next second instead of wrapping to 0
+    sec, usec = divmod(int(round(ts * 1e6)), 1000000)
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(sec))
+    return f'{stamp}{usec:06d}-{os.getpid():x}-{next(_seq):06d}'
+
+
+def event_ts(event_id):
+    """Return the epoch time encoded in `event_id`, or None for legacy IDs."""
+    m = _ID_RE.match(event_id)
+    if not m:
+        return None
+    y, mo, d, h, mi, s, us = (int(g) for g in m.groups())
+    return calendar.timegm((y, mo, d, h, mi, s, 0, 0, 0)) + us / 1e6
+
+
+def relative_folder(event_id):
+    """Folder of `event_id` relative to the evidence base dir (with '/')."""
+    m = _ID_RE.match(event_id)
+    if not m:
+        return event_id
+    return f'{m.group(1)}/{m.group(2)}/{m.group(3)}/{event_id}'
+
+
+def event_dir(base_dir, event_id):
+    return os.path.join(base_dir, *relative_folder(event_id).split('/'))
+
+
+def migrate_flat_layout(base_dir, dry_run=False, index=None):
+    """Move legacy flat `event_*` folders into the sharded layout.
+
+    Each folder gets a new event ID derived from its metadata timestamp
+    (falling back to the folder mtime). Files are moved, not rewritten, so
+    existing hashes stay valid. If `index` (an `EvidenceIndex`) is given,
+    stale rows are replaced. Returns a list of (old_name, new_relative_folder).
+    """
+    moved = []
+    for name in sorted(os.listdir(base_dir)):
+        src = os.path.join(base_dir, name)
+        if not name.startswith('event_') or not os.path.isdir(src):
+            continue
+        meta = {}
+        try:
+            with open(os.path.join(src, 'metadata.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            pass
+        try:
+            ts = float(meta['ts'])
+        except (KeyError, ValueError, TypeError):
+            ts = os.path.getmtime(src)
+        new_id = new_event_id(ts)
+        rel = relative_folder(new_id)
+        moved.append((name, rel))
+        if dry_run:
+            continue
+        dst = event_dir(base_dir, new_id)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        os.rename(src, dst)
+        if index is not None:
+            index.remove(name)
+            index.add(dict(meta, id=new_id, ts=ts), rel, os.listdir(dst))
+    return moved
@@ -0,0 +1,161 @@
+"""Hop-by-hop analysis of one continuous audio stream.
+
+`StreamAnalyzer` keeps the incremental STFT state of a stream
+(`StreamingFeatures`) and makes a decision every `hop_seconds` on the
+newest `window_seconds` of audio: the rule ratio comes from the rolling
+band sums, then classifier scores and fusion as in `analyze_batch`. Each
+hop costs in proportion to the hop length, so short hops (e.g. 100 ms
+decision latency with 1 s windows) stay cheap. Decisions reached within
+one `feed` call are classified and fused as one batch.
+
+One analyzer per stream: the CLI in `--hop` mode and web sessions opened
+with a hop each own one. With `channels`, one analyzer runs the channels
+of a multichannel input as independent streams in a single batch (see
+`whisperguard.engine`).
+"""
+import numpy as np
+
+from whisperguard.audio.ringbuffer import RingBuffer
+from whisperguard.batch import _get_classifier
+from whisperguard.fusion import fuse_batch
+from whisperguard.model.backends import CLASSES
+from whisperguard.model.features import StreamingFeatures
+
+ALERT_LEVELS = ('SUSPICIOUS', 'THREAT')
+
+
+class StreamAnalyzer:
+    def __init__(self, sr, window_seconds=1.0, hop_seconds=0.1, sensitivity=0.5,
+                 classifier=None, on_alert=None, max_batch=32, channels=None):
+        """
+        sr: sample rate of the stream
+        window_seconds: audio each decision looks at
+        hop_seconds: time between decisions
+        on_alert: optional callable(result, window) for SUSPICIOUS and THREAT
+            decisions, where `window` is a read-only view of the decision's
+            audio (copy it to keep it); a dict it returns is stored as
+            result['evidence']
+        max_batch: most decisions classified together
+        channels: analyze (samples, channels) blocks as that many
+            independent streams (see `feed`); None for a mono stream
+        """
+        if hop_seconds <= 0 or window_seconds <= 0:
+            raise ValueError("window_seconds and hop_seconds must be positive")
+        self.sr = sr
+        self.window_seconds = float(window_seconds)
+        self.hop_seconds = float(hop_seconds)
+        self.sensitivity = float(sensitivity)
+        self.classifier = classifier
+        self.on_alert = on_alert
+        self.channels = channels
+        self.max_batch = max(1, int(max_batch))
+        self.hop = max(1, int(sr * hop_seconds))
+        self.window = max(1, int(sr * window_seconds))
+        self.features = StreamingFeatures(sr, window_seconds=window_seconds, channels=channels)
+        # raw audio for alert windows: one window plus one batch of hops
+        self._audio = RingBuffer(self.window + self.max_batch * self.hop, channels or 1)
+        self.samples = 0
+        self.decisions = 0
+        self._next = self.hop
+
+    def feed(self, samples):
+        """Append samples; return the results of every decision they reach.
+
+        Mono: each result has 'rule_ratio', 'ml_scores', 'level' and
+        'score' like `analyze_batch`, plus 'window' (decision index),
+        'offset' and 'end' (start and end of the decision's window in
+        stream seconds).
+
+        With `channels`, samples are (n, channels) and each result covers
+        all channels of one decision with per-channel arrays: 'levels',
+        'scores', 'rule_ratios' and 'ml_scores' ((channels, len(CLASSES))),
+        plus 'window', 'offset' and 'end'. `on_alert` gets a mono result
+        with an added 'channel' for every alerting channel.
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.channels is None:
+            samples = samples.reshape(-1)
+        elif samples.ndim != 2 or samples.shape[1] != self.channels:
+            raise ValueError(f"expected (samples, {self.channels}) blocks")
+        results = []
+        pending = []
+        pos = 0
+        while pos < len(samples):
+            piece = samples[pos:pos + self._next - self.samples]
+            self.features.feed(piece)
+            self._audio.write(piece if self.channels else piece[:, np.newaxis])
+            self.samples += len(piece)
+            pos += len(piece)
+            if self.samples == self._next:
+                f = self.features.features()
+                if self.channels is None:
+                    pending.append((f.log_mel[np.newaxis].copy(), np.array([f.rule_ratio]), self.samples))
+                else:
+                    pending.append((f.log_mel.copy(), f.rule_ratios, self.samples))
+                self._next += self.hop
+                if len(pending) == self.max_batch:
+                    results += self._decide(pending)
+                    pending = []
+        if pending:
+            results += self._decide(pending)
+        return results
+
+    @property
+    def until_decision(self):
+        """Samples still needed to reach the next decision."""
+        return self._next - self.samples
+
+    def skip(self, frames):
+        """Mark `frames` samples as lost (e.g. overwritten before analysis).
+
+        Stream time keeps counting through the gap, but the STFT state
+        starts over after it, as at the start of a stream, so no window
+        joins the audio on both sides. The next decision falls on the next
+        hop boundary.
+        """
+        frames = int(frames)
+        if frames <= 0:
+            return
+        self.samples += frames
+        self.features.reset()
+        self._audio.skip(frames)
+        self._next = (self.samples // self.hop + 1) * self.hop
+
+    def _decide(self, pending):
+        classifier = self.classifier or _get_classifier()
+        log_mels, ratios, ends = zip(*pending)
+        n_channels = self.channels or 1
+        ratios = np.concatenate(ratios)
+        probs = classifier.predict_batch(np.concatenate(log_mels))
+        levels, scores = fuse_batch(ratios, probs, sensitivity=self.sensitivity)
+        shape = (len(ends), n_channels)
+        ratios, levels, scores = ratios.reshape(shape), levels.reshape(shape), scores.reshape(shape)
+        probs = probs.reshape(shape + (len(CLASSES),))
+        alerting = np.isin(levels, ALERT_LEVELS)
+
+        results = []
+        for d, end in enumerate(ends):
+            common = {'window': self.decisions, 'offset': round(max(0, end - self.window) / self.sr, 6),
+                      'end': round(end / self.sr, 6)}
+            self.decisions += 1
+            if self.channels is None:
+                r = dict({'rule_ratio': float(ratios[d, 0]), 'ml_scores': dict(zip(CLASSES, probs[d, 0].tolist())),
+                          'level': str(levels[d, 0]), 'score': float(scores[d, 0])}, **common)
+            else:
+                r = dict({'levels': levels[d], 'scores': scores[d], 'rule_ratios': ratios[d],
+                          'ml_scores': probs[d]}, **common)
+            if self.on_alert is not None and alerting[d].any():
+                length = min(self.window, end)
+                audio = self._audio.window(end, length)
+                for ch in np.flatnonzero(alerting[d]):
+                    if self.channels is None:
+                        alert = r
+                    else:
+                        alert = dict({'channel': int(ch), 'rule_ratio': float(ratios[d, ch]),
+                                      'ml_scores': dict(zip(CLASSES, probs[d, ch].tolist())),
+                                      'level': str(levels[d, ch]), 'score': float(scores[d, ch])}, **common)
+                    evidence = self.on_alert(alert, audio[:, ch])
+                    if evidence is not None:
+                        alert['evidence'] = evidence
+            results.append(r)
+        return results
@@ -0,0 +1,96 @@
+"""Synthetic test audio for benchmarks and load tests.
+
+Every generator is deterministic for a given seed and returns float32 in
+-1..1:
+
+- 'ultrasonic': a steady 19 kHz tone over faint noise (the attack the
+  rule detector looks for; needs a sample rate above 38 kHz)
+- 'speech': speech-like noise, i.e. noise shaped by three formant bands,
+  a voiced pitch and a 4 Hz syllable envelope
+- 'mixed': speech with a quieter ultrasonic tone underneath
+- 'silence': digital silence
+- 'noise': white noise
+
+`corpus` crosses kinds with sample rates and lengths; `wav_bytes` encodes
+a clip for posting to the web API.
+"""
+import io
+
+import numpy as np
+
+KINDS = ('ultrasonic', 'speech', 'mixed', 'silence', 'noise')
+SAMPLE_RATES = (16000, 44100, 48000)
+LENGTHS = (0.5, 1.0, 5.0)
+
+FORMANTS = ((500, 1500, 2500), (700, 1200, 2600), (300, 2200, 3000))
+
+
+def tone(freq, sr=44100, seconds=1.0, amplitude=0.5, phase=0.0):
+    t = np.arange(int(sr * seconds)) / sr
+    return (amplitude * np.sin(2 * np.pi * freq * t + phase)).astype(np.float32)
+
+
+def silence(sr=44100, seconds=1.0):
+    return np.zeros(int(sr * seconds), dtype=np.float32)
+
+
+def noise(sr=44100, seconds=1.0, amplitude=0.1, rng=None):
+    rng = rng if rng is not None else np.random.default_rng(0)
+    return (amplitude * rng.standard_normal(int(sr * seconds))).astype(np.float32)
+
+
+def speech_like(sr=44100, seconds=1.0, amplitude=0.3, rng=None):
+    """Formant-shaped noise plus a voiced pitch, gated by syllables."""
+    rng = rng if rng is not None else np.random.default_rng(0)
+    n = int(sr * seconds)
+    spectrum = np.fft.rfft(rng.standard_normal(n))
+    freqs = np.fft.rfftfreq(n, 1.0 / sr)
+    formants = FORMANTS[rng.integers(len(FORMANTS))]
+    shape = sum(np.exp(-0.5 * ((freqs - f) / 120.0) ** 2) for f in formants if f < sr / 2)
+    x = np.fft.irfft(spectrum * shape, n)
+    t = np.arange(n) / sr
+    pitch = rng.uniform(100, 220)
+    x += 0.5 * np.std(x) * np.sign(np.sin(2 * np.pi * pitch * t))
+    syllables = np.clip(np.sin(2 * np.pi * 4.0 * t + rng.uniform(0, np.pi)), 0, None) ** 2
+    x *= syllables
+    peak = np.abs(x).max()
+    if peak > 0:
+        x *= amplitude / peak
+    return x.astype(np.float32)
+
+
+def generate(kind, sr=44100, seconds=1.0, seed=0):
+    """One clip of `kind` (see KINDS)."""
+    rng = np.random.default_rng(seed)
+    if kind == 'ultrasonic':
+        return tone(19000, sr, seconds, 0.5) + noise(sr, seconds, 0.005, rng)
+    if kind == 'speech':
+        return speech_like(sr, seconds, rng=rng)
+    if kind == 'mixed':
+        return speech_like(sr, seconds, 0.3, rng=rng) + tone(19000, sr, seconds, 0.1)
+    if kind == 'silence':
+        return silence(sr, seconds)
+    if kind == 'noise':
+        return noise(sr, seconds, rng=rng)
+    raise ValueError(f"unknown kind {kind!r}; choose from {', '.join(KINDS)}")
+
+
+def corpus(kinds=KINDS, sample_rates=SAMPLE_RATES, lengths=LENGTHS, seed=0):
+    """Yield (name, sr, waveform) for every kind x sample rate x length.
+
+    Ultrasonic kinds are skipped at sample rates that cannot carry 19 kHz.
+    """
+    for kind in kinds:
+        for sr in sample_rates:
+            if kind in ('ultrasonic', 'mixed') and sr < 40000:
+                continue
+            for seconds in lengths:
+                yield f'{kind}_{sr}_{seconds:g}s', sr, generate(kind, sr, seconds, seed)
+
+
+def wav_bytes(waveform, sr, subtype='PCM_16'):
+    import soundfile as sf
+
+    buf = io.BytesIO()
+    sf.write(buf, waveform, sr, format='WAV', subtype=subtype)
+    return buf.getvalue()
@@ -0,0 +1,111 @@
+"""Explicit warm-up and readiness state for serving processes.
+
+Heavy dependencies are imported lazily, so a fresh process starts fast but
+its first analysis would pay for them: the cached Hann windows, frequency
+grids and mel filterbanks per sample rate (plus librosa's numba-compiled
+helpers, about a second, with the 'librosa' mel backend), the classifier's
+model session and batching thread, and the PyAV decoder for uploads
+libsndfile cannot read.
+
+`run` does all of that up front and marks the process ready;
+`whisperguard.web` reports the state on /healthz (503 until ready).
+`whisperguard.serve` runs it in the master before forking, so every
+worker starts ready. `start` runs it on a background thread, for the
+development server and for WSGI servers that import the app directly.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+
+from whisperguard import config
+
+logger = logging.getLogger('whisperguard.warmup')
+
+# 'cold' -> 'warming' -> 'ready' (or 'failed')
+_state = {'status': 'cold', 'seconds': None, 'error': None, 'steps': {}}
+_run_lock = threading.Lock()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def status():
+    """Copy of the readiness state (status, total seconds, error, seconds per step)."""
+    return dict(_state, steps=dict(_state['steps']))
+
+
+def is_ready():
+    return _state['status'] == 'ready'
+
+
+def _step(name, fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    _state['steps'][name] = round(time.perf_counter() - t0, 4)
+
+
+def _import_optional():
+    # imports deferred at module level; done here so forked workers share them
+    from whisperguard import decode
+
+    if decode._HAS_AV:
+        import av  # noqa: F401
+    if config.EVIDENCE_RENDER == 'pretty':
+        import matplotlib.backends.backend_agg  # noqa: F401
+
+
+def _warm_sample_rate(classifier, sr):
+    from whisperguard.batch import analyze_batch
+    from whisperguard.model.features import extract_features
+
+    # single-chunk path (/analyze, CLI) and stacked path (timelines, streams)
+    silence = np.zeros(sr, dtype=np.float32)
+    features = extract_features(silence, sr=sr)
+    classifier.predict(features.log_mel, sr=sr, features=features)
+    analyze_batch(np.zeros((2, sr), dtype=np.float32), sr, classifier=classifier)
+
+
+def run(classifier=None, sample_rates=None):
+    """Warm this process up in the calling thread; return `status()`.
+
+    classifier: the instance the app serves with (default: the shared
+        batch classifier)
+    sample_rates: defaults to `config.WARMUP_SAMPLE_RATES`
+
+    Runs once per process; later calls return immediately, and calls made
+    while another thread is warming up wait for it.
+    """
+    with _run_lock:
+        if _state['status'] != 'ready':
+            _warm(classifier, sample_rates or config.WARMUP_SAMPLE_RATES)
+    return status()
+
+
+def _warm(classifier, sample_rates):
+    _state.update(status='warming', error=None)
+    started = time.perf_counter()
+    try:
+        if classifier is None:
+            from whisperguard.batch import _get_classifier
+            classifier = _get_classifier()
+        _step('imports', _import_optional)
+        for sr in sample_rates:
+            _step(f'features_{sr}', _warm_sample_rate, classifier, sr)
+    except Exception as e:
+        logger.exception('warm-up failed')
+        _state.update(status='failed', error=str(e))
+        return
+    _state.update(status='ready', seconds=round(time.perf_counter() - started, 4))
+    logger.info(f"warm-up finished in {_state['seconds']:.2f}s")
+
+
+def start(classifier=None, sample_rates=None):
+    """Run `run` on a daemon thread unless it has already been started."""
+    global _thread
+    with _thread_lock:
+        if _thread is None and not is_ready():
+            _thread = threading.Thread(target=run, args=(classifier, sample_rates),
+                                       name='whisperguard-warmup', daemon=True)
+            _thread.start()
+        return _thread
@@ -2,15 +2,33 @@
 
 Endpoints:
 - /            : web UI (upload or record)
-- /analyze     : POST audio file blob, returns JSON analysis
-
-This is a lightweight demo server to test detection from a browser.
+- /analyze     : POST audio file blob, returns JSON analysis (long files
+                also get a per-window timeline)
+- /analyze/batch : POST several clips, returns per-clip and per-chunk results
+- /ws/stream   : WebSocket live ingest (needs flask-sock): a JSON config
+                message, then binary PCM frames; results are pushed back
+- /stream      : POST opens an HTTP streaming session; POST raw PCM to
+                /stream/<id> for results, DELETE to close
+- /evidence/status/<id> : state of an evidence package queued by /analyze
+- /evidence/list : paginated, filterable evidence index (ETag aware)
+- /events      : alert events newer than a cursor, plus per-level counts
+- /healthz     : readiness probe; 503 until this worker has warmed up
+- /metrics     : Prometheus text: per-stage latency histograms and counters
+- /debug/profile : sampling profile of this worker (WHISPERGUARD_PROFILER=1)
+
+`python -m whisperguard.web` runs the Werkzeug development server; use
+`python -m whisperguard.serve` for multi-worker production serving.
+Module-level state (classifier, writers, sessions) is per worker process
+and safe to use from that worker's request threads.
 """
 from flask import Flask, render_template, request, jsonify
-import tempfile
+import contextlib
+import hashlib
+import itertools
+import json
 import os
 import time
-import subprocess
+import numpy as np
 import soundfile as sf
 import logging
 
@@ -20,14 +38,29 @@ handler = logging.StreamHandler()
 formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
 handler.setFormatter(formatter)
 logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
 
 from whisperguard.detection.ultrasonic import detect_ultrasonic
-from whisperguard.model.spectrogram import waveform_to_log_mel
+from whisperguard.model.features import extract_features, get_mel_backend
+from whisperguard.batch import analyze_waveform, stream_timeline, summarize
 from whisperguard.model.cnn import CNNSpectrogramClassifier
 from whisperguard.fusion import fuse_scores
 from whisperguard.logger import EventLogger
-from whisperguard.evidence import save_evidence
+from whisperguard.evidence_writer import EvidenceWriter
+from whisperguard.evidence_index import EvidenceIndex, INDEX_FILENAME, decode_cursor
+from whisperguard.incident import metadata as incident_metadata
+from whisperguard.session import SessionManager
+from whisperguard.decode import AudioInfo, DecodeError, PCMStream, SOUNDFILE_FORMATS, sniff_format
+from whisperguard import __version__, config, metrics, warmup
+from whisperguard.cache import ResultCache, analysis_key, digest_pcm, digest_stream
+from whisperguard.profiler import profile_for
+from whisperguard.retention import from_config as retention_from_config
+
+logger.setLevel(config.WEB_LOG_LEVEL)
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
 
 
 app = Flask(__name__, template_folder=os.path.join(os.path.dirname(__file__), "templates"), static_folder=os.path.join(os.path.dirname(__file__), "static"))
@@ -40,8 +73,154 @@ try:
 except Exception as e:
     logger.exception("Could not create evidence dir")
 
-classifier = CNNSpectrogramClassifier()
-event_logger = EventLogger()
+# index of saved evidence; built from existing folders the first time
+_index_existed = os.path.exists(os.path.join(EVIDENCE_STATIC, INDEX_FILENAME))
+evidence_index = EvidenceIndex.for_dir(EVIDENCE_STATIC)
+if not _index_existed:
+    logger.debug(f"Indexed {evidence_index.rebuild(EVIDENCE_STATIC)} existing evidence folders")
+
+classifier = CNNSpectrogramClassifier(model_path=config.MODEL_PATH)
+event_logger = EventLogger(maxlen=config.EVENT_LOG_SIZE, path=config.EVENT_LOG_PATH or None,
+                           max_file_events=config.EVENT_LOG_MAX_FILE_EVENTS)
+result_cache = (ResultCache(max_entries=config.RESULT_CACHE_SIZE, ttl=config.RESULT_CACHE_TTL,
+                            path=config.RESULT_CACHE_PATH or None)
+                if config.RESULT_CACHE_SIZE > 0 else None)
+evidence_writer = EvidenceWriter(workers=config.EVIDENCE_WORKERS,
+                                 max_pending=config.EVIDENCE_QUEUE_SIZE,
+                                 policy=config.EVIDENCE_POLICY,
+                                 base_dir=EVIDENCE_STATIC)
+
+
+# evidence quota and age limits; sweeps start with the first request, so
+# they run in the serving processes and never in a pre-fork master
+retention = retention_from_config(EVIDENCE_STATIC)
+
+
+@app.before_request
+def _start_retention():
+    retention.start()
+
+
+def _queue_incident_evidence(session, incident):
+    """Session incident hook: queue one evidence package per incident and log the event."""
+    ev = {"ts": time.time(), "level": incident['level'], "score": incident['score'],
+          "session": session.id, "offset": incident['start'], "duration": incident['duration'],
+          "hits": incident['hits']}
+    try:
+        evidence_id = evidence_writer.submit(incident['audio'], session.sr, incident['ml_scores'],
+                                             incident['rule_ratio'], incident['level'], incident['score'],
+                                             incident=incident_metadata(incident))
+    except Exception as e:
+        logger.exception('queueing incident evidence failed')
+        event_logger.append(ev)
+        return {"error": str(e), "start": incident['start'], "end": incident['end']}
+    ev['evidence_id'] = evidence_id
+    event_logger.append(ev)
+    evidence = evidence_writer.status(evidence_id)
+    evidence['status_url'] = f'/evidence/status/{evidence_id}'
+    return {"start": incident['start'], "end": incident['end'], "level": incident['level'],
+            "score": incident['score'], "hits": incident['hits'], "evidence": evidence}
+
+
+sessions = SessionManager(max_sessions=config.STREAM_MAX_SESSIONS,
+                          idle_timeout=config.STREAM_IDLE_TIMEOUT,
+                          window_seconds=config.STREAM_SESSION_WINDOW_SECONDS,
+                          hop_seconds=config.STREAM_SESSION_HOP_SECONDS or None,
+                          classifier=classifier, on_incident=_queue_incident_evidence,
+                          incident_options={'pre_roll': config.INCIDENT_PRE_ROLL,
+                                            'post_roll': config.INCIDENT_POST_ROLL,
+                                            'max_seconds': config.INCIDENT_MAX_SECONDS,
+                                            'release': config.INCIDENT_RELEASE})
+sock = Sock(app) if Sock is not None else None
+
+
+class UploadError(Exception):
+    """An uploaded file could not be decoded; carries the JSON error body and HTTP status."""
+
+    def __init__(self, body, status):
+        super().__init__(body.get('error'))
+        self.body = body
+        self.status = status
+
+
+@contextlib.contextmanager
+def _upload_source(f, add_debug):
+    """Yield (source, info) for an uploaded audio file.
+
+    The format is sniffed from the first bytes. Files soundfile reads
+    (wav/flac/ogg/aiff, and unrecognised ones) are read straight from the upload stream (Werkzeug
+    already spools large uploads to disk), so nothing is decoded up front
+    and `source` is that stream. Other formats are decoded block by block
+    (`whisperguard.decode.PCMStream`): a short upload is decoded whole and
+    `source` is its mono float32 samples; one of at least
+    STREAM_MIN_SECONDS is an iterator of decoded blocks of unknown length
+    (`info.frames` None), so it is analyzed while it decodes.
+    Raises `UploadError` when the upload cannot be read.
+    """
+    stream = f.stream
+    stream.seek(0)
+    fmt = sniff_format(stream.read(16))
+    stream.seek(0)
+    add_debug('Sniffed upload format: %s', fmt)
+    source = None
+    if fmt in SOUNDFILE_FORMATS or fmt is None:
+        try:
+            sf_info = sf.info(stream)
+            stream.seek(0)
+            source, info = stream, AudioInfo(sf_info.samplerate, sf_info.frames, sf_info.channels)
+        except Exception as e:
+            add_debug('soundfile could not read upload (%s): %s', fmt, e)
+            stream.seek(0)
+    try:
+        if source is None:
+            source, info = _decoded_source(PCMStream(stream))
+        add_debug('audio source sr=%s frames=%s channels=%s', info.samplerate, info.frames, info.channels)
+        yield source, info
+    except DecodeError as e:
+        # also raised while a long upload is still decoding
+        add_debug('decoding failed: %s', e)
+        raise UploadError({"error": str(e), "format": fmt}, 400)
+
+
+def _decoded_source(pcm):
+    # decode up to the streaming threshold: shorter uploads become one array
+    blocks, frames = [], 0
+    limit = config.STREAM_MIN_SECONDS * pcm.sr
+    it = iter(pcm)
+    for block in it:
+        blocks.append(block)
+        frames += len(block)
+        if frames >= limit:
+            return itertools.chain(blocks, it), AudioInfo(pcm.sr, None)
+    samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    return samples, AudioInfo(pcm.sr, len(samples))
+
+
+def _decode_upload(f, add_debug):
+    """Decode a whole uploaded audio file to (float32 data, sr)."""
+    with _upload_source(f, add_debug) as (source, info):
+        if isinstance(source, np.ndarray):
+            return source, info.samplerate
+        if info.frames is None:
+            return np.concatenate(list(source)), info.samplerate
+        return sf.read(source, dtype="float32")
+
+
+def _stream_analysis(source, sensitivity, sr=None):
+    """Analyze a long upload window by window with constant memory.
+
+    Returns (timeline, worst_result, worst_window): one compact entry per
+    window plus the highest-scoring window's result and a copy of its
+    samples (for evidence); both are None for empty input.
+    """
+    timeline = []
+    worst, worst_window = None, None
+    for r, window in stream_timeline(source, window_seconds=config.STREAM_WINDOW_SECONDS, sr=sr,
+                                     classifier=classifier, sensitivity=sensitivity):
+        timeline.append({k: r[k] for k in ('offset', 'level', 'score', 'rule_ratio')})
+        if worst is None or r['score'] > worst['score']:
+            worst, worst_window = r, window.copy()
+    return timeline, worst, worst_window
 
 
 @app.route("/")
@@ -49,6 +228,39 @@ def index():
     return render_template("index.html")
 
 
+def _flag(value):
+    return str(value or '').lower() in ('1', 'true', 'yes')
+
+
+class DebugTrace:
+    """Per-request debug messages, built only when someone reads them.
+
+    Messages take %-style arguments and are formatted only if the client
+    asked for the trace (`debug=1`, or WHISPERGUARD_DEBUG_PAYLOADS) or the
+    web logger is at DEBUG level; otherwise `add` returns immediately.
+    """
+
+    def __init__(self, enabled):
+        self.messages = [] if enabled else None
+        self._log = logger.isEnabledFor(logging.DEBUG)
+
+    def add(self, msg, *args):
+        if self.messages is None and not self._log:
+            return
+        if args:
+            msg = msg % args
+        if self.messages is not None:
+            self.messages.append(msg)
+        if self._log:
+            logger.debug(msg)
+
+    def attach(self, body):
+        """`body` with the trace under 'debug' when it was requested."""
+        if self.messages is not None:
+            body['debug'] = self.messages
+        return body
+
+
 @app.route("/analyze", methods=["GET", "POST"])
 def analyze():
     if request.method == 'GET':
@@ -57,168 +269,439 @@ def analyze():
             "methods": ["POST"],
             "note": "Use curl: curl -F \"audio=@file.wav\" http://<host>:5000/analyze"
         })
-    debug_msgs = []
-    def add_debug(m):
-        debug_msgs.append(m)
-        logger.debug(m)
+    with metrics.timer('analyze'):
+        return _analyze_upload()
+
+
+def _analyze_upload():
+    trace = DebugTrace(config.WEB_DEBUG_PAYLOADS or _flag(request.values.get('debug')))
+    add_debug = trace.add
 
     add_debug('Analyze called')
-    add_debug(f'Form keys: {list(request.form.keys())}  Files: {list(request.files.keys())}')
+    add_debug('Form keys: %s  Files: %s', list(request.form.keys()), list(request.files.keys()))
 
     f = request.files.get("audio")
     if not f:
         add_debug('No audio file in request')
-        return jsonify({"error": "no file uploaded", "debug": debug_msgs}), 400
+        return jsonify(trace.attach({"error": "no file uploaded"})), 400
 
-    tmp_in = None
-    tmp_out = None
-    in_path = None
+    sensitivity = float(request.form.get("sensitivity", 0.5))
+    # support a test-only override to force saving evidence for debugging
+    force_save = _flag(request.form.get('force_save'))
+
+    # same bytes (or, after decoding, same samples) under the same settings
+    # give the same answer: reuse it, including its evidence package
+    params = {'version': __version__, 'sensitivity': sensitivity, 'model': classifier.version,
+              'mel': get_mel_backend(), 'stream_min': config.STREAM_MIN_SECONDS,
+              'stream_window': config.STREAM_WINDOW_SECONDS}
+    use_cache = result_cache is not None and not force_save
+    if use_cache:
+        raw_key = analysis_key('raw', digest_stream(f.stream), **params)
+        cached = result_cache.get(raw_key, count_miss=False)
+        if cached is not None:
+            add_debug('Result cache hit (upload bytes)')
+            return _analysis_response(cached, trace, cached=True)
+
+    timeline = None
+    started = time.perf_counter()
     try:
-        tmp_in = tempfile.NamedTemporaryFile(delete=False)
-        filename = getattr(f, 'filename', '') or 'upload'
-        ext = os.path.splitext(filename)[1]
-        if not ext:
-            in_path = tmp_in.name + '.bin'
-        else:
-            in_path = tmp_in.name + ext
-        add_debug(f'Writing upload to: {in_path}')
-        with open(in_path, 'wb') as w:
-            f.stream.seek(0)
-            data_bytes = f.read()
-            w.write(data_bytes)
-        add_debug(f'Wrote {len(data_bytes)} bytes')
-
-        # Try reading directly with soundfile first
-        try:
-            data, sr = sf.read(in_path, dtype="float32")
-            add_debug(f'soundfile read success sr={sr} len={len(data)}')
-        except Exception:
-            add_debug('soundfile failed to read uploaded file, attempting ffmpeg conversion')
-            tmp_out = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-            out_path = tmp_out.name
-            cmd = ['ffmpeg', '-y', '-i', in_path, '-ar', '44100', '-ac', '1', out_path]
-            try:
-                add_debug(f'Running ffmpeg: {cmd}')
-                res = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-                add_debug(f'ffmpeg returncode={res.returncode}')
-            except FileNotFoundError:
-                add_debug('ffmpeg not found')
-                return jsonify({"error": "ffmpeg not found on server. Install ffmpeg or upload WAV files.", "debug": debug_msgs}), 400
-            except Exception as e:
-                add_debug(f'ffmpeg conversion failed: {e}')
-                return jsonify({"error": f"ffmpeg conversion failed: {e}", "debug": debug_msgs}), 500
-
-            if res.returncode != 0:
-                add_debug(f'ffmpeg stderr: {res.stderr}')
-                return jsonify({"error": "ffmpeg conversion failed", "stderr": res.stderr, "debug": debug_msgs}), 500
-
-            try:
-                data, sr = sf.read(out_path, dtype="float32")
-                add_debug(f'read converted wav sr={sr} len={len(data)}')
-            except Exception as e:
-                add_debug(f'could not read converted audio: {e}')
-                return jsonify({"error": "could not read converted audio", "details": str(e), "debug": debug_msgs}), 500
-    finally:
-        try:
-            if tmp_in is not None:
-                tmp_in.close()
-        except Exception:
-            pass
-        try:
-            if in_path and os.path.exists(in_path):
-                os.unlink(in_path)
-        except Exception:
-            pass
-        try:
-            if tmp_out is not None:
-                tmp_out.close()
-                if os.path.exists(tmp_out.name):
-                    os.unlink(tmp_out.name)
-        except Exception:
-            pass
+        with _upload_source(f, add_debug) as (source, info):
+            sr = info.samplerate
+            if info.duration >= config.STREAM_MIN_SECONDS:
+                length = 'decoding' if info.frames is None else '%.1fs' % info.duration
+                add_debug('Streaming %s upload in %ss windows', length, config.STREAM_WINDOW_SECONDS)
+                timeline, worst, waveform = _stream_analysis(source, sensitivity, sr=sr)
+                data = waveform
+            elif isinstance(source, np.ndarray):
+                data = source
+            else:
+                data, sr = sf.read(source, dtype="float32")
+    except UploadError as e:
+        return jsonify(trace.attach(dict(e.body))), e.status
+    if timeline is None:
+        metrics.observe('decode', time.perf_counter() - started)
 
     if data is None or len(data) == 0:
         add_debug('No audio data after read')
-        return jsonify({"error": "could not read audio", "debug": debug_msgs}), 400
-
-    if data.ndim > 1:
-        waveform = data.mean(axis=1)
+        return jsonify(trace.attach({"error": "could not read audio"})), 400
+
+    pcm_key = None
+    if use_cache and timeline is None:
+        pcm_key = analysis_key('pcm', digest_pcm(data, sr), **params)
+        cached = result_cache.get(pcm_key)
+        if cached is not None:
+            add_debug('Result cache hit (decoded audio)')
+            result_cache.put(raw_key, cached)
+            return _analysis_response(cached, trace, cached=True)
+    elif use_cache:
+        result_cache.count_miss()
+
+    if timeline is not None:
+        # long upload: report (and keep evidence of) the worst window
+        with metrics.timer('features'):
+            features = extract_features(waveform, sr=sr)
+        rule_ratio, ml_scores = worst['rule_ratio'], worst['ml_scores']
+        level, score = worst['level'], worst['score']
     else:
-        waveform = data
+        if data.ndim > 1:
+            waveform = data.mean(axis=1)
+        else:
+            waveform = data
 
-    rule_ratio, rule_flag = detect_ultrasonic(waveform, sr)
-    log_mel = waveform_to_log_mel(waveform, sr=sr)
-    ml_scores = classifier.predict(log_mel, waveform=waveform, sr=sr)
-    sensitivity = float(request.form.get("sensitivity", 0.5))
-    level, score = fuse_scores(rule_ratio, ml_scores, sensitivity=sensitivity, whitelist=False)
-
-    # support a test-only override to force saving evidence for debugging
-    force_save = str(request.form.get('force_save', '')).lower() in ('1', 'true', 'yes')
+        with metrics.timer('features'):
+            features = extract_features(waveform, sr=sr)
+        with metrics.timer('ultrasonic'):
+            rule_ratio, rule_flag = detect_ultrasonic(waveform, sr, features=features)
+        with metrics.timer('predict'):
+            ml_scores = classifier.predict(features.log_mel, waveform=waveform, sr=sr, features=features)
+        with metrics.timer('fusion'):
+            level, score = fuse_scores(rule_ratio, ml_scores, sensitivity=sensitivity, whitelist=False)
 
     evidence = None
+    logged = []
     # Save evidence when suspicious OR when force_save flag present (debug/testing)
     if level in ("THREAT", "SUSPICIOUS") or force_save:
         ev = {"ts": time.time(), "level": level, "score": float(score)}
         if force_save:
             ev['note'] = 'force_saved'
             add_debug('force_save enabled: saving evidence regardless of fused level')
-        event_logger.append(ev)
         try:
-            evidence = save_evidence(waveform, sr, ml_scores, rule_ratio, level, score)
-            add_debug(f'Evidence saved: {evidence}')
+            evidence_id = evidence_writer.submit(waveform, sr, ml_scores, rule_ratio, level, score,
+                                                 spectrogram=features.power)
+            evidence = evidence_writer.status(evidence_id)
+            evidence['status_url'] = f'/evidence/status/{evidence_id}'
+            ev['evidence_id'] = evidence_id
+            add_debug('Evidence queued: %s (%s)', evidence_id, evidence["state"])
         except Exception as e:
-            add_debug(f'Failed saving evidence: {e}')
+            add_debug('Failed queueing evidence: %s', e)
             evidence = {"error": str(e)}
+        logged.append(event_logger.append(ev))
 
-    resp = {
+    result = {
         "rule_ratio": float(rule_ratio),
         "ml_scores": ml_scores,
         "level": level,
         "score": float(score),
-        "events": event_logger.list(),
     }
+    if timeline is not None:
+        result['offset'] = worst['offset']
+        result['timeline'] = timeline
+    if evidence is not None and 'id' in evidence:
+        result['evidence_id'] = evidence['id']
+    # a retry should try again to save evidence that could not be queued
+    if use_cache and (evidence is None or evidence.get('state') in ('queued', 'writing', 'ready')):
+        for key in (raw_key, pcm_key):
+            if key is not None:
+                result_cache.put(key, result)
+    return _analysis_response(result, trace, logged=logged, evidence=evidence)
+
+
+def _analysis_response(result, trace, logged=(), evidence=None, cached=False):
+    """JSON response for an analysis `result`, fresh or from the cache.
+
+    Cache hits log no event and queue no evidence; they report the status
+    of the evidence package saved for the original request.
+    """
+    # only new events: those after the client's `since` cursor, or without
+    # one just the event of this request
+    try:
+        since = request.form.get('since')
+        events, cursor = event_logger.since(since) if since else (list(logged), event_logger.cursor)
+    except ValueError:
+        return jsonify(trace.attach({"error": "bad since cursor"})), 400
+
+    resp = dict(result, events=events, events_cursor=cursor)
+    evidence_id = resp.pop('evidence_id', None)
+    if cached:
+        resp['cached'] = True
+        if evidence_id:
+            evidence = evidence_writer.status(evidence_id) or {'id': evidence_id, 'state': 'unknown'}
+            evidence['status_url'] = f'/evidence/status/{evidence_id}'
     if evidence is not None:
         resp['evidence'] = evidence
-    resp['debug'] = debug_msgs
-    return jsonify(resp)
+    return jsonify(trace.attach(resp))
+
+
+@app.route("/analyze/batch", methods=["POST"])
+def analyze_batch():
+    """Analyze every file posted under 'audio' in stacked per-chunk batches.
+
+    Form fields: sensitivity (0..1), chunk_seconds (default 1.0). Each clip
+    gets its worst chunk as overall level/score plus all chunk results.
+    No evidence is saved; use /analyze for single alerts.
+    """
+    files = request.files.getlist("audio")
+    if not files:
+        return jsonify({"error": "no file uploaded"}), 400
+    try:
+        sensitivity = float(request.form.get("sensitivity", 0.5))
+        chunk_seconds = float(request.form.get("chunk_seconds", 1.0))
+    except ValueError as e:
+        return jsonify({"error": f"bad form field: {e}"}), 400
+    if chunk_seconds <= 0:
+        return jsonify({"error": "chunk_seconds must be positive"}), 400
+
+    results = []
+    for f in files:
+        name = getattr(f, 'filename', '') or 'upload'
+        try:
+            data, sr = _decode_upload(f, logger.debug)
+        except UploadError as e:
+            results.append(dict(e.body, filename=name))
+            continue
+        waveform = data.mean(axis=1) if data.ndim > 1 else data
+        chunks = analyze_waveform(waveform, sr, chunk_seconds=chunk_seconds,
+                                  classifier=classifier, sensitivity=sensitivity)
+        results.append(dict(summarize(chunks), filename=name, sr=sr,
+                            duration=len(waveform) / sr, chunks=chunks))
+    return jsonify({"results": results})
+
+
+def _session_options(params):
+    """Session keyword arguments from request params or a WebSocket config message."""
+    options = {'sr': int(params.get('sr', 44100)),
+               'sensitivity': float(params.get('sensitivity', 0.5)),
+               'pcm_format': params.get('format', 'f32')}
+    if params.get('hop'):
+        options['hop_seconds'] = float(params['hop'])
+    return options
+
+
+@app.route('/stream', methods=['POST'])
+def stream_open():
+    """Open an HTTP streaming session.
+
+    Parameters (JSON body or form): sr, sensitivity, format ('f32' or
+    's16' little-endian mono PCM), hop (seconds between decisions on
+    overlapping windows, e.g. 0.1; default: one per window).
+    """
+    params = request.get_json(silent=True) or request.form
+    try:
+        session = sessions.open(**_session_options(params))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify(session.info()), 201
+
+
+@app.route('/stream/<session_id>', methods=['GET', 'POST', 'DELETE'])
+def stream_session(session_id):
+    """POST raw PCM (any length, chunked transfer is fine) and get the
+    results of every window it completed; GET session info; DELETE closes."""
+    if request.method == 'DELETE':
+        session = sessions.close(session_id)
+    else:
+        session = sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'unknown or expired session', 'session': session_id}), 404
+    if request.method != 'POST':
+        return jsonify(session.info())
+
+    results = []
+    try:
+        while True:
+            piece = request.stream.read(65536)
+            if not piece:
+                break
+            results.extend(session.feed(piece))
+    except DecodeError as e:
+        sessions.close(session.id)
+        return jsonify({'error': str(e), 'session': session.id, 'results': results}), 400
+    return jsonify({'session': session.id, 'results': results, 'samples': session.samples})
+
+
+if sock is not None:
+    @sock.route('/ws/stream')
+    def ws_stream(ws):
+        """Live ingest over one WebSocket.
+
+        The first message is a JSON config ({"sr", "sensitivity", "format",
+        optional "hop"});
+        every following binary message is PCM. Each completed window is
+        pushed back as {"results": [...]}; errors as {"error": ...}.
+        """
+        try:
+            session = sessions.open(**_session_options(json.loads(ws.receive())))
+        except (ValueError, TypeError, AttributeError, RuntimeError) as e:
+            ws.send(json.dumps({'error': str(e)}))
+            ws.close()
+            return
+        ws.send(json.dumps({'session': session.id, 'window_seconds': session.window_seconds}))
+        try:
+            while True:
+                data = ws.receive()
+                if data is None:
+                    break
+                if isinstance(data, str):
+                    # text frames are control messages; only 'close' is defined
+                    if data.strip() == 'close':
+                        break
+                    continue
+                try:
+                    results = session.feed(data)
+                except DecodeError as e:
+                    ws.send(json.dumps({'error': str(e)}))
+                    break
+                if results:
+                    ws.send(json.dumps({'results': results}))
+        finally:
+            sessions.close(session.id)
+
+
+@app.route('/evidence/status/<evidence_id>', methods=['GET'])
+def evidence_status(evidence_id):
+    """Report whether a queued evidence package has been written yet."""
+    job = evidence_writer.status(evidence_id)
+    if job is None:
+        return jsonify({'error': 'unknown evidence id', 'id': evidence_id}), 404
+    return jsonify(job), 200
 
 
 @app.route('/evidence/list', methods=['GET'])
 def list_evidence():
-    """Return a JSON list of saved evidence event folders and metadata."""
-    items = []
+    """Return a page of saved evidence events (newest first) from the index.
+
+    Query parameters: limit (default 100, max 500), cursor (from a previous
+    page's next_cursor), level (comma-separated), min_score, max_score,
+    since, until (epoch seconds). Responses carry an ETag derived from the
+    index revision, and a matching If-None-Match gets 304 Not Modified.
+    """
+    args = request.args
     try:
-        if not os.path.exists(EVIDENCE_STATIC):
-            return jsonify({'events': [], 'note': 'evidence dir does not exist'}), 200
-
-        for name in sorted(os.listdir(EVIDENCE_STATIC)):
-            entry = os.path.join(EVIDENCE_STATIC, name)
-            if not os.path.isdir(entry):
-                continue
-            meta = None
-            meta_path = os.path.join(entry, 'metadata.json')
-            try:
-                if os.path.exists(meta_path):
-                    import json
-                    with open(meta_path, 'r', encoding='utf-8') as mf:
-                        meta = json.load(mf)
-            except Exception:
-                meta = {'error': 'could not read metadata'}
-
-            files = []
-            try:
-                for f in sorted(os.listdir(entry)):
-                    files.append(f)
-            except Exception:
-                files = []
-
-            items.append({'name': name, 'metadata': meta, 'files': files})
+        limit = min(max(int(args.get('limit', 100)), 1), 500)
+        levels = [l for l in args.get('level', '').upper().split(',') if l] or None
+        bounds = {k: float(args[k]) for k in ('min_score', 'max_score', 'since', 'until') if args.get(k)}
+        cursor = args.get('cursor') or None
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        return jsonify({'error': f'bad query parameter: {e}'}), 400
+
+    try:
+        revision = evidence_index.revision()
+        etag = hashlib.sha1(f'{revision}|{sorted(args.items(multi=True))}'.encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            resp = app.response_class(status=304)
+            resp.set_etag(etag)
+            return resp
+        items, next_cursor = evidence_index.query(limit=limit, cursor=cursor, levels=levels, **bounds)
     except Exception as e:
         logger.exception('listing evidence failed')
         return jsonify({'error': str(e)}), 500
 
-    return jsonify({'events': items}), 200
+    resp = jsonify({'events': items, 'next_cursor': next_cursor, 'revision': revision})
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
+@app.route('/events', methods=['GET'])
+def list_events():
+    """Return alert events newer than `since` (a cursor), oldest first.
+
+    Query parameters: since (the `cursor` of the previous response;
+    default 0, i.e. everything still in memory), limit (default 100, max
+    1000). `oldest` is the oldest seq still held: if it is above your
+    cursor + 1, events in between were dropped from memory.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+    except ValueError as e:
+        return jsonify({'error': f'bad query parameter: {e}'}), 400
+    events, cursor = event_logger.since(since, limit=limit)
+    return jsonify({'events': events, 'cursor': cursor, 'oldest': event_logger.oldest(),
+                    'counts': event_logger.counts()})
+
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Readiness probe: 200 once warm-up has finished, 503 before.
+
+    Processes not started by `whisperguard.serve` (which warms up before
+    forking) start warming up on the first probe.
+    """
+    if not warmup.is_ready():
+        warmup.start(classifier)
+    state = warmup.status()
+    state['pid'] = os.getpid()
+    return jsonify(state), 200 if state['status'] == 'ready' else 503
+
+
+_STARTED = time.time()
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition for this worker process.
+
+    Per-stage latency histograms (`whisperguard.metrics`) plus event,
+    evidence writer and streaming session counters. Each worker keeps its
+    own numbers, so scrape every worker (or aggregate by the pid label).
+    """
+    pid = {'pid': os.getpid()}
+    events = event_logger.counts()
+    writer = evidence_writer.stats()
+    session_stats = sessions.stats()
+    extra = [
+        ('whisperguard_events_total', 'counter', 'Alert events logged by all processes sharing the event store, by level.',
+         [(dict(pid, level=level), n) for level, n in events.items() if level != 'total']),
+        ('whisperguard_evidence_jobs_total', 'counter', 'Evidence jobs, by outcome.',
+         [(dict(pid, result=k), writer[k]) for k in ('submitted', 'written', 'failed', 'dropped', 'coalesced')]),
+        ('whisperguard_evidence_pending', 'gauge', 'Evidence jobs waiting for a worker.', [(pid, writer['pending'])]),
+        ('whisperguard_stream_sessions', 'gauge', 'Open streaming sessions.', [(pid, session_stats['open'])]),
+        ('whisperguard_stream_sessions_total', 'counter', 'Streaming sessions, by outcome.',
+         [(dict(pid, result=k), session_stats[k]) for k in ('opened', 'closed', 'expired', 'rejected')]),
+    ]
+    if result_cache is not None:
+        cache_stats = result_cache.stats()
+        extra += [
+            ('whisperguard_result_cache_total', 'counter', 'Result cache lookups and upkeep, by kind.',
+             [(dict(pid, result=k), cache_stats[k])
+              for k in ('hits', 'misses', 'disk_hits', 'stores', 'evictions', 'expired')]),
+            ('whisperguard_result_cache_entries', 'gauge', 'Results held in memory.', [(pid, cache_stats['entries'])]),
+        ]
+    if retention.enabled:
+        kept = retention.stats()
+        extra += [
+            ('whisperguard_evidence_bytes', 'gauge', 'Bytes of saved evidence (all processes).', [(pid, kept['bytes'])]),
+            ('whisperguard_evidence_removed_total', 'counter', 'Evidence packages removed by retention, by reason.',
+             [(dict(pid, reason=k), kept[k]) for k in ('expired', 'evicted')]),
+        ]
+    extra += [
+        ('whisperguard_ready', 'gauge', '1 once warm-up has finished.', [(pid, int(warmup.is_ready()))]),
+        ('whisperguard_uptime_seconds', 'gauge', 'Seconds since this worker loaded the app.',
+         [(pid, time.time() - _STARTED)]),
+    ]
+    return app.response_class(metrics.render_prometheus(extra, labels=pid), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/debug/profile', methods=['GET'])
+def debug_profile():
+    """Sample this worker's Python stacks for `seconds` (default 5) and return them.
+
+    Disabled (404) unless WHISPERGUARD_PROFILER=1. format=collapsed (the
+    default; flamegraph.pl / speedscope input) or json (top functions).
+    The request blocks while sampling; other requests keep being served
+    and are what gets profiled.
+    """
+    if not config.PROFILER_ENABLED:
+        return jsonify({'error': 'profiler disabled; set WHISPERGUARD_PROFILER=1'}), 404
+    try:
+        seconds = min(max(float(request.args.get('seconds', 5)), 0.1), config.PROFILER_MAX_SECONDS)
+        interval = min(max(float(request.args.get('interval_ms', 5)), 1.0), 100.0) / 1000.0
+        top = max(1, int(request.args.get('top', 30)))
+    except ValueError as e:
+        return jsonify({'error': f'bad query parameter: {e}'}), 400
+    profiler = profile_for(seconds, interval=interval, include_idle=_flag(request.args.get('idle')))
+    if request.args.get('format') == 'json':
+        return jsonify({'seconds': round(profiler.seconds, 3), 'samples': profiler.samples,
+                        'pid': os.getpid(), 'top': profiler.top(top)})
+    return app.response_class(profiler.collapsed(), mimetype='text/plain')
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # development server; use `python -m whisperguard.serve` in production
+    warmup.start(classifier)
+    app.run(host=config.WEB_HOST, port=config.WEB_PORT, debug=config.WEB_DEBUG, threaded=True)
@@ -1,37 +1,59 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
 
 # 1. Load environment variables
 load_dotenv()
 
-# 2. Setup Supabase connection
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
+# 2. Supabase connection, created on first use so startup does not pay for
+# the client import and setup (and works offline)
+_supabase = None
 
-# Check if keys are missing (Good for debugging)
-if not url or not key:
-    raise ValueError("Supabase keys not found. Check your .env file or Netlify settings.")
 
-supabase: Client = create_client(url, key)
+def get_supabase():
+    global _supabase
+    if _supabase is None:
+        from supabase import create_client
+
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_KEY")
+
+        # Check if keys are missing (Good for debugging)
+        if not url or not key:
+            raise ValueError("Supabase keys not found. Check your .env file or Netlify settings.")
+
+        _supabase = create_client(url, key)
+    return _supabase
 
 # ... The rest of your existing code goes here ...
 
 """Minimal CLI entry for WhisperGuard scaffold with end-to-end smoke pipeline.
 
-Wires: AudioCapture -> Ultrasonic detector -> Spectrogram -> CNN placeholder -> Fusion
+Wires: AudioCapture -> shared STFT features -> Ultrasonic detector / log-mel / CNN placeholder -> Fusion
 and prints risk level for each captured chunk.
+
+Capture, analysis and response run as separate pipeline stages linked by
+bounded queues (see `whisperguard.pipeline`), so alerts, muting and evidence
+writes never stall capture or analysis.
 """
 import argparse
+import queue
+import threading
 import time
 
 from whisperguard.audio.capture import AudioCapture
 from whisperguard.detection.ultrasonic import detect_ultrasonic
-from whisperguard.model.spectrogram import waveform_to_log_mel
+from whisperguard.model.features import MelFrontend, extract_features
 from whisperguard.model.cnn import CNNSpectrogramClassifier
 from whisperguard.fusion import fuse_scores
-from whisperguard.response import alert_user, mute_microphone, log_event
+from whisperguard.engine import MonitorEngine
+from whisperguard.incident import IncidentTracker, metadata as incident_metadata
+from whisperguard.pipeline import Pipeline, BACKPRESSURE_POLICIES
+from whisperguard.streaming import StreamAnalyzer
+from whisperguard.response import alert_user, log_event
 from whisperguard.logger import EventLogger
+from whisperguard import config, metrics
+from whisperguard.profiler import SamplingProfiler
+from whisperguard.retention import from_config as retention_from_config
 
 
 def main():
@@ -41,89 +63,296 @@ def main():
     parser.add_argument("--sensitivity", type=float, default=0.5, help="0..1 sensitivity")
     parser.add_argument("--system-mute", action="store_true", help="try to mute system microphone when threat detected (platform-dependent)")
     parser.add_argument("--pure", action="store_true", help="pure output mode: print only timestamped status lines")
+    parser.add_argument("--hop", type=float, default=None, help="analyze overlapping 1 s windows every HOP seconds (incremental STFT, e.g. 0.1)")
+    parser.add_argument("--devices", default=None, help="comma-separated input devices (indices or names) to monitor at once")
+    parser.add_argument("--channels", type=int, default=1, help="channels per device; each channel is monitored as its own stream")
+    parser.add_argument("--workers", type=int, default=2, help="number of analysis worker threads")
+    parser.add_argument("--queue-size", type=int, default=8, help="capacity of the chunk and result queues")
+    parser.add_argument("--backpressure", choices=BACKPRESSURE_POLICIES, default="drop_oldest", help="what capture does when the analysis queue is full")
+    parser.add_argument("--save-evidence", action="store_true", help="save one evidence package per incident (run of SUSPICIOUS/THREAT chunks)")
+    parser.add_argument("--model", default=config.MODEL_PATH, help="classifier weights (.onnx or .npz); default: heuristic placeholder")
+    parser.add_argument("--stats", action="store_true", help="print per-stage latency (count, mean, p50/p95/p99) on exit")
+    parser.add_argument("--profile", metavar="PATH", help="sample the run with the profiler and write collapsed stacks to PATH")
     args = parser.parse_args()
 
-    ac = AudioCapture(chunk_seconds=1)
-    classifier = CNNSpectrogramClassifier()
+    # the main thread only waits for the run to end; sample the workers
+    profiler = SamplingProfiler(exclude=(threading.get_ident(),)).start() if args.profile else None
+    if args.save_evidence:
+        # keep saved evidence within WHISPERGUARD_RETENTION_* limits
+        from whisperguard.evidence import EVIDENCE_DIR
+        retention_from_config(EVIDENCE_DIR).start()
+    try:
+        if args.devices or args.channels > 1:
+            monitor(args)
+        else:
+            run(args)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            with open(args.profile, "w") as f:
+                f.write(profiler.collapsed())
+            print(f"Profile: {profiler.samples} samples in {profiler.seconds:.1f}s written to {args.profile}")
+            for name, count, share in profiler.top(10):
+                print(f"  {share:6.1%}  {name}")
+        if args.stats:
+            print(metrics.format_summary())
+
+
+def run(args):
+    """Single-input pipeline: capture -> analysis workers -> response."""
+    if args.hop:
+        # consecutive hop-sized blocks from the ring buffer, fed in order to
+        # one stateful analyzer that keeps the STFT of the current window;
+        # not normalized per hop, which would put gain steps into that STFT
+        ac = AudioCapture(chunk_seconds=args.hop, hop_seconds=args.hop, normalize=False)
+    else:
+        ac = AudioCapture(chunk_seconds=1)
+    classifier = CNNSpectrogramClassifier(model_path=args.model)
     logger = EventLogger()
+    sr = ac.samplerate
+    # preallocated STFT/mel buffers for the fixed-length chunks, one per
+    # analysis worker (a frontend is not thread-safe)
+    frontends = threading.local()
+
+    def chunk_features(waveform):
+        frontend = getattr(frontends, "mel", None)
+        if frontend is None:
+            frontend = frontends.mel = MelFrontend(ac.chunk_size, sr=sr)
+        if len(waveform) != frontend.length:
+            # short read when capture timed out
+            return extract_features(waveform, sr=sr)
+        return frontend.compute(waveform)
+
+    def analyze(chunk):
+        # collapse channels if needed
+        if chunk.ndim > 1:
+            waveform = chunk.mean(axis=1)
+        else:
+            waveform = chunk
+
+        with metrics.timer("features"):
+            features = chunk_features(waveform)
+        with metrics.timer("ultrasonic"):
+            rule_ratio, rule_flag = detect_ultrasonic(waveform, sr, features=features)
+        with metrics.timer("predict"):
+            ml_scores = classifier.predict(features.log_mel, waveform=waveform, sr=sr, features=features)
+        with metrics.timer("fusion"):
+            level, score = fuse_scores(rule_ratio, ml_scores, sensitivity=args.sensitivity, whitelist=False)
+
+        # compute RMS for the status line
+        rms = float((waveform.astype(float) ** 2).mean() ** 0.5)
+        return {"chunk": waveform, "rule_ratio": rule_ratio, "ml_scores": ml_scores,
+                "level": level, "score": score, "rms": rms}
+
+    analyzer = None
+    if args.hop:
+        analyzer = StreamAnalyzer(sr, window_seconds=1.0, hop_seconds=args.hop, sensitivity=args.sensitivity,
+                                  classifier=classifier)
+
+    def analyze_hop(chunk, gap):
+        hop = chunk.mean(axis=1) if chunk.ndim > 1 else chunk
+        if gap:
+            # hops muted, dropped or overwritten since the last feed: restart
+            # the STFT instead of joining the audio on both sides of the hole
+            analyzer.skip(gap * len(hop))
+        with metrics.timer("stream_hop"):
+            results = analyzer.feed(hop)
+        if not results:
+            return None
+        r = results[-1]
+        rms = float((hop.astype(float) ** 2).mean() ** 0.5)
+        return {"chunk": hop, "rule_ratio": r["rule_ratio"],
+                "ml_scores": r["ml_scores"], "level": r["level"], "score": r["score"], "rms": rms}
+
+    def app_mute(seconds=5):
+        pipeline.mute(seconds)
+        print(f"(App) microphone muted for {seconds} seconds")
+
+    def system_mute(seconds=5):
+        try:
+            from whisperguard.response import try_system_mute
+            ok = try_system_mute(seconds)
+        except Exception:
+            ok = False
+        if not ok:
+            # fallback to app-level mute
+            app_mute(seconds)
+
+    # consecutive alerting chunks become one incident with one evidence package
+    incidents = IncidentTracker(sr, window_seconds=1.0, pre_roll=config.INCIDENT_PRE_ROLL,
+                                post_roll=config.INCIDENT_POST_ROLL, max_seconds=config.INCIDENT_MAX_SECONDS,
+                                sensitivity=args.sensitivity, release=config.INCIDENT_RELEASE)
+
+    def close_incident(incident):
+        fingerprint = None
+        if args.save_evidence:
+            from whisperguard.evidence import save_evidence
+            try:
+                with metrics.timer("evidence"):
+                    evidence = save_evidence(incident["audio"], sr, incident["ml_scores"], incident["rule_ratio"],
+                                             incident["level"], incident["score"],
+                                             incident=incident_metadata(incident))
+                fingerprint = evidence["folder"]
+            except Exception as e:
+                print("Failed saving evidence:", e)
+        if not args.pure:
+            print(f"Incident closed: {incident['level']} for {incident['duration']:.1f}s "
+                  f"({incident['hits']}/{incident['decisions']} alerting chunks)")
+        log_event(logger, incident["level"], incident["score"], fingerprint=fingerprint)
+
+    def respond(result):
+        level, score, rms = result["level"], result["score"], result["rms"]
+        low_input = rms < 1e-4
+        ts = time.strftime("%H:%M:%S", time.localtime(result["captured_at"]))
+        status = level
+        if status == "SAFE":
+            if low_input:
+                status = "Safe (low input)"
+            else:
+                status = "Safe"
+
+        # pure mode: only print the status line
+        line = f"{ts} - {status}  RMS:{rms:.6f}"
+        if not args.pure:
+            st = pipeline.stats()
+            line += f"  queues:{st['chunk_queue']}/{st['chunk_queue_max']},{st['result_queue']}/{st['result_queue_max']}"
+        print(line)
+
+        # results arrive in capture order; muted or dropped chunks before
+        # this one end the open incident instead of being spliced over
+        if result["gap"]:
+            incident = incidents.gap(result["gap"] * len(result["chunk"]))
+            if incident is not None:
+                close_incident(incident)
+        incidents.feed(result["chunk"])
+        incident = incidents.decide(result)
+        if incident is not None:
+            close_incident(incident)
+
+        if level == "THREAT":
+            alert_user(level, "High confidence audio threat detected")
+            # Try system mute if requested; otherwise perform app-level mute.
+            # System mute sleeps while muted, so it gets its own thread.
+            if args.system_mute:
+                threading.Thread(target=system_mute, args=(5,), daemon=True).start()
+            else:
+                app_mute(5)
+        elif level == "SUSPICIOUS":
+            alert_user(level, "Suspicious audio detected")
+
+    pipeline = Pipeline(ac, analyze_hop if analyzer else analyze, respond,
+                        workers=1 if analyzer else args.workers,
+                        queue_size=args.queue_size, backpressure=args.backpressure, ordered=True,
+                        input_gaps=analyzer is not None)
 
     if not args.pure:
         print("Starting capture pipeline (press Ctrl+C to stop)...")
     ac.start_stream()
+    pipeline.start()
     try:
         if args.continuous or args.duration is None:
             t_end = float("inf")
         else:
             t_end = time.time() + args.duration
         while time.time() < t_end:
-            chunk = ac.read_chunk(timeout=2.0)
-            if chunk is None:
-                if not args.pure:
-                    print("No audio chunk available")
-                continue
-
-            # collapse channels if needed
-            if chunk.ndim > 1:
-                waveform = chunk.mean(axis=1)
-            else:
-                waveform = chunk
+            time.sleep(min(0.5, max(0.0, t_end - time.time())))
+    except KeyboardInterrupt:
+        print("Interrupted by user")
+    finally:
+        pipeline.stop()
+        ac.stop_stream()
+    incident = incidents.flush()
+    if incident is not None:
+        close_incident(incident)
+
+    if not args.pure:
+        print("Logged events:", logger.list())
+        print("Pipeline stats:", pipeline.stats())
+        if ac.ring is not None:
+            print(f"Ring buffer overruns: {ac.overruns}  input overflows: {ac.input_overflows}")
 
-            rule_ratio, rule_flag = detect_ultrasonic(waveform, ac.samplerate)
-            log_mel = waveform_to_log_mel(waveform, sr=ac.samplerate)
-            ml_scores = classifier.predict(log_mel, waveform=waveform, sr=ac.samplerate)
 
-            level, score = fuse_scores(rule_ratio, ml_scores, sensitivity=args.sensitivity, whitelist=False)
+def parse_devices(spec):
+    if not spec:
+        return [None]
+    return [int(d) if d.strip().isdigit() else d.strip() for d in spec.split(",") if d.strip()]
 
-            # compute RMS and format status line similar to your example
-            rms = float((waveform.astype(float) ** 2).mean() ** 0.5)
-            low_input = rms < 1e-4
-            ts = time.strftime("%H:%M:%S", time.localtime())
-            status = level
-            if status == "SAFE":
-                if low_input:
-                    status = "Safe (low input)"
-                else:
-                    status = "Safe"
-
-            # pure mode: only print the status line
-            line = f"{ts} - {status}  RMS:{rms:.6f}"
-            print(line)
-
-            if level == "THREAT":
-                alert_user(level, "High confidence audio threat detected")
-                # Try system mute if requested; otherwise perform app-level mute (stop capture)
-                if args.system_mute:
-                    try:
-                        from whisperguard.response import try_system_mute
-                        ok = try_system_mute(5)
-                        if not ok:
-                            # fallback to app-level mute
-                            ac.stop_stream()
-                            print("(App) microphone muted for 5 seconds")
-                            time.sleep(5)
-                            ac.start_stream()
-                    except Exception:
-                        ac.stop_stream()
-                        print("(App) microphone muted for 5 seconds")
-                        time.sleep(5)
-                        ac.start_stream()
-                else:
-                    ac.stop_stream()
-                    print("(App) microphone muted for 5 seconds")
-                    time.sleep(5)
-                    ac.start_stream()
-                log_event(logger, level, score, fingerprint=None)
-            elif level == "SUSPICIOUS":
-                alert_user(level, "Suspicious audio detected")
-                log_event(logger, level, score)
 
+def monitor(args):
+    """Monitor several devices and/or channels with one shared engine.
+
+    Workers only analyze; alerts and closed incidents are handed to this
+    thread, which prints them, saves one evidence package per incident and
+    logs events, plus a status line per stream.
+    """
+    classifier = CNNSpectrogramClassifier(model_path=args.model)
+    logger = EventLogger()
+    events = queue.Queue()
+    engine = MonitorEngine(hop_seconds=args.hop or 0.25, sensitivity=args.sensitivity, workers=args.workers,
+                           classifier=classifier, on_event=lambda r, window: events.put(("alert", r)),
+                           on_incident=lambda incident: events.put(("incident", incident)),
+                           incident_options={"pre_roll": config.INCIDENT_PRE_ROLL,
+                                             "post_roll": config.INCIDENT_POST_ROLL,
+                                             "max_seconds": config.INCIDENT_MAX_SECONDS,
+                                             "release": config.INCIDENT_RELEASE})
+    sr = engine.samplerate
+    for device in parse_devices(args.devices):
+        engine.add_device(device, channels=args.channels)
+
+    def respond(kind, result):
+        level, score = result["level"], result["score"]
+        ts = time.strftime("%H:%M:%S")
+        if kind == "alert":
+            print(f"{ts} - {result['stream']}: {level}  score:{score:.3f}")
+            message = "High confidence audio threat detected" if level == "THREAT" else "Suspicious audio detected"
+            alert_user(level, f"{message} on {result['stream']}")
+            return
+        print(f"{ts} - {result['stream']}: incident closed, {level} for {result['duration']:.1f}s "
+              f"({result['hits']}/{result['decisions']} alerting decisions)")
+        fingerprint = None
+        if args.save_evidence:
+            from whisperguard.evidence import save_evidence
+            try:
+                with metrics.timer("evidence"):
+                    evidence = save_evidence(result["audio"], sr, result["ml_scores"], result["rule_ratio"], level,
+                                             score, incident=dict(incident_metadata(result), stream=result["stream"]))
+                fingerprint = evidence["folder"]
+            except Exception as e:
+                print("Failed saving evidence:", e)
+        log_event(logger, level, score, fingerprint=fingerprint)
+
+    if not args.pure:
+        names = [name for inp in engine.inputs for name in inp.stream_names()]
+        print(f"Monitoring {len(names)} streams: {', '.join(names)} (press Ctrl+C to stop)...")
+    engine.start()
+    try:
+        if args.continuous or args.duration is None:
+            t_end = float("inf")
+        else:
+            t_end = time.time() + args.duration
+        next_status = time.time() + 1.0
+        while time.time() < t_end:
+            try:
+                respond(*events.get(timeout=max(0.0, min(0.2, t_end - time.time()))))
+            except queue.Empty:
+                pass
+            if time.time() >= next_status and not args.pure:
+                next_status += 1.0
+                print(time.strftime("%H:%M:%S"), "  ".join(f"{s['stream']}:{s['level']}" for s in engine.status()))
     except KeyboardInterrupt:
         print("Interrupted by user")
     finally:
-        ac.stop_stream()
+        engine.stop()
+    while not events.empty():
+        respond(*events.get())
 
     if not args.pure:
         print("Logged events:", logger.list())
+        print("Engine stats:", engine.stats())
+        for s in engine.status():
+            print(f"  {s['stream']}: decisions:{s['decisions']} alerts:{s['alerts']} "
+                  f"overruns:{s['overruns']} ({s['skipped_seconds']:.2f}s skipped) "
+                  f"input overflows:{s['input_overflows']}")
 
 
 if __name__ == "__main__":